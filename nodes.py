@@ -343,6 +343,42 @@ def check_and_download_tokenizer():
     _MODELS_CHECKED = True
 
 
+QUANTIZED_PRECISIONS = {"int8": 8, "int4": 4}
+
+
+def get_quantized_weight_cache(model_dir: str, precision: str) -> Tuple[Optional[str], Optional[str]]:
+    """Cache file for the quantized weights next to a local checkpoint and the checkpoint version stored in it"""
+    if not os.path.isdir(model_dir) or not os.access(model_dir, os.W_OK):
+        return None, None
+    weight_files = [f for f in os.listdir(model_dir) if f.endswith(".safetensors") and not f.startswith("quantized_")]
+    if not weight_files:
+        return None, None
+    # a re-downloaded checkpoint has a new mtime, its cache is then quantized again and overwritten
+    mtime = max(int(os.path.getmtime(os.path.join(model_dir, f))) for f in weight_files)
+    return os.path.join(model_dir, f"quantized_{precision}.safetensors"), str(mtime)
+
+
+def remove_stale_quantized_caches(model_dir: str, precision: str):
+    """Delete the caches of earlier versions that were named after the checkpoint mtime"""
+    for f in os.listdir(model_dir):
+        if f.startswith(f"quantized_{precision}_") and f.endswith(".safetensors"):
+            try:
+                os.remove(os.path.join(model_dir, f))
+            except OSError:
+                pass
+
+
+def quantize_qwen_model(model, precision: str, model_source: str):
+    """Weight-only quantization of the talker and code predictor linears, reusing the on-disk cache if present"""
+    cache_path, cache_version = get_quantized_weight_cache(model_source, precision)
+    if cache_path is not None:
+        remove_stale_quantized_caches(model_source, precision)
+    num_layers = model.model.quantize_weights(
+        QUANTIZED_PRECISIONS[precision], cache_path=cache_path, cache_version=cache_version
+    )
+    print(f"🔧 [Qwen3-TTS] Quantized {num_layers} linear layers to {precision}")
+
+
 def load_qwen_model(model_type: str, model_choice: str, device: str, precision: str, attention: str = "auto", unload_after: bool = False, previous_attention: str = None, custom_model_path: Optional[str] = None):
     """Shared model loading logic with caching and local path priority"""
     global _MODEL_CACHE
@@ -364,17 +400,22 @@ def load_qwen_model(model_type: str, model_choice: str, device: str, precision:
             device = "mps"  # 针对 Mac 的关键修复
         else:
             device = "cpu"
-    
+
+    # The weight-only kernels are CPU only, elsewhere the quantized layers would have nothing to run on
+    if precision in QUANTIZED_PRECISIONS and device != "cpu":
+        print(f"⚠️ [Qwen3-TTS] {precision} precision needs the CPU device, loading the model in bf16 on {device}")
+        precision = "bf16"
+
     # 强制 Mac 使用 float16 或 bfloat16 (MPS 跑 float32 会很慢)
     if device == "mps" and precision == "bf16":
         dtype = torch.bfloat16
     elif device == "mps":
         dtype = torch.float16
     else:
-        dtype = torch.bfloat16 if precision == "bf16" else torch.float32
+        dtype = torch.float32 if precision == "fp32" else torch.bfloat16
     
-    # Set precision
-    dtype = torch.bfloat16 if precision == "bf16" else torch.float32
+    # Set precision (int8 / int4 keep the non-quantized weights and the activations in bf16)
+    dtype = torch.float32 if precision == "fp32" else torch.bfloat16
     
     # VoiceDesign restriction
     if model_type == "VoiceDesign" and model_choice == "0.6B":
@@ -547,6 +588,9 @@ def load_qwen_model(model_type: str, model_choice: str, device: str, precision:
     
     # Apply patches
     apply_qwen3_patches(model)
+
+    if precision in QUANTIZED_PRECISIONS:
+        quantize_qwen_model(model, precision, final_source)
     
     _MODEL_CACHE[cache_key] = model
     
@@ -572,7 +616,7 @@ class VoiceDesignNode:
                 "instruct": ("STRING", {"multiline": True, "default": "", "placeholder": "Style instruction (required for VoiceDesign)"}),
                 "model_choice": (["0.6B", "1.7B"], {"default": "1.7B"}),
                 "device": (["auto", "cuda","mps", "cpu"], {"default": "auto"}),
-                "precision": (["bf16", "fp32"], {"default": "bf16"}),
+                "precision": (["bf16", "fp32", "int8", "int4"], {"default": "bf16"}),
                 "language": (DEMO_LANGUAGES, {"default": "Auto"}),
             },
             "optional": {
@@ -621,6 +665,9 @@ class VoiceDesignNode:
 
         mapped_lang = LANGUAGE_MAP.get(language, "auto")
         
+        # Segments share the instruct / speaker prompt prefix, prefill it only once
+        model.model.enable_prefix_cache()
+
         # Use helper to split text based on config (if provided)
         segments = split_text_by_pauses(text, config)
 
@@ -703,7 +750,7 @@ class VoiceCloneNode:
                 "target_text": ("STRING", {"multiline": True, "default": "Good one. Okay, fine, I'm just gonna leave this sock monkey here. Goodbye."}),
                 "model_choice": (["0.6B", "1.7B"], {"default": "0.6B"}),
                 "device": (["auto", "cuda","mps", "cpu"], {"default": "auto"}),
-                "precision": (["bf16", "fp32"], {"default": "bf16"}),
+                "precision": (["bf16", "fp32", "int8", "int4"], {"default": "bf16"}),
                 "language": (DEMO_LANGUAGES, {"default": "Auto"}),
             },
             "optional": {
@@ -861,6 +908,11 @@ class VoiceCloneNode:
             else:
                 raise RuntimeError("Either 'ref_audio' or 'voice_clone_prompt' must be provided")
 
+            # Segments share the instruct / speaker prompt prefix, prefill it only once
+            model.model.enable_prefix_cache()
+            # Every segment passes the same reference clip, encode it only once
+            model.enable_reference_cache()
+
             # Use helper to split text based on config (if provided)
             segments = split_text_by_pauses(target_text, config)
 
@@ -947,7 +999,7 @@ class CustomVoiceNode:
                 "speaker": (["Aiden", "Dylan", "Eric", "Ono_anna", "Ryan", "Serena", "Sohee", "Uncle_fu", "Vivian"], {"default": "Ryan"}),
                 "model_choice": (["0.6B", "1.7B"], {"default": "1.7B"}),
                 "device": (["auto", "cuda","mps", "cpu"], {"default": "auto"}),
-                "precision": (["bf16", "fp32"], {"default": "bf16"}),
+                "precision": (["bf16", "fp32", "int8", "int4"], {"default": "bf16"}),
                 "language": (DEMO_LANGUAGES, {"default": "Auto"}),
             },
             "optional": {
@@ -1006,6 +1058,9 @@ class CustomVoiceNode:
 
         mapped_lang = LANGUAGE_MAP.get(language, "auto")
         
+        # Segments share the instruct / speaker prompt prefix, prefill it only once
+        model.model.enable_prefix_cache()
+
         # Use helper to split text based on config (if provided)
         segments = split_text_by_pauses(text, config)
 
@@ -1082,7 +1137,7 @@ class VoiceClonePromptNode:
                 "ref_text": ("STRING", {"multiline": True, "default": "", "placeholder": "Reference audio text (highly recommended for better quality)"}),
                 "model_choice": (["0.6B", "1.7B"], {"default": "0.6B"}),
                 "device": (["auto", "cuda", "mps", "cpu"], {"default": "auto"}),
-                "precision": (["bf16", "fp32"], {"default": "bf16"}),
+                "precision": (["bf16", "fp32", "int8", "int4"], {"default": "bf16"}),
                 "attention": (ATTENTION_OPTIONS, {"default": "auto", "tooltip": "Attention implementation"}),
             },
             "optional": {
@@ -1179,7 +1234,7 @@ class DialogueInferenceNode:
                 "role_bank": ("QWEN3_ROLE_BANK",),
                 "model_choice": (["0.6B", "1.7B"], {"default": "1.7B"}),
                 "device": (["auto", "cuda", "mps", "cpu"], {"default": "auto"}),
-                "precision": (["bf16", "fp32"], {"default": "bf16"}),
+                "precision": (["bf16", "fp32", "int8", "int4"], {"default": "bf16"}),
                 "language": (DEMO_LANGUAGES, {"default": "Auto"}),
                 # RENAMED: pause_seconds -> pause_linebreak
                 # Linebreak Pause
@@ -1310,60 +1365,64 @@ class DialogueInferenceNode:
             raise RuntimeError("No valid dialogue lines found matching Role Bank.")
 
         num_lines = len(texts_to_gen)
-        num_chunks = (num_lines + batch_size - 1) // batch_size
-        total_stages = num_chunks + 1
+        total_stages = num_lines + 1
         pbar = ProgressBar(total_stages)
 
         pbar.update_absolute(1, total_stages, None)
 
+        def on_line_finished(num_finished, num_total):
+            pbar.update_absolute(num_finished + 1, total_stages, None)
+            # release cached blocks once per batch of finished lines, as the per-chunk loop used to
+            if num_finished % batch_size == 0 and torch.cuda.is_available():
+                torch.cuda.empty_cache()
+
         try:
             results = []
             sr = 24000
 
-            for i in range(0, num_lines, batch_size):
-                chunk_texts = texts_to_gen[i:i + batch_size]
-                chunk_prompts = prompts_to_gen[i:i + batch_size]
-                chunk_langs = langs_to_gen[i:i + batch_size]
-                chunk_pauses = pauses_to_gen[i:i + batch_size]
-
-                current_chunk = i // batch_size + 1
-                print(f"[Qwen3-TTS] Running batched inference for chunk {current_chunk} of {num_chunks}...")
-
-                wavs_list, sr = model.generate_voice_clone(
-                    text=chunk_texts,
-                    language=chunk_langs,
-                    voice_clone_prompt=chunk_prompts,
-                    max_new_tokens=max_new_tokens_per_line,
-                    top_p=top_p,
-                    top_k=top_k,
-                    temperature=temperature,
-                    repetition_penalty=repetition_penalty,
-                )
-
-                for j, wav in enumerate(wavs_list):
-                    waveform = torch.from_numpy(wav).float()
-                    if waveform.ndim == 1:
-                        waveform = waveform.unsqueeze(0).unsqueeze(0)
-                    elif waveform.ndim == 2:
-                        waveform = waveform.unsqueeze(0)
-                        if waveform.shape[1] > 1:
-                            waveform = torch.mean(waveform, dim=1, keepdim=True)
+            # Continuous batching: up to batch_size lines are generated at once and a finished line
+            # immediately hands its slot to the next one, so short lines never wait for long ones.
+            print(f"[Qwen3-TTS] Running continuous batched inference for {num_lines} lines (batch size {batch_size})...")
+            # Lines of the same role share the speaker / reference prompt prefix, prefill it only once
+            model.model.enable_prefix_cache()
+            # Finished lines are decoded to audio on a background thread while the talker continues
+
+            wavs_list, sr = model.generate_voice_clone(
+                text=texts_to_gen,
+                language=langs_to_gen,
+                voice_clone_prompt=prompts_to_gen,
+                max_new_tokens=max_new_tokens_per_line,
+                top_p=top_p,
+                top_k=top_k,
+                temperature=temperature,
+                repetition_penalty=repetition_penalty,
+                max_batch_size=batch_size,
+                pipeline_decode=True,
+                progress_callback=on_line_finished,
+            )
 
-                    results.append(waveform)
+            for j, wav in enumerate(wavs_list):
+                waveform = torch.from_numpy(wav).float()
+                if waveform.ndim == 1:
+                    waveform = waveform.unsqueeze(0).unsqueeze(0)
+                elif waveform.ndim == 2:
+                    waveform = waveform.unsqueeze(0)
+                    if waveform.shape[1] > 1:
+                        waveform = torch.mean(waveform, dim=1, keepdim=True)
 
-                    this_pause = chunk_pauses[j]
-                    if this_pause > 0:
-                        silence_len = int(this_pause * sr)
-                        silence = torch.zeros((1, 1, silence_len))
-                        results.append(silence)
+                results.append(waveform)
 
-                if torch.cuda.is_available():
-                    torch.cuda.empty_cache()
+                this_pause = pauses_to_gen[j]
+                if this_pause > 0:
+                    silence_len = int(this_pause * sr)
+                    silence = torch.zeros((1, 1, silence_len))
+                    results.append(silence)
 
-                pbar.update_absolute(current_chunk + 1, total_stages, None)
+            if torch.cuda.is_available():
+                torch.cuda.empty_cache()
 
         except Exception as e:
-            raise RuntimeError(f"Dialogue generation failed during chunked inference: {e}")
+            raise RuntimeError(f"Dialogue generation failed during batched inference: {e}")
 
         if not results:
             raise RuntimeError("No dialogue lines were successfully generated.")
@@ -1516,8 +1575,8 @@ class LoadSpeakerNode:
         wav_path = os.path.join(voices_dir, filename)
         
         # 1. Load the AUDIO for output/preview
-        import librosa
-        wav, sr = librosa.load(wav_path, sr=None)
+        from qwen_tts.inference.audio_io import read_audio
+        wav, sr = read_audio(wav_path)
         waveform = torch.from_numpy(wav).unsqueeze(0).unsqueeze(0)
         audio_preview = {"waveform": waveform, "sample_rate": sr}
 
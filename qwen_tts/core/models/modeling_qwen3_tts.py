@@ -14,18 +14,30 @@
 # limitations under the License.
 """PyTorch Qwen3TTS model."""
 
+import hashlib
 import json
+import math
 import os
+import threading
+from collections import Counter, OrderedDict, defaultdict, deque
 from dataclasses import dataclass
-from typing import Callable, Optional
+from queue import Queue
+from typing import Any, Callable, Iterator, Optional
 
 import torch
 from librosa.filters import mel as librosa_mel_fn
 from torch import nn
 from torch.nn import functional as F
 from transformers.activations import ACT2FN
-from transformers.cache_utils import Cache, DynamicCache
-from transformers.generation import GenerationMixin
+from transformers.cache_utils import Cache, DynamicCache, DynamicLayer, StaticLayer
+from transformers.generation import (
+    GenerationMixin,
+    LogitsProcessor,
+    LogitsProcessorList,
+    StoppingCriteria,
+    StoppingCriteriaList,
+)
+from transformers.generation.streamers import BaseStreamer
 from transformers.integrations import use_kernel_forward_from_hub
 from transformers.masking_utils import (
     create_causal_mask,
@@ -51,9 +63,12 @@ from .configuration_qwen3_tts import (
     Qwen3TTSTalkerCodePredictorConfig,
     Qwen3TTSTalkerConfig,
 )
+from .quantization_qwen3_tts import quantize_linear_layers
 
 logger = logging.get_logger(__name__)
 
+_PREDICTOR_CACHE_LOCK = threading.Lock()
+
 
 class Res2NetBlock(torch.nn.Module):
     def __init__(self, in_channels, out_channels, scale=8, kernel_size=3, dilation=1):
@@ -1012,6 +1027,7 @@ class Qwen3TTSTalkerCodePredictorModel(Qwen3TTSPreTrainedModel):
         self.codec_embedding = nn.ModuleList(
             [nn.Embedding(config.vocab_size, embedding_dim) for _ in range(config.num_code_groups - 1)]
         )
+        self._compiled_forward_layers = None
 
         # Initialize weights and apply final processing
         self.post_init()
@@ -1091,12 +1107,50 @@ class Qwen3TTSTalkerCodePredictorModel(Qwen3TTSPreTrainedModel):
             if self.has_sliding_layers:
                 causal_mask_mapping["sliding_attention"] = create_sliding_window_causal_mask(**mask_kwargs)
 
-        hidden_states = inputs_embeds
-
         # create position embeddings to be shared across the decoder layers
-        position_embeddings = self.rotary_emb(hidden_states, position_ids)
+        position_embeddings = self.rotary_emb(inputs_embeds, position_ids)
+
+        forward_layers = self._forward_layers
+        if (
+            self._compiled_forward_layers is not None
+            and isinstance(past_key_values, Cache)
+            and past_key_values.is_compileable
+        ):
+            forward_layers = self._compiled_forward_layers
+
+        hidden_states, all_hidden_states, all_self_attns = forward_layers(
+            inputs_embeds,
+            causal_mask_mapping=causal_mask_mapping,
+            position_ids=position_ids,
+            past_key_values=past_key_values,
+            output_attentions=output_attentions,
+            output_hidden_states=output_hidden_states,
+            use_cache=use_cache,
+            cache_position=cache_position,
+            position_embeddings=position_embeddings,
+            **flash_attn_kwargs,
+        )
 
-        # decoder layers
+        return BaseModelOutputWithPast(
+            last_hidden_state=hidden_states,
+            past_key_values=past_key_values if use_cache else None,
+            hidden_states=all_hidden_states,
+            attentions=all_self_attns,
+        )
+
+    def _forward_layers(
+        self,
+        hidden_states: torch.Tensor,
+        causal_mask_mapping: dict,
+        position_ids: torch.LongTensor,
+        past_key_values: Optional[Cache],
+        output_attentions: bool,
+        output_hidden_states: bool,
+        use_cache: bool,
+        cache_position: torch.LongTensor,
+        position_embeddings: tuple[torch.Tensor, torch.Tensor],
+        **flash_attn_kwargs,
+    ):
         all_hidden_states = () if output_hidden_states else None
         all_self_attns = () if output_attentions else None
 
@@ -1127,13 +1181,274 @@ class Qwen3TTSTalkerCodePredictorModel(Qwen3TTSPreTrainedModel):
         if output_hidden_states:
             all_hidden_states += (hidden_states,)
 
-        return BaseModelOutputWithPast(
-            last_hidden_state=hidden_states,
-            past_key_values=past_key_values if use_cache else None,
-            hidden_states=all_hidden_states,
-            attentions=all_self_attns,
+        return hidden_states, all_hidden_states, all_self_attns
+
+    def compile_decode_step(self, **compile_kwargs):
+        """
+        Compile the decoder layers with `torch.compile(**compile_kwargs)`. The compiled graph is only used with a
+        static (compileable) cache, so that every step of a frame runs with the same shapes.
+        """
+        self._compiled_forward_layers = torch.compile(self._forward_layers, **compile_kwargs)
+
+
+class Qwen3TTSPreallocatedLayer(DynamicLayer):
+    """
+    A cache layer backed by key/value buffers of a fixed maximum length. The buffers are allocated once and reused:
+    `update` copies the new states in place and returns views of the filled prefix, and `reset` only rewinds the
+    write position.
+    """
+
+    def __init__(self, max_cache_len: int):
+        super().__init__()
+        self.max_cache_len = max_cache_len
+        self.cumulative_length = 0
+
+    def lazy_initialization(self, key_states: torch.Tensor, value_states: torch.Tensor):
+        self.dtype, self.device = key_states.dtype, key_states.device
+        batch_size, num_heads, _, _ = key_states.shape
+        self.key_buffer = key_states.new_empty((batch_size, num_heads, self.max_cache_len, key_states.shape[-1]))
+        self.value_buffer = value_states.new_empty((batch_size, num_heads, self.max_cache_len, value_states.shape[-1]))
+        self.is_initialized = True
+
+    def update(
+        self,
+        key_states: torch.Tensor,
+        value_states: torch.Tensor,
+        cache_kwargs: Optional[dict] = None,
+    ) -> tuple[torch.Tensor, torch.Tensor]:
+        if (
+            not self.is_initialized
+            or self.key_buffer.shape[0] != key_states.shape[0]
+            or self.key_buffer.dtype != key_states.dtype
+            or self.key_buffer.device != key_states.device
+        ):
+            self.lazy_initialization(key_states, value_states)
+
+        start, end = self.cumulative_length, self.cumulative_length + key_states.shape[-2]
+        self.key_buffer[:, :, start:end].copy_(key_states)
+        self.value_buffer[:, :, start:end].copy_(value_states)
+        self.cumulative_length = end
+        self.keys = self.key_buffer[:, :, :end]
+        self.values = self.value_buffer[:, :, :end]
+        return self.keys, self.values
+
+    def get_seq_length(self) -> int:
+        return self.cumulative_length
+
+    def get_max_cache_shape(self) -> int:
+        return self.max_cache_len
+
+    def reset(self) -> None:
+        self.cumulative_length = 0
+
+
+class Qwen3TTSSlotLayer(DynamicLayer):
+    """
+    A cache layer holding up to `num_slots` independent sequences ("slots"), one per batch row, each with its own
+    length. Rows `[0, batch_size)` of a decode step are the active slots: `update` writes the new token of every row
+    at the per-row position passed as `cache_position` and returns the first `kv_length` positions of those rows, the
+    caller masks out the positions a row has not filled yet. The buffers grow on demand up to `max_cache_len`.
+    """
+
+    def __init__(self, num_slots: int, max_cache_len: Optional[int] = None):
+        super().__init__()
+        self.num_slots = num_slots
+        self.max_cache_len = max_cache_len
+        self.kv_length = 0
+
+    def lazy_initialization(self, key_states: torch.Tensor, value_states: torch.Tensor):
+        self.dtype, self.device = key_states.dtype, key_states.device
+        num_heads = key_states.shape[1]
+        self.key_buffer = key_states.new_zeros((self.num_slots, num_heads, 0, key_states.shape[-1]))
+        self.value_buffer = value_states.new_zeros((self.num_slots, num_heads, 0, value_states.shape[-1]))
+        self.is_initialized = True
+
+    def reserve(self, length: int) -> None:
+        """Make room for `length` positions per slot, growing the buffers geometrically."""
+        capacity = self.key_buffer.shape[2]
+        if length <= capacity:
+            return
+        if self.max_cache_len is not None and length > self.max_cache_len:
+            raise ValueError(f"Sequence length {length} exceeds the cache capacity of {self.max_cache_len}.")
+        new_capacity = max(length, 2 * capacity)
+        if self.max_cache_len is not None:
+            new_capacity = min(new_capacity, self.max_cache_len)
+        for name in ("key_buffer", "value_buffer"):
+            buffer = getattr(self, name)
+            grown = buffer.new_zeros((*buffer.shape[:2], new_capacity, buffer.shape[-1]))
+            grown[:, :, :capacity] = buffer
+            setattr(self, name, grown)
+
+    def write(self, slot: int, key_states: torch.Tensor, value_states: torch.Tensor) -> None:
+        """Copy the states of a single prefilled sequence (batch size 1) into `slot`."""
+        if not self.is_initialized:
+            self.lazy_initialization(key_states, value_states)
+        length = key_states.shape[-2]
+        self.reserve(length)
+        self.key_buffer[slot, :, :length] = key_states[0]
+        self.value_buffer[slot, :, :length] = value_states[0]
+
+    def move(self, source: int, target: int, length: int) -> None:
+        """Copy the first `length` positions of slot `source` into slot `target`."""
+        self.key_buffer[target, :, :length] = self.key_buffer[source, :, :length]
+        self.value_buffer[target, :, :length] = self.value_buffer[source, :, :length]
+
+    def update(
+        self,
+        key_states: torch.Tensor,
+        value_states: torch.Tensor,
+        cache_kwargs: Optional[dict] = None,
+    ) -> tuple[torch.Tensor, torch.Tensor]:
+        positions = cache_kwargs["cache_position"]
+        rows = torch.arange(key_states.shape[0], device=key_states.device)
+        self.key_buffer[rows, :, positions] = key_states[:, :, 0]
+        self.value_buffer[rows, :, positions] = value_states[:, :, 0]
+        batch_size = key_states.shape[0]
+        return (
+            self.key_buffer[:batch_size, :, : self.kv_length],
+            self.value_buffer[:batch_size, :, : self.kv_length],
         )
 
+    def get_mask_sizes(self, cache_position: torch.Tensor) -> tuple[int, int]:
+        return self.kv_length, 0
+
+    def get_seq_length(self) -> int:
+        return self.kv_length
+
+    def get_max_cache_shape(self) -> int:
+        return -1 if self.max_cache_len is None else self.max_cache_len
+
+
+def warp_codec_logits(
+    logits: torch.Tensor,
+    top_k: Optional[int] = None,
+    top_p: Optional[float] = None,
+    temperature: Optional[float] = None,
+) -> torch.Tensor:
+    """
+    Apply temperature, top-k and top-p to `logits` of shape `(batch_size, vocab_size)` in place, in the same order and
+    with the same semantics as the `generate()` logits warpers. `temperature <= 0` is greedy: only the argmax of each
+    row is kept.
+    """
+    if temperature is not None and temperature <= 0:
+        greedy = logits.argmax(dim=-1, keepdim=True)
+        return logits.fill_(-float("inf")).scatter_(-1, greedy, 0.0)
+    if temperature is not None and temperature != 1.0:
+        logits.div_(temperature)
+    if top_k is not None and 0 < top_k < logits.shape[-1]:
+        kth_logits = torch.topk(logits, top_k, dim=-1).values[..., -1:]
+        logits.masked_fill_(logits < kth_logits, -float("inf"))
+    if top_p is not None and top_p < 1.0:
+        sorted_logits, sorted_indices = torch.sort(logits, descending=False, dim=-1)
+        sorted_to_remove = sorted_logits.softmax(dim=-1).cumsum(dim=-1) <= (1 - top_p)
+        sorted_to_remove[..., -1:] = False
+        logits.masked_fill_(sorted_to_remove.scatter(-1, sorted_indices, sorted_to_remove), -float("inf"))
+    return logits
+
+
+def codec_token_probs(
+    logits: torch.Tensor,
+    do_sample: bool = True,
+    top_k: Optional[int] = None,
+    top_p: Optional[float] = None,
+    temperature: Optional[float] = None,
+) -> torch.Tensor:
+    """
+    The distribution `sample_codec_token` draws from, of shape `(batch_size, vocab_size)`: the softmax of the warped
+    `logits`, or a one-hot of the argmax without sampling. `logits` is modified in place.
+    """
+    if not do_sample:
+        return nn.functional.one_hot(logits.argmax(dim=-1), logits.shape[-1]).to(logits.dtype)
+    return nn.functional.softmax(warp_codec_logits(logits, top_k, top_p, temperature), dim=-1)
+
+
+def sample_codec_token(
+    logits: torch.Tensor,
+    do_sample: bool = True,
+    top_k: Optional[int] = None,
+    top_p: Optional[float] = None,
+    temperature: Optional[float] = None,
+) -> torch.LongTensor:
+    """
+    Sample one token per row from `logits` of shape `(batch_size, vocab_size)`, applying temperature, top-k and top-p
+    in the same order and with the same semantics as the `generate()` logits warpers. `logits` is modified in place.
+    `temperature <= 0` samples greedily.
+    """
+    if not do_sample or (temperature is not None and temperature <= 0):
+        return logits.argmax(dim=-1)
+
+    probs = codec_token_probs(logits, do_sample, top_k, top_p, temperature)
+    return torch.multinomial(probs, num_samples=1).squeeze(1)
+
+
+def apply_codec_penalties(
+    logits: torch.Tensor,
+    seen_tokens: torch.Tensor,
+    repetition_penalty: float,
+    suppress_mask: torch.Tensor,
+    eos_token_id: int,
+    suppress_eos: Optional[torch.Tensor] = None,
+) -> torch.Tensor:
+    """
+    Apply the talker logits processors of `generate()` to first-codebook `logits` of shape `(batch_size, vocab_size)`
+    in place: the repetition penalty on the tokens marked in `seen_tokens`, `min_new_tokens` (EOS masked for the rows
+    set in `suppress_eos`) and the suppressed tokens of `suppress_mask`.
+    """
+    if repetition_penalty != 1.0:
+        penalized = torch.where(logits < 0, logits * repetition_penalty, logits / repetition_penalty)
+        torch.where(seen_tokens, penalized, logits, out=logits)
+    if suppress_eos is not None:
+        logits[:, eos_token_id].masked_fill_(suppress_eos, -float("inf"))
+    return logits.masked_fill_(suppress_mask, -float("inf"))
+
+
+class Qwen3TTSCodecLogitsProcessor(LogitsProcessor):
+    """
+    All first-codebook logits processing of the talker in one processor that works in place on the scores: repetition
+    penalty over the generated tokens, EOS suppression before `min_new_tokens`, the suppressed tokens of
+    `suppress_mask` and, when sampling, temperature, top-k and top-p. `generate()` is called with its own processors
+    and warpers disabled, so this replaces their chain of per-step allocations.
+    """
+
+    def __init__(
+        self,
+        suppress_mask: torch.Tensor,
+        eos_token_id: int,
+        min_new_tokens: int = 2,
+        repetition_penalty: float = 1.0,
+        do_sample: bool = True,
+        top_k: Optional[int] = None,
+        top_p: Optional[float] = None,
+        temperature: Optional[float] = None,
+    ):
+        self.suppress_mask = suppress_mask
+        self.eos_token_id = eos_token_id
+        self.min_new_tokens = min_new_tokens
+        self.repetition_penalty = repetition_penalty
+        self.do_sample = do_sample
+        self.top_k = top_k
+        self.top_p = top_p
+        self.temperature = temperature
+        self.seen_tokens = None
+        self.num_seen = 0
+
+    def __call__(self, input_ids: torch.LongTensor, scores: torch.FloatTensor) -> torch.FloatTensor:
+        # `input_ids` only holds the generated tokens, the talker prompt is given as embeddings
+        num_generated = input_ids.shape[1]
+        if self.seen_tokens is None or self.seen_tokens.shape != scores.shape or num_generated < self.num_seen:
+            self.seen_tokens = torch.zeros_like(scores, dtype=torch.bool)
+            self.num_seen = 0
+        if num_generated > self.num_seen:
+            self.seen_tokens.scatter_(1, input_ids[:, self.num_seen :], True)
+            self.num_seen = num_generated
+
+        apply_codec_penalties(scores, self.seen_tokens, self.repetition_penalty, self.suppress_mask, self.eos_token_id)
+        if num_generated < self.min_new_tokens:
+            scores[:, self.eos_token_id] = -float("inf")
+        if self.do_sample:
+            warp_codec_logits(scores, self.top_k, self.top_p, self.temperature)
+        return scores
+
 
 class Qwen3TTSTalkerCodePredictorModelForConditionalGeneration(Qwen3TTSPreTrainedModel, GenerationMixin):
     _tied_weights_keys = ["lm_head.weight"]
@@ -1300,6 +1615,157 @@ class Qwen3TTSTalkerCodePredictorModelForConditionalGeneration(Qwen3TTSPreTraine
         model_kwargs["generation_steps"] = outputs.generation_steps
         return model_kwargs
 
+    def _acquire_predictor_cache(self, batch_size: int) -> Cache:
+        # Each call takes its cache out of a per-model pool, so concurrent `generate` calls on one model (e.g. ComfyUI
+        # queues on several threads) never share one. Once compiled, the predictor runs on fixed-shape static layers,
+        # which are only reused for the same batch size.
+        use_static = self.model._compiled_forward_layers is not None
+        with _PREDICTOR_CACHE_LOCK:
+            pool = self.__dict__.setdefault("_predictor_cache_pool", [])
+            cache = None
+            for index, candidate in enumerate(pool):
+                if candidate.is_compileable == use_static and not (
+                    use_static
+                    and candidate.layers[0].is_initialized
+                    and candidate.layers[0].max_batch_size != batch_size
+                ):
+                    cache = pool.pop(index)
+                    break
+        if cache is None:
+            layer_class = StaticLayer if use_static else Qwen3TTSPreallocatedLayer
+            cache = Cache(
+                layers=[layer_class(self.config.num_code_groups) for _ in range(self.config.num_hidden_layers)]
+            )
+        cache.reset()
+        return cache
+
+    def _release_predictor_cache(self, cache: Cache, max_pooled: int = 4):
+        with _PREDICTOR_CACHE_LOCK:
+            pool = self.__dict__.setdefault("_predictor_cache_pool", [])
+            pool.append(cache)
+            del pool[:-max_pooled]
+
+    @torch.no_grad()
+    def predict_codes(
+        self,
+        past_hidden: torch.Tensor,
+        last_id_hidden: torch.Tensor,
+        do_sample: bool = True,
+        top_k: Optional[int] = None,
+        top_p: Optional[float] = None,
+        temperature: Optional[float] = None,
+        prefix_codes: Optional[torch.LongTensor] = None,
+        return_probs: bool = False,
+    ):
+        r"""
+        Predict the residual codebooks of one codec frame.
+
+        Equivalent to `generate(inputs_embeds=torch.cat((past_hidden, last_id_hidden), dim=1),
+        max_new_tokens=num_code_groups - 1, ...)`, but runs the fixed-length loop directly on a reused preallocated
+        cache instead of going through the generation machinery.
+
+        Args:
+            past_hidden (`torch.FloatTensor` of shape `(batch_size, 1, talker_hidden_size)`):
+                Last hidden state of the talker.
+            last_id_hidden (`torch.FloatTensor` of shape `(batch_size, 1, talker_hidden_size)`):
+                Talker embedding of the first codebook token of the frame.
+            prefix_codes (`torch.LongTensor` of shape `(batch_size, num_prefix_codes)`, *optional*):
+                Residual codes that are already fixed; only the remaining ones are sampled.
+            return_probs (`bool`, *optional*, defaults to `False`):
+                Whether to also return the distributions the residual codes were sampled from.
+
+        Returns:
+            sequences (`torch.LongTensor` of shape `(batch_size, num_code_groups - 1)`):
+                The sampled residual codes.
+            codec_hidden (`torch.FloatTensor` of shape `(batch_size, 1, talker_hidden_size)`):
+                Sum of the embeddings of all codebooks of the frame, including `last_id_hidden`.
+            probs (`torch.FloatTensor` of shape `(batch_size, num_code_groups - 1, vocab_size)`):
+                Only with `return_probs`; the rows of `prefix_codes` are zero.
+        """
+        past_key_values = self._acquire_predictor_cache(past_hidden.shape[0])
+        try:
+            return self._predict_codes(
+                past_hidden, last_id_hidden, past_key_values, do_sample, top_k, top_p, temperature, prefix_codes,
+                return_probs,
+            )
+        finally:
+            self._release_predictor_cache(past_key_values)
+
+    def _predict_codes(
+        self, past_hidden, last_id_hidden, past_key_values, do_sample, top_k, top_p, temperature, prefix_codes,
+        return_probs,
+    ):
+        batch_size = past_hidden.shape[0]
+        num_steps = self.config.num_code_groups - 1
+        num_prefix = 0 if prefix_codes is None else prefix_codes.shape[1]
+        cache_position = torch.arange(num_steps + 1, device=past_hidden.device)
+        sequences = torch.empty((batch_size, num_steps), dtype=torch.long, device=past_hidden.device)
+        codec_hidden = last_id_hidden.to(torch.float32, copy=True)
+        probs = None
+        if return_probs:
+            probs = torch.zeros(
+                (batch_size, num_steps, self.config.vocab_size), dtype=torch.float32, device=past_hidden.device
+            )
+
+        inputs_embeds = [past_hidden, last_id_hidden]
+        for step in range(num_prefix):
+            sequences[:, step] = prefix_codes[:, step]
+            code_embeds = self.model.codec_embedding[step](prefix_codes[:, step : step + 1])
+            codec_hidden += code_embeds
+            inputs_embeds.append(code_embeds)
+        inputs_embeds = torch.cat(inputs_embeds, dim=1)
+
+        position = 0
+        for step in range(num_prefix, num_steps):
+            seq_len = inputs_embeds.shape[1]
+            hidden_states = self.model(
+                inputs_embeds=self.small_to_mtp_projection(inputs_embeds),
+                past_key_values=past_key_values,
+                use_cache=True,
+                cache_position=cache_position[position : position + seq_len],
+            ).last_hidden_state
+            position += seq_len
+
+            logits = self.lm_head[step](hidden_states[:, -1]).float()
+            if return_probs:
+                probs[:, step] = codec_token_probs(logits, do_sample, top_k, top_p, temperature)
+                if do_sample:
+                    sequences[:, step] = torch.multinomial(probs[:, step], num_samples=1).squeeze(1)
+                else:
+                    sequences[:, step] = probs[:, step].argmax(dim=-1)
+            else:
+                sequences[:, step] = sample_codec_token(logits, do_sample, top_k, top_p, temperature)
+
+            inputs_embeds = self.model.codec_embedding[step](sequences[:, step : step + 1])
+            codec_hidden += inputs_embeds
+
+        codec_hidden = codec_hidden.to(last_id_hidden.dtype)
+        if return_probs:
+            return sequences, codec_hidden, probs
+        return sequences, codec_hidden
+
+    @torch.no_grad()
+    def residual_logits(
+        self, past_hidden: torch.Tensor, last_id_hidden: torch.Tensor, codes: torch.LongTensor
+    ) -> torch.Tensor:
+        r"""
+        Score given residual `codes` of shape `(batch_size, num_code_groups - 1)` in a single teacher-forced pass.
+
+        Returns the float32 logits of shape `(batch_size, num_code_groups - 1, vocab_size)` that `predict_codes` would
+        sample each code from, given the codes before it.
+        """
+        num_steps = self.config.num_code_groups - 1
+        inputs_embeds = [past_hidden, last_id_hidden]
+        for step in range(num_steps - 1):
+            inputs_embeds.append(self.model.codec_embedding[step](codes[:, step : step + 1]))
+        hidden_states = self.model(
+            inputs_embeds=self.small_to_mtp_projection(torch.cat(inputs_embeds, dim=1)),
+            use_cache=False,
+        ).last_hidden_state
+        return torch.stack(
+            [self.lm_head[step](hidden_states[:, step + 1]).float() for step in range(num_steps)], dim=1
+        )
+
 
 @dataclass
 class Qwen3TTSTalkerOutputWithPast(ModelOutput):
@@ -1327,6 +1793,282 @@ class Qwen3TTSTalkerOutputWithPast(ModelOutput):
     tts_pad_embed: Optional[torch.FloatTensor] = None
 
 
+class Qwen3TTSCodecStreamer(BaseStreamer):
+    """
+    Streamer that stores the codec frames produced by the talker in a queue, so that they can be consumed (e.g.
+    decoded to audio) in a non-blocking way while `Qwen3TTSForConditionalGeneration.generate` runs in another
+    thread. Each item is a `torch.LongTensor` of shape `(batch_size, num_code_groups)`.
+
+    Calling `stop()` from the consumer side makes the running generation finish after the current step.
+
+    With `hold_back(n)`, the last `n` frames stay queued on the producer side until `release` tells how many frames of
+    the item are kept, so that frames later dropped by a `Qwen3TTSRunawayDetector` are never emitted.
+
+    Parameters:
+        timeout (`float`, *optional*):
+            The timeout for the frame queue. If `None`, the queue will block indefinitely.
+    """
+
+    def __init__(self, timeout: Optional[float] = None):
+        self.frame_queue = Queue()
+        self.stop_signal = None
+        self.timeout = timeout
+        self.stopped = False
+        self.error = None
+        self.num_held_back = 0
+        self.held_frames = deque()
+        self.num_pushed = 0
+
+    def hold_back(self, num_frames: int):
+        """Keep the last `num_frames` frames of every item back until `release` is called."""
+        self.num_held_back = num_frames
+
+    def put(self, value):
+        """Push one codec frame of shape `(batch_size, num_code_groups)`, or hold it back."""
+        self.held_frames.append(value)
+        while len(self.held_frames) > self.num_held_back:
+            self.frame_queue.put(self.held_frames.popleft(), timeout=self.timeout)
+            self.num_pushed += 1
+
+    def release(self, num_frames: Optional[int] = None):
+        """End the current item: push its held back frames up to `num_frames` frames in total and drop the rest."""
+        while self.held_frames and (num_frames is None or self.num_pushed < num_frames):
+            self.frame_queue.put(self.held_frames.popleft(), timeout=self.timeout)
+            self.num_pushed += 1
+        self.held_frames.clear()
+        self.num_pushed = 0
+
+    def end(self):
+        """Signal that no more frames will be pushed."""
+        self.frame_queue.put(self.stop_signal, timeout=self.timeout)
+
+    def stop(self):
+        """Ask the producing `generate` call to stop as soon as possible."""
+        self.stopped = True
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        value = self.frame_queue.get(timeout=self.timeout)
+        if value is self.stop_signal:
+            if self.error is not None:
+                raise self.error
+            raise StopIteration()
+        return value
+
+
+class Qwen3TTSCodecAccumulator:
+    """
+    Collects the codec frames produced by the talker into a preallocated `(batch_size, max_frames, num_code_groups)`
+    buffer, and optionally the last-layer talker hidden state each frame was predicted from, so that `generate` does
+    not need to keep the hidden states of every layer and step alive until the end of generation.
+
+    Parameters:
+        batch_size (`int`):
+            Number of sequences generated in parallel.
+        max_frames (`int`):
+            Maximum number of frames that can be stored, usually `max_new_tokens`.
+        num_code_groups (`int`):
+            Number of codebooks per frame.
+        hidden_size (`int`, *optional*):
+            Talker hidden size. If `None`, no hidden states are stored.
+    """
+
+    def __init__(
+        self,
+        batch_size: int,
+        max_frames: int,
+        num_code_groups: int,
+        hidden_size: Optional[int] = None,
+        device: Optional[torch.device] = None,
+        dtype: Optional[torch.dtype] = None,
+    ):
+        self.codes = torch.zeros((batch_size, max_frames, num_code_groups), dtype=torch.long, device=device)
+        self.hidden_states = None
+        if hidden_size is not None:
+            self.hidden_states = torch.zeros((batch_size, max_frames, hidden_size), dtype=dtype, device=device)
+        self.num_frames = 0
+
+    def put(self, codec_ids: torch.LongTensor, hidden_states: Optional[torch.Tensor] = None):
+        """Store one frame of shape `(batch_size, num_code_groups)` and its `(batch_size, 1, hidden_size)` hidden state."""
+        self.codes[:, self.num_frames] = codec_ids
+        if self.hidden_states is not None and hidden_states is not None:
+            self.hidden_states[:, self.num_frames] = hidden_states[:, -1]
+        self.num_frames += 1
+
+    def get_codes(self) -> torch.LongTensor:
+        return self.codes[:, : self.num_frames]
+
+    def get_hidden_states(self) -> Optional[torch.Tensor]:
+        if self.hidden_states is None:
+            return None
+        return self.hidden_states[:, : self.num_frames]
+
+
+class Qwen3TTSCodecStreamerStoppingCriteria(StoppingCriteria):
+    """Stops generation once the attached `Qwen3TTSCodecStreamer` has been stopped by its consumer."""
+
+    def __init__(self, streamer: Qwen3TTSCodecStreamer):
+        self.streamer = streamer
+
+    def __call__(self, input_ids: torch.LongTensor, scores: torch.FloatTensor, **kwargs) -> torch.BoolTensor:
+        return torch.full((input_ids.shape[0],), self.streamer.stopped, device=input_ids.device, dtype=torch.bool)
+
+
+class Qwen3TTSRunawayDetector:
+    """
+    Stops runaway generations early by watching the first-codebook tokens of every item, and records why each item
+    terminated.
+
+    An item is stopped with the termination reason
+      - `"frame_budget"` once it produced more frames than `frame_budgets[key]`, e.g. a budget proportional to the
+        length of its text;
+      - `"repetition"` once the last `window` tokens repeat with a period of at most `max_period` frames;
+      - `"silence"` once the last `window` tokens take at most `max_distinct_tokens` values, as in long pauses or
+        noise loops.
+    Loop detection only runs with `detect_loops`. Items ending normally are recorded as `"eos"`, the other reasons
+    (`"max_new_tokens"`, `"stopped"`) are recorded by the caller with `finish`.
+
+    After an item has stopped, `reasons[key]` is its termination reason, `num_frames[key]` the number of its
+    frames worth keeping (the degenerate window of a loop is dropped) and `num_steps[key]` the number of talker steps
+    it ran for; `statistics` sums this up. `max_frames_per_token` for the frame budgets can be fitted to reference
+    data with `fit_max_frames_per_token`.
+
+    Parameters:
+        eos_token_id (`int`):
+            The codec end-of-speech token.
+        frame_budgets (`list[int]` or `dict`, *optional*):
+            Maximum number of frames per item key, `None` for no budget.
+        detect_loops (`bool`, *optional*, defaults to `True`):
+            Whether to stop items caught in repetition or silence loops.
+        window (`int`, *optional*, defaults to 50):
+            Number of frames (4 s at 12.5 Hz) a loop has to last before the item is stopped.
+        max_period (`int`, *optional*, defaults to 16):
+            Longest repeated pattern, in frames, detected as a repetition.
+        max_distinct_tokens (`int`, *optional*, defaults to 2):
+            A window with at most this many distinct tokens is detected as silence.
+    """
+
+    def __init__(
+        self,
+        eos_token_id: int,
+        frame_budgets=None,
+        detect_loops: bool = True,
+        window: int = 50,
+        max_period: int = 16,
+        max_distinct_tokens: int = 2,
+    ):
+        self.eos_token_id = eos_token_id
+        self.frame_budgets = frame_budgets
+        self.detect_loops = detect_loops
+        self.window = window
+        self.max_period = max_period
+        self.max_distinct_tokens = max_distinct_tokens
+        self.history = defaultdict(list)
+        # per item and period: number of consecutive tokens equal to the token `period` frames earlier
+        self.runs = defaultdict(lambda: [0] * (max_period + 1))
+        self.window_counts = defaultdict(Counter)
+        self.reasons = {}
+        self.num_frames = {}
+        self.num_steps = {}
+
+    @staticmethod
+    def frame_budget(max_frames_per_token: float, input_length: int) -> int:
+        """Frame budget of an item whose assistant text `input_ids` hold `input_length` tokens."""
+        # the text sits between 3 role tokens and 5 closing / assistant tokens
+        return math.ceil(max_frames_per_token * (max(input_length - 8, 0) + 1))
+
+    @staticmethod
+    def fit_max_frames_per_token(
+        input_lengths: list[int], frame_counts: list[int], quantile: float = 0.999, margin: float = 1.2
+    ) -> float:
+        """
+        Learn `max_frames_per_token` from reference pairs of assistant text `input_ids` lengths and the codec frame
+        counts of their recordings: the `quantile` of the frames per text token, times `margin`.
+        """
+        if not input_lengths or len(input_lengths) != len(frame_counts):
+            raise ValueError("`input_lengths` and `frame_counts` must be non-empty and of the same length.")
+        ratios = torch.tensor(
+            [
+                num_frames / Qwen3TTSRunawayDetector.frame_budget(1.0, length)
+                for length, num_frames in zip(input_lengths, frame_counts)
+            ],
+            dtype=torch.float64,
+        )
+        return torch.quantile(ratios, quantile).item() * margin
+
+    @property
+    def active(self) -> bool:
+        return self.frame_budgets is not None or self.detect_loops
+
+    def finish(self, key, reason: str, num_frames: int) -> bool:
+        """Record that item `key` terminated for `reason` with `num_frames` frames, unless it already stopped."""
+        if key not in self.reasons:
+            self.reasons[key] = reason
+            self.num_frames[key] = num_frames
+            self.num_steps[key] = max(len(self.history.get(key, ())), num_frames)
+        return True
+
+    def statistics(self, key, max_new_tokens: int) -> dict:
+        """
+        Termination `reason` of item `key`, the `num_frames` kept, the `num_steps` the talker ran and the
+        `steps_saved` against running to `max_new_tokens`, where a runaway item would otherwise end.
+        """
+        reason, num_steps = self.reasons[key], self.num_steps[key]
+        early_stop = reason in ("frame_budget", "repetition", "silence")
+        return {
+            "reason": reason,
+            "num_frames": self.num_frames[key],
+            "num_steps": num_steps,
+            "steps_saved": max(max_new_tokens - num_steps, 0) if early_stop else 0,
+        }
+
+    def update(self, key, token: int) -> bool:
+        """Feed the next first-codebook `token` of item `key`. Returns whether the item has to stop."""
+        if key in self.reasons:
+            return True
+        history = self.history[key]
+        if token == self.eos_token_id:
+            return self.finish(key, "eos", len(history))
+        history.append(token)
+        length = len(history)
+
+        budget = self.frame_budgets[key] if self.frame_budgets is not None else None
+        if budget is not None and length > budget:
+            return self.finish(key, "frame_budget", budget)
+        if not self.detect_loops:
+            return False
+
+        runs = self.runs[key]
+        for period in range(1, min(self.max_period, length - 1) + 1):
+            runs[period] = runs[period] + 1 if token == history[-1 - period] else 0
+            if runs[period] >= self.window:
+                return self.finish(key, "repetition", length - self.window)
+
+        counts = self.window_counts[key]
+        counts[token] += 1
+        if length > self.window:
+            expired = history[-1 - self.window]
+            counts[expired] -= 1
+            if counts[expired] == 0:
+                del counts[expired]
+        if length >= self.window and len(counts) <= self.max_distinct_tokens:
+            return self.finish(key, "silence", length - self.window)
+        return False
+
+
+class Qwen3TTSRunawayStoppingCriteria(StoppingCriteria):
+    """Stops the rows of a batched `generate()` flagged by a `Qwen3TTSRunawayDetector`, keyed by row index."""
+
+    def __init__(self, detector: Qwen3TTSRunawayDetector):
+        self.detector = detector
+
+    def __call__(self, input_ids: torch.LongTensor, scores: torch.FloatTensor, **kwargs) -> torch.BoolTensor:
+        stop = [self.detector.update(row, token) for row, token in enumerate(input_ids[:, -1].tolist())]
+        return torch.tensor(stop, device=input_ids.device, dtype=torch.bool)
+
+
 class Qwen3TTSTalkerDecoderLayer(GradientCheckpointingLayer):
     def __init__(self, config, layer_idx):
         super().__init__()
@@ -1422,6 +2164,7 @@ class Qwen3TTSTalkerModel(Qwen3TTSTalkerTextPreTrainedModel):
         self.gradient_checkpointing = False
         self.codec_embedding = nn.Embedding(config.vocab_size, config.hidden_size)
         self.text_embedding = nn.Embedding(config.text_vocab_size, config.text_hidden_size)
+        self._compiled_forward_layers = None
 
         # Initialize weights and apply final processing
         self.post_init()
@@ -1499,12 +2242,51 @@ class Qwen3TTSTalkerModel(Qwen3TTSTalkerTextPreTrainedModel):
             position_ids=text_position_ids,
         )
 
-        hidden_states = inputs_embeds
-
         # create position embeddings to be shared across the decoder layers
-        position_embeddings = self.rotary_emb(hidden_states, position_ids)
+        position_embeddings = self.rotary_emb(inputs_embeds, position_ids)
+
+        forward_layers = self._forward_layers
+        if (
+            self._compiled_forward_layers is not None
+            and inputs_embeds.shape[1] == 1
+            and isinstance(past_key_values, Cache)
+            and past_key_values.is_compileable
+        ):
+            forward_layers = self._compiled_forward_layers
+
+        hidden_states, all_hidden_states, all_self_attns = forward_layers(
+            inputs_embeds,
+            attention_mask=causal_mask,
+            position_ids=text_position_ids,
+            past_key_values=past_key_values,
+            output_attentions=output_attentions,
+            output_hidden_states=output_hidden_states,
+            use_cache=use_cache,
+            cache_position=cache_position,
+            position_embeddings=position_embeddings,
+            **flash_attn_kwargs,
+        )
 
-        # decoder layers
+        return BaseModelOutputWithPast(
+            last_hidden_state=hidden_states,
+            past_key_values=past_key_values,
+            hidden_states=all_hidden_states,
+            attentions=all_self_attns,
+        )
+
+    def _forward_layers(
+        self,
+        hidden_states: torch.Tensor,
+        attention_mask: Optional[torch.Tensor],
+        position_ids: torch.LongTensor,
+        past_key_values: Optional[Cache],
+        output_attentions: bool,
+        output_hidden_states: bool,
+        use_cache: bool,
+        cache_position: torch.LongTensor,
+        position_embeddings: tuple[torch.Tensor, torch.Tensor],
+        **flash_attn_kwargs: Unpack[FlashAttentionKwargs],
+    ):
         all_hidden_states = () if output_hidden_states else None
         all_self_attns = () if output_attentions else None
 
@@ -1514,8 +2296,8 @@ class Qwen3TTSTalkerModel(Qwen3TTSTalkerTextPreTrainedModel):
 
             layer_outputs = decoder_layer(
                 hidden_states,
-                attention_mask=causal_mask,
-                position_ids=text_position_ids,
+                attention_mask=attention_mask,
+                position_ids=position_ids,
                 past_key_values=past_key_values,
                 output_attentions=output_attentions,
                 use_cache=use_cache,
@@ -1535,12 +2317,16 @@ class Qwen3TTSTalkerModel(Qwen3TTSTalkerTextPreTrainedModel):
         if output_hidden_states:
             all_hidden_states += (hidden_states,)
 
-        return BaseModelOutputWithPast(
-            last_hidden_state=hidden_states,
-            past_key_values=past_key_values,
-            hidden_states=all_hidden_states,
-            attentions=all_self_attns,
-        )
+        return hidden_states, all_hidden_states, all_self_attns
+
+    def compile_decode_step(self, **compile_kwargs):
+        """
+        Compile the decoder layers for single-token decode steps with `torch.compile(**compile_kwargs)`.
+
+        The compiled graph is only used with a static (compileable) cache, whose fixed shapes let it be captured once
+        and reused for every step; prefill and dynamic-cache steps keep running eagerly.
+        """
+        self._compiled_forward_layers = torch.compile(self._forward_layers, **compile_kwargs)
 
 
 class Qwen3TTSTalkerForConditionalGeneration(Qwen3TTSTalkerTextPreTrainedModel, GenerationMixin):
@@ -1564,6 +2350,11 @@ class Qwen3TTSTalkerForConditionalGeneration(Qwen3TTSTalkerTextPreTrainedModel,
             talker_config=config
         )
         self.rope_deltas = None
+        # the top 1024 ids of the codec vocabulary are control tokens that are never sampled, except EOS
+        codec_suppress_mask = torch.zeros(config.vocab_size, dtype=torch.bool)
+        codec_suppress_mask[config.vocab_size - 1024 :] = True
+        codec_suppress_mask[config.codec_eos_token_id] = False
+        self.register_buffer("codec_suppress_mask", codec_suppress_mask, persistent=False)
 
         # Initialize weights and apply final processing
         self.post_init()
@@ -1635,6 +2426,8 @@ class Qwen3TTSTalkerForConditionalGeneration(Qwen3TTSTalkerTextPreTrainedModel,
         subtalker_top_p=None,
         subtalker_top_k=None,
         subtalker_temperature=None,
+        codec_streamer=None,
+        codec_accumulator=None,
         **kwargs,
     ) -> CausalLMOutputWithPast:
         r"""
@@ -1642,6 +2435,11 @@ class Qwen3TTSTalkerForConditionalGeneration(Qwen3TTSTalkerTextPreTrainedModel,
             Labels for computing the masked language modeling loss. Indices should either be in `[0, ...,
             config.vocab_size]` or -100 (see `input_ids` docstring). Tokens with indices set to `-100` are ignored
             (masked), the loss is only computed for the tokens with labels in `[0, ..., config.vocab_size]`.
+        codec_streamer (`Qwen3TTSCodecStreamer`, *optional*):
+            Receives every completed codec frame of shape `(batch_size, num_code_groups)` as soon as the code
+            predictor has filled in the residual codebooks.
+        codec_accumulator (`Qwen3TTSCodecAccumulator`, *optional*):
+            Stores every completed codec frame together with the talker hidden state it was predicted from.
         ```"""
         # Prefill
         if inputs_embeds is not None and inputs_embeds.shape[1] > 1:
@@ -1650,23 +2448,19 @@ class Qwen3TTSTalkerForConditionalGeneration(Qwen3TTSTalkerTextPreTrainedModel,
         # Generate
         else:
             last_id_hidden = self.get_input_embeddings()(input_ids)
-            predictor_result = self.code_predictor.generate(
-                inputs_embeds=torch.cat((past_hidden, last_id_hidden), dim=1),
-                max_new_tokens=self.config.num_code_groups - 1,
+            predictor_sequences, inputs_embeds = self.code_predictor.predict_codes(
+                past_hidden,
+                last_id_hidden,
                 do_sample=subtalker_dosample,
                 top_p=subtalker_top_p,
                 top_k=subtalker_top_k,
                 temperature=subtalker_temperature,
-                output_hidden_states=True,
-                return_dict_in_generate=True,
-            )
-            codec_ids = torch.cat((input_ids, predictor_result.sequences), dim=-1)
-            codec_hiddens = torch.cat(
-                [last_id_hidden]
-                + [self.code_predictor.get_input_embeddings()[i](predictor_result.sequences[..., i:i+1]) for i in range(self.config.num_code_groups - 1)],
-                dim=1,
             )
-            inputs_embeds = codec_hiddens.sum(1, keepdim=True)
+            codec_ids = torch.cat((input_ids, predictor_sequences), dim=-1)
+            if codec_accumulator is not None:
+                codec_accumulator.put(codec_ids, past_hidden)
+            if codec_streamer is not None:
+                codec_streamer.put(codec_ids)
 
             if generation_step < trailing_text_hidden.shape[1]:
                 inputs_embeds = inputs_embeds + trailing_text_hidden[:, generation_step].unsqueeze(1)
@@ -1677,11 +2471,14 @@ class Qwen3TTSTalkerForConditionalGeneration(Qwen3TTSTalkerTextPreTrainedModel,
                 cache_position is None
                 or (cache_position is not None and cache_position[0] == 0)
                 or self.rope_deltas is None
+                or generation_step == -1
             ):
                 delta0 = (1 - attention_mask).sum(dim=-1).unsqueeze(1)
                 position_ids, rope_deltas = self.get_rope_index(
                     attention_mask,
                 )
+                # a prompt prefix taken from a prefix cache is not fed again
+                position_ids = position_ids[..., -inputs_embeds.shape[1]:]
                 rope_deltas = rope_deltas - delta0
                 self.rope_deltas = rope_deltas
             else:
@@ -1781,6 +2578,11 @@ class Qwen3TTSTalkerForConditionalGeneration(Qwen3TTSTalkerTextPreTrainedModel,
 
         return position_ids, mrope_position_deltas
 
+    def create_masks_for_generate(self, attention_mask=None, **kwargs):
+        # `forward` needs the 2D padding mask to compute the multimodal rope positions, so it is passed through
+        # unchanged; `Qwen3TTSTalkerModel` builds the (fixed-shape, for static caches) 4D mask itself.
+        return attention_mask
+
     def _update_model_kwargs_for_generation(self, outputs, model_kwargs, is_encoder_decoder=False, num_new_tokens=1):
         model_kwargs = super()._update_model_kwargs_for_generation(
             outputs, model_kwargs, is_encoder_decoder, num_new_tokens
@@ -1792,6 +2594,663 @@ class Qwen3TTSTalkerForConditionalGeneration(Qwen3TTSTalkerTextPreTrainedModel,
         return model_kwargs
 
 
+class Qwen3TTSPrefixCache:
+    """
+    LRU cache of talker KV states for prompt prefixes shared between requests: the instruct text, the codec think /
+    language tags, the speaker embedding and, for voice clone ICL prompts, the reference text. Entries are keyed by a
+    hash of the prefix embeddings, so any prompt whose embeddings start with a cached prefix reuses its KV states.
+
+    `fork` returns a fresh `DynamicCache` holding the prefix, which the caller then extends with the rest of its
+    prompt; the cached states themselves are never modified. The cache may be shared by concurrent `generate` calls:
+    lookups, inserts and evictions hold a lock, the prefill of a missing prefix runs outside it.
+    """
+
+    def __init__(self, max_entries: int = 8):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(prefix_embeds: torch.Tensor) -> str:
+        data = prefix_embeds.detach().contiguous().view(torch.uint8).cpu().numpy()
+        return f"{tuple(prefix_embeds.shape)}-{prefix_embeds.dtype}-{hashlib.sha1(data.tobytes()).hexdigest()}"
+
+    @torch.no_grad()
+    def fork(self, talker: "Qwen3TTSTalkerForConditionalGeneration", prefix_embeds: torch.Tensor) -> DynamicCache:
+        """
+        Return a new cache holding the talker KV states of `prefix_embeds` (shape `(1, prefix_length, hidden_size)`),
+        running the talker over the prefix only if it is not cached yet.
+        """
+        key = self._key(prefix_embeds)
+        with self._lock:
+            states = self.entries.get(key)
+            if states is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self.entries.move_to_end(key)
+        if states is None:
+            prefix_cache = DynamicCache()
+            talker.model(inputs_embeds=prefix_embeds, past_key_values=prefix_cache, use_cache=True)
+            states = [(layer.keys, layer.values) for layer in prefix_cache.layers]
+            with self._lock:
+                self.entries[key] = states
+                self.entries.move_to_end(key)
+                while len(self.entries) > self.max_entries:
+                    self.entries.popitem(last=False)
+
+        past_key_values = DynamicCache()
+        for layer_idx, (keys, values) in enumerate(states):
+            past_key_values.update(keys, values, layer_idx)
+        return past_key_values
+
+    def clear(self) -> None:
+        with self._lock:
+            self.entries.clear()
+
+
+class Qwen3TTSContinuousBatchingEngine:
+    """
+    Continuous batching for the talker. Up to `max_batch_size` requests are decoded together; a request leaves the
+    batch as soon as it emits `eos_token_id` (or reaches `max_new_tokens`, or is stopped by `runaway_detector`) and
+    queued requests are admitted into the freed slots between decode steps, so short requests no longer idle until the
+    longest one of a static batch is done.
+
+    Every slot owns its KV cache row, rope position and trailing text conditioning. Active slots are kept in the first
+    rows of the batch: when a request finishes, the last active slot is moved into its row. Sampling of the first
+    codebook follows `Qwen3TTSForConditionalGeneration.generate` (repetition penalty over the generated tokens,
+    `min_new_tokens`, suppressed tokens, then temperature / top-k / top-p), the residual codebooks are sampled by the
+    code predictor.
+
+    Example:
+        engine = Qwen3TTSContinuousBatchingEngine(model.talker, tts_pad_embed, max_batch_size=8)
+        for index, (inputs_embeds, trailing_text_hidden) in enumerate(prompts):
+            engine.add_request(index, inputs_embeds, trailing_text_hidden)
+        for request_id, codes, hidden_states in engine.run():
+            ...
+    """
+
+    def __init__(
+        self,
+        talker: "Qwen3TTSTalkerForConditionalGeneration",
+        tts_pad_embed: torch.Tensor,
+        max_batch_size: int = 8,
+        max_new_tokens: int = 4096,
+        min_new_tokens: int = 2,
+        do_sample: bool = True,
+        top_k: int = 50,
+        top_p: float = 1.0,
+        temperature: float = 0.9,
+        subtalker_dosample: bool = True,
+        subtalker_top_k: int = 50,
+        subtalker_top_p: float = 1.0,
+        subtalker_temperature: float = 0.9,
+        eos_token_id: Optional[int] = None,
+        repetition_penalty: float = 1.0,
+        suppress_mask: Optional[torch.Tensor] = None,
+        max_cache_len: Optional[int] = None,
+        return_hidden_states: bool = False,
+        prefix_cache: Optional[Qwen3TTSPrefixCache] = None,
+        runaway_detector: Optional[Qwen3TTSRunawayDetector] = None,
+    ):
+        if max_batch_size < 1:
+            raise ValueError(f"`max_batch_size` must be >= 1, got {max_batch_size}.")
+        config = talker.config
+        self.talker = talker
+        self.max_batch_size = max_batch_size
+        self.max_new_tokens = max_new_tokens
+        self.min_new_tokens = min_new_tokens
+        self.do_sample = do_sample
+        self.top_k = top_k
+        self.top_p = top_p
+        self.temperature = temperature
+        self.subtalker_kwargs = {
+            "do_sample": subtalker_dosample,
+            "top_k": subtalker_top_k,
+            "top_p": subtalker_top_p,
+            "temperature": subtalker_temperature,
+        }
+        self.eos_token_id = eos_token_id if eos_token_id is not None else config.codec_eos_token_id
+        self.repetition_penalty = repetition_penalty
+        self.return_hidden_states = return_hidden_states
+        self.prefix_cache = prefix_cache
+        # keyed by request id; also stops requests early and records their termination reasons
+        self.runaway_detector = runaway_detector
+
+        self.device, self.dtype = tts_pad_embed.device, tts_pad_embed.dtype
+        num_slots, hidden_size = max_batch_size, config.hidden_size
+        self.cache = Cache(
+            layers=[Qwen3TTSSlotLayer(num_slots, max_cache_len) for _ in range(config.num_hidden_layers)]
+        )
+        self.suppress_mask = (talker.codec_suppress_mask if suppress_mask is None else suppress_mask).to(self.device)
+
+        # per-slot state, row `i` belongs to `self.request_ids[i]`
+        self.tokens = torch.zeros(num_slots, dtype=torch.long, device=self.device)
+        self.past_hidden = torch.zeros(num_slots, 1, hidden_size, dtype=self.dtype, device=self.device)
+        self.seen_tokens = torch.zeros(num_slots, config.vocab_size, dtype=torch.bool, device=self.device)
+        self.frames = torch.zeros(
+            num_slots, max_new_tokens, config.num_code_groups, dtype=torch.long, device=self.device
+        )
+        self.frame_hidden_states = None
+        if return_hidden_states:
+            self.frame_hidden_states = torch.zeros(
+                num_slots, max_new_tokens, hidden_size, dtype=self.dtype, device=self.device
+            )
+        # trailing text hiddens, padded with `tts_pad_embed`; the last column is always padding
+        self.tts_pad_embed = tts_pad_embed.reshape(1, 1, hidden_size)
+        self.text_hiddens = self.tts_pad_embed.expand(num_slots, 1, hidden_size).clone()
+        self.request_ids = []
+        self.cache_lengths = []
+        self.num_frames = []
+
+        self.queue = deque()
+
+    @property
+    def num_active(self) -> int:
+        return len(self.request_ids)
+
+    def add_request(
+        self,
+        request_id,
+        inputs_embeds: torch.Tensor,
+        trailing_text_hidden: torch.Tensor,
+        prefix_length: int = 0,
+    ) -> None:
+        """
+        Queue a request. `inputs_embeds` of shape `(1, prompt_length, hidden_size)` is the talker prompt and
+        `trailing_text_hidden` of shape `(1, text_length, hidden_size)` the text added to the generated frames. With a
+        `prefix_cache`, the KV states of the first `prefix_length` prompt positions are taken from the cache.
+        """
+        self.queue.append((request_id, inputs_embeds, trailing_text_hidden, prefix_length))
+
+    def has_unfinished_requests(self) -> bool:
+        return bool(self.queue) or self.num_active > 0
+
+    @torch.no_grad()
+    def step(self) -> list[tuple[Any, torch.Tensor, Optional[torch.Tensor]]]:
+        """
+        Admit queued requests into free slots, then run one decode step for all active slots.
+
+        Returns:
+            The requests finished during this step as `(request_id, codes, hidden_states)` tuples, with `codes` of
+            shape `(num_frames, num_code_groups)` and `hidden_states` of shape `(num_frames, hidden_size)` (`None`
+            unless `return_hidden_states`).
+        """
+        finished = []
+        while self.queue and self.num_active < self.max_batch_size:
+            finished.extend(self._prefill(*self.queue.popleft()))
+        if self.num_active > 0:
+            finished.extend(self._decode())
+        return finished
+
+    def run(self) -> Iterator[tuple[Any, torch.Tensor, Optional[torch.Tensor]]]:
+        """Step until every queued request is finished, yielding the requests in the order they finish."""
+        while self.has_unfinished_requests():
+            yield from self.step()
+
+    def _prefill(self, request_id, inputs_embeds, trailing_text_hidden, prefix_length):
+        slot = self.num_active
+        if self.prefix_cache is not None and prefix_length > 0:
+            prompt_cache = self.prefix_cache.fork(self.talker, inputs_embeds[:, :prefix_length])
+        else:
+            prompt_cache = DynamicCache()
+        outputs = self.talker.model(
+            inputs_embeds=inputs_embeds[:, prompt_cache.get_seq_length():],
+            past_key_values=prompt_cache,
+            use_cache=True,
+        )
+        for layer, prompt_layer in zip(self.cache.layers, prompt_cache.layers):
+            layer.write(slot, prompt_layer.keys, prompt_layer.values)
+
+        text_length = trailing_text_hidden.shape[1]
+        if text_length >= self.text_hiddens.shape[1]:
+            text_hiddens = self.tts_pad_embed.expand(self.max_batch_size, text_length + 1, -1).clone()
+            text_hiddens[:, : self.text_hiddens.shape[1]] = self.text_hiddens
+            self.text_hiddens = text_hiddens
+        self.text_hiddens[slot] = self.tts_pad_embed[0]
+        self.text_hiddens[slot, :text_length] = trailing_text_hidden[0]
+
+        self.seen_tokens[slot] = False
+        self.past_hidden[slot] = outputs.last_hidden_state[0, -1:]
+        self.request_ids.append(request_id)
+        self.cache_lengths.append(inputs_embeds.shape[1])
+        self.num_frames.append(0)
+
+        logits = self.talker.codec_head(outputs.last_hidden_state[:, -1]).float()
+        token = self._sample(logits, slice(slot, slot + 1))
+        if self._should_stop(slot, token.item()):
+            return self._evict([slot])
+        return []
+
+    def _decode(self):
+        batch_size = self.num_active
+        rows = torch.arange(batch_size, device=self.device)
+        frame_index = torch.tensor(self.num_frames, device=self.device)
+        positions = torch.tensor(self.cache_lengths, device=self.device)
+
+        tokens = self.tokens[:batch_size]
+        past_hidden = self.past_hidden[:batch_size]
+        predictor_sequences, inputs_embeds = self.talker.code_predictor.predict_codes(
+            past_hidden, self.talker.get_input_embeddings()(tokens.unsqueeze(1)), **self.subtalker_kwargs
+        )
+        self.frames[rows, frame_index] = torch.cat((tokens.unsqueeze(1), predictor_sequences), dim=-1)
+        if self.frame_hidden_states is not None:
+            self.frame_hidden_states[rows, frame_index] = past_hidden[:, 0]
+        text_index = frame_index.clamp(max=self.text_hiddens.shape[1] - 1)
+        inputs_embeds = inputs_embeds + self.text_hiddens[rows, text_index].unsqueeze(1)
+
+        kv_length = max(self.cache_lengths) + 1
+        for layer in self.cache.layers:
+            layer.reserve(kv_length)
+            layer.kv_length = kv_length
+        # every slot prefilled alone, so its text position is its cache length
+        position_ids = positions.view(1, -1, 1).expand(3, -1, -1)
+        hidden_states, _, _ = self.talker.model._forward_layers(
+            inputs_embeds,
+            attention_mask=self._attention_mask(positions, kv_length),
+            position_ids=position_ids[0],
+            past_key_values=self.cache,
+            output_attentions=False,
+            output_hidden_states=False,
+            use_cache=True,
+            cache_position=positions,
+            position_embeddings=self.talker.model.rotary_emb(inputs_embeds, position_ids),
+        )
+        self.past_hidden[:batch_size] = hidden_states[:, -1:]
+        for slot in range(batch_size):
+            self.cache_lengths[slot] += 1
+            self.num_frames[slot] += 1
+
+        logits = self.talker.codec_head(hidden_states[:, -1]).float()
+        next_tokens = self._sample(logits, slice(0, batch_size)).tolist()
+        finished = [slot for slot, token in enumerate(next_tokens) if self._should_stop(slot, token)]
+        return self._evict(finished)
+
+    def _should_stop(self, slot: int, token: int) -> bool:
+        detector = self.runaway_detector
+        if detector is not None and detector.update(self.request_ids[slot], token):
+            return True
+        if token == self.eos_token_id:
+            return True
+        if self.num_frames[slot] + 1 >= self.max_new_tokens:
+            if detector is not None:
+                detector.finish(self.request_ids[slot], "max_new_tokens", self.num_frames[slot])
+            return True
+        return False
+
+    def _attention_mask(self, positions: torch.Tensor, kv_length: int) -> torch.Tensor:
+        valid = torch.arange(kv_length, device=self.device) <= positions.unsqueeze(1)
+        attn_implementation = self.talker.config._attn_implementation
+        if "flash" in attn_implementation:
+            # flash attention unpads the keys with a 2D padding mask
+            return valid
+        if attn_implementation == "eager":
+            mask = torch.zeros(valid.shape, dtype=self.dtype, device=self.device)
+            return mask.masked_fill_(~valid, torch.finfo(self.dtype).min)[:, None, None, :]
+        return valid[:, None, None, :]
+
+    def _sample(self, logits: torch.Tensor, slots: slice) -> torch.LongTensor:
+        # tokens generated so far: the prefill token plus one per completed frame
+        too_short = [num_frames < self.min_new_tokens for num_frames in self.num_frames[slots]]
+        logits = apply_codec_penalties(
+            logits,
+            self.seen_tokens[slots],
+            self.repetition_penalty,
+            self.suppress_mask,
+            self.eos_token_id,
+            suppress_eos=torch.tensor(too_short, device=self.device) if any(too_short) else None,
+        )
+        tokens = sample_codec_token(
+            logits, do_sample=self.do_sample, top_k=self.top_k, top_p=self.top_p, temperature=self.temperature
+        )
+        self.tokens[slots] = tokens
+        self.seen_tokens[slots].scatter_(1, tokens.unsqueeze(1), True)
+        return tokens
+
+    def _evict(self, slots: list[int]):
+        finished = []
+        for slot in sorted(slots, reverse=True):
+            num_frames = self.num_frames[slot]
+            if self.runaway_detector is not None:
+                num_frames = min(num_frames, self.runaway_detector.num_frames.get(self.request_ids[slot], num_frames))
+            hidden_states = None
+            if self.frame_hidden_states is not None:
+                hidden_states = self.frame_hidden_states[slot, :num_frames].clone()
+            finished.append((self.request_ids[slot], self.frames[slot, :num_frames].clone(), hidden_states))
+
+            last = self.num_active - 1
+            if slot != last:
+                self._move_slot(last, slot)
+            self.request_ids.pop()
+            self.cache_lengths.pop()
+            self.num_frames.pop()
+        return finished
+
+    def _move_slot(self, source: int, target: int) -> None:
+        for layer in self.cache.layers:
+            layer.move(source, target, self.cache_lengths[source])
+        num_frames = self.num_frames[source]
+        self.frames[target, :num_frames] = self.frames[source, :num_frames]
+        if self.frame_hidden_states is not None:
+            self.frame_hidden_states[target, :num_frames] = self.frame_hidden_states[source, :num_frames]
+        for buffer in (self.tokens, self.past_hidden, self.seen_tokens, self.text_hiddens):
+            buffer[target] = buffer[source]
+        self.request_ids[target] = self.request_ids[source]
+        self.cache_lengths[target] = self.cache_lengths[source]
+        self.num_frames[target] = self.num_frames[source]
+
+
+class Qwen3TTSSpeculativeDecoder:
+    """
+    Speculative decoding of one item with a smaller draft talker (e.g. 0.6B drafting for 1.7B).
+
+    Every round the draft talker and its code predictor propose up to `num_draft_frames` complete codec frames. The
+    target talker scores all proposed first-codebook tokens in one forward pass and the target code predictor scores
+    the residual codes of each frame in one teacher-forced pass. The proposed codes are accepted left to right with
+    the speculative sampling rule (accept with probability `min(1, p / q)`, otherwise resample from
+    `max(0, p - q)`), so the generated frames follow the distribution of the target model exactly. The code predictor
+    only runs autoregressively for the remainder of a frame whose proposal was rejected.
+
+    `stats` counts proposed and accepted frames across calls; `acceptance_rate` is their ratio.
+    """
+
+    def __init__(
+        self,
+        talker: "Qwen3TTSTalkerForConditionalGeneration",
+        draft_talker: "Qwen3TTSTalkerForConditionalGeneration",
+        num_draft_frames: int = 4,
+        max_new_tokens: int = 4096,
+        min_new_tokens: int = 2,
+        do_sample: bool = True,
+        top_k: int = 50,
+        top_p: float = 1.0,
+        temperature: float = 0.9,
+        subtalker_dosample: bool = True,
+        subtalker_top_k: int = 50,
+        subtalker_top_p: float = 1.0,
+        subtalker_temperature: float = 0.9,
+        eos_token_id: Optional[int] = None,
+        repetition_penalty: float = 1.0,
+        suppress_mask: Optional[torch.Tensor] = None,
+    ):
+        config, draft_config = talker.config, draft_talker.config
+        if (
+            config.vocab_size != draft_config.vocab_size
+            or config.num_code_groups != draft_config.num_code_groups
+            or config.code_predictor_config.vocab_size != draft_config.code_predictor_config.vocab_size
+            or config.codec_eos_token_id != draft_config.codec_eos_token_id
+        ):
+            raise ValueError("The draft talker must share the codec vocabulary and code groups of the target talker.")
+        if num_draft_frames < 1:
+            raise ValueError(f"`num_draft_frames` must be >= 1, got {num_draft_frames}.")
+        self.talker = talker
+        self.draft_talker = draft_talker
+        self.num_draft_frames = num_draft_frames
+        self.max_new_tokens = max_new_tokens
+        self.min_new_tokens = min_new_tokens
+        self.sampling_kwargs = {"do_sample": do_sample, "top_k": top_k, "top_p": top_p, "temperature": temperature}
+        self.subtalker_kwargs = {
+            "do_sample": subtalker_dosample,
+            "top_k": subtalker_top_k,
+            "top_p": subtalker_top_p,
+            "temperature": subtalker_temperature,
+        }
+        self.eos_token_id = eos_token_id if eos_token_id is not None else config.codec_eos_token_id
+        self.repetition_penalty = repetition_penalty
+        self.suppress_mask = talker.codec_suppress_mask if suppress_mask is None else suppress_mask
+        self.stats = {"rounds": 0, "proposed_frames": 0, "accepted_frames": 0}
+
+    @property
+    def acceptance_rate(self) -> float:
+        return self.stats["accepted_frames"] / max(self.stats["proposed_frames"], 1)
+
+    def _first_code_probs(self, logits: torch.Tensor, seen_tokens: torch.Tensor, num_frames: int) -> torch.Tensor:
+        logits = apply_codec_penalties(
+            logits.clone(),
+            seen_tokens.unsqueeze(0),
+            self.repetition_penalty,
+            self.suppress_mask,
+            self.eos_token_id,
+            suppress_eos=torch.tensor([num_frames < self.min_new_tokens], device=logits.device),
+        )
+        return codec_token_probs(logits, **self.sampling_kwargs)[0]
+
+    @staticmethod
+    def _sample(probs: torch.Tensor, do_sample: bool) -> int:
+        if do_sample:
+            return torch.multinomial(probs, num_samples=1).item()
+        return probs.argmax().item()
+
+    def _resample(self, target_probs: torch.Tensor, draft_probs: torch.Tensor, do_sample: bool) -> int:
+        # the correction after a rejection is drawn from max(0, p - q)
+        residual = (target_probs - draft_probs).clamp_min(0)
+        if residual.sum() <= 0:
+            residual = target_probs
+        return self._sample(residual / residual.sum(), do_sample)
+
+    @staticmethod
+    def _frame_embeds(talker: "Qwen3TTSTalkerForConditionalGeneration", codes: torch.LongTensor) -> torch.Tensor:
+        # talker input of frames `codes` of shape `(num_frames, num_code_groups)`, as `(1, num_frames, hidden_size)`
+        embeds = talker.get_input_embeddings()(codes[:, 0])
+        for step in range(codes.shape[1] - 1):
+            embeds = embeds + talker.code_predictor.get_input_embeddings()[step](codes[:, step + 1])
+        return embeds.unsqueeze(0)
+
+    @staticmethod
+    def _text_hiddens(
+        trailing_text_hidden: torch.Tensor, tts_pad_embed: torch.Tensor, start: int, length: int
+    ) -> torch.Tensor:
+        text_hiddens = trailing_text_hidden[:, start : start + length]
+        if text_hiddens.shape[1] < length:
+            pad = tts_pad_embed.expand(1, length - text_hiddens.shape[1], -1)
+            text_hiddens = torch.cat((text_hiddens, pad), dim=1)
+        return text_hiddens
+
+    @torch.no_grad()
+    def generate(
+        self,
+        inputs_embeds: torch.Tensor,
+        trailing_text_hidden: torch.Tensor,
+        tts_pad_embed: torch.Tensor,
+        draft_inputs_embeds: torch.Tensor,
+        draft_trailing_text_hidden: torch.Tensor,
+        draft_tts_pad_embed: torch.Tensor,
+        past_key_values: Optional[Cache] = None,
+        codec_streamer: Optional[Qwen3TTSCodecStreamer] = None,
+        runaway_detector: Optional[Qwen3TTSRunawayDetector] = None,
+        request_id=0,
+    ) -> tuple[torch.LongTensor, torch.Tensor]:
+        """
+        Generate the codec frames of one item from the target prompt (`inputs_embeds`, `trailing_text_hidden`,
+        `tts_pad_embed`) and the draft prompt (`draft_*`) built from the same inputs, both with batch size 1.
+        `past_key_values` may already hold a prefix of the target prompt. With `runaway_detector`, the item is fed to
+        it as `request_id`, which may stop it early and records its termination reason.
+
+        Returns:
+            The codes of shape `(num_frames, num_code_groups)` and the target hidden states the frames were predicted
+            from, of shape `(num_frames, hidden_size)`.
+        """
+        talker, draft_talker = self.talker, self.draft_talker
+        do_sample = self.sampling_kwargs["do_sample"]
+        subtalker_do_sample = self.subtalker_kwargs["do_sample"]
+        num_residuals = talker.config.num_code_groups - 1
+        max_frames = self.max_new_tokens - 1
+        device = inputs_embeds.device
+
+        target_cache = past_key_values if past_key_values is not None else DynamicCache()
+        hidden = talker.model(
+            inputs_embeds=inputs_embeds[:, target_cache.get_seq_length() :],
+            past_key_values=target_cache,
+            use_cache=True,
+        ).last_hidden_state[:, -1:]
+        draft_cache = DynamicCache()
+        draft_hidden = draft_talker.model(
+            inputs_embeds=draft_inputs_embeds, past_key_values=draft_cache, use_cache=True
+        ).last_hidden_state[:, -1:]
+
+        seen_tokens = torch.zeros(talker.config.vocab_size, dtype=torch.bool, device=device)
+        frames, frame_hidden_states = [], []
+        finished = False
+        while not finished and len(frames) < max_frames:
+            if codec_streamer is not None and codec_streamer.stopped:
+                break
+            num_frames = len(frames)
+            target_length, draft_length = target_cache.get_seq_length(), draft_cache.get_seq_length()
+
+            # draft up to `num_draft_frames` complete frames; a drafted EOS ends the proposal
+            proposals, draft_first_probs, draft_residual_probs = [], [], []
+            draft_seen_tokens = seen_tokens.clone()
+            for index in range(num_frames, min(num_frames + self.num_draft_frames, max_frames)):
+                logits = draft_talker.codec_head(draft_hidden[:, -1]).float()
+                draft_first_probs.append(self._first_code_probs(logits, draft_seen_tokens, index))
+                first_code = torch.tensor(
+                    [[self._sample(draft_first_probs[-1], do_sample)]], dtype=torch.long, device=device
+                )
+                if first_code.item() == self.eos_token_id:
+                    proposals.append(first_code)
+                    break
+                draft_seen_tokens[first_code] = True
+                codes, codec_hidden, probs = draft_talker.code_predictor.predict_codes(
+                    draft_hidden,
+                    draft_talker.get_input_embeddings()(first_code),
+                    return_probs=True,
+                    **self.subtalker_kwargs,
+                )
+                proposals.append(torch.cat((first_code, codes), dim=1))
+                draft_residual_probs.append(probs[0])
+                draft_hidden = draft_talker.model(
+                    inputs_embeds=codec_hidden
+                    + self._text_hiddens(draft_trailing_text_hidden, draft_tts_pad_embed, index, 1),
+                    past_key_values=draft_cache,
+                    use_cache=True,
+                ).last_hidden_state[:, -1:]
+
+            # score every proposed frame with the target in one talker and one code predictor pass
+            full_frames = torch.cat([p for p in proposals if p.shape[1] > 1], dim=0) if draft_residual_probs else None
+            target_hiddens = hidden
+            if full_frames is not None:
+                num_full = full_frames.shape[0]
+                verify_hidden = talker.model(
+                    inputs_embeds=self._frame_embeds(talker, full_frames)
+                    + self._text_hiddens(trailing_text_hidden, tts_pad_embed, num_frames, num_full),
+                    past_key_values=target_cache,
+                    use_cache=True,
+                ).last_hidden_state
+                target_hiddens = torch.cat((hidden, verify_hidden), dim=1)
+                target_residual_logits = talker.code_predictor.residual_logits(
+                    target_hiddens[0, :num_full].unsqueeze(1),
+                    talker.get_input_embeddings()(full_frames[:, :1]),
+                    full_frames[:, 1:],
+                )
+            target_first_logits = talker.codec_head(target_hiddens[0]).float()
+
+            self.stats["rounds"] += 1
+            self.stats["proposed_frames"] += len(proposals)
+            correction = None
+            for offset, proposal in enumerate(proposals):
+                index = num_frames + offset
+                past_hidden = target_hiddens[:, offset : offset + 1]
+                target_probs = self._first_code_probs(target_first_logits[offset : offset + 1], seen_tokens, index)
+                draft_probs = draft_first_probs[offset]
+                first_code = proposal[0, 0].item()
+                prefix_codes = None
+                if torch.rand((), device=device) * draft_probs[first_code] < target_probs[first_code]:
+                    if first_code == self.eos_token_id:
+                        self.stats["accepted_frames"] += 1
+                        if runaway_detector is not None:
+                            runaway_detector.update(request_id, first_code)
+                        finished = True
+                        break
+                    codes = proposal[0, 1:]
+                    target_residual_probs = codec_token_probs(target_residual_logits[offset], **self.subtalker_kwargs)
+                    draft_residual = draft_residual_probs[offset]
+                    steps = torch.arange(num_residuals, device=device)
+                    accepted = (
+                        torch.rand(num_residuals, device=device) * draft_residual[steps, codes]
+                        < target_residual_probs[steps, codes]
+                    )
+                    rejected = (~accepted).nonzero()
+                    if rejected.numel() == 0:
+                        seen_tokens[first_code] = True
+                        frames.append(proposal)
+                        frame_hidden_states.append(past_hidden[0])
+                        if codec_streamer is not None:
+                            codec_streamer.put(proposal)
+                        self.stats["accepted_frames"] += 1
+                        if runaway_detector is not None and runaway_detector.update(request_id, first_code):
+                            finished = True
+                            break
+                        continue
+                    step = rejected[0].item()
+                    code = self._resample(target_residual_probs[step], draft_residual[step], subtalker_do_sample)
+                    prefix_codes = torch.cat((codes[:step], codes.new_tensor([code]))).unsqueeze(0)
+                else:
+                    first_code = self._resample(target_probs, draft_probs, do_sample)
+                    if first_code == self.eos_token_id:
+                        if runaway_detector is not None:
+                            runaway_detector.update(request_id, first_code)
+                        finished = True
+                        break
+
+                # the rejected frame is completed by the target code predictor
+                seen_tokens[first_code] = True
+                if runaway_detector is not None and runaway_detector.update(request_id, first_code):
+                    finished = True
+                    break
+                first_code = torch.tensor([[first_code]], dtype=torch.long, device=device)
+                codes, _ = talker.code_predictor.predict_codes(
+                    past_hidden,
+                    talker.get_input_embeddings()(first_code),
+                    prefix_codes=prefix_codes,
+                    **self.subtalker_kwargs,
+                )
+                correction = torch.cat((first_code, codes), dim=1)
+                frames.append(correction)
+                frame_hidden_states.append(past_hidden[0])
+                if codec_streamer is not None:
+                    codec_streamer.put(correction)
+                break
+
+            if finished:
+                break
+            if correction is None:
+                hidden = target_hiddens[:, -1:]
+                continue
+            # roll both caches back to the accepted frames and feed the corrected one
+            num_accepted = len(frames) - 1 - num_frames
+            target_cache.crop(target_length + num_accepted)
+            draft_cache.crop(draft_length + num_accepted)
+            index = len(frames) - 1
+            hidden = talker.model(
+                inputs_embeds=self._frame_embeds(talker, correction)
+                + self._text_hiddens(trailing_text_hidden, tts_pad_embed, index, 1),
+                past_key_values=target_cache,
+                use_cache=True,
+            ).last_hidden_state[:, -1:]
+            draft_hidden = draft_talker.model(
+                inputs_embeds=self._frame_embeds(draft_talker, correction)
+                + self._text_hiddens(draft_trailing_text_hidden, draft_tts_pad_embed, index, 1),
+                past_key_values=draft_cache,
+                use_cache=True,
+            ).last_hidden_state[:, -1:]
+
+        if runaway_detector is not None:
+            stopped = codec_streamer is not None and codec_streamer.stopped
+            runaway_detector.finish(request_id, "stopped" if stopped else "max_new_tokens", len(frames))
+            num_kept = runaway_detector.num_frames[request_id]
+            del frames[num_kept:], frame_hidden_states[num_kept:]
+
+        num_code_groups = num_residuals + 1
+        if not frames:
+            return (
+                torch.zeros((0, num_code_groups), dtype=torch.long, device=device),
+                hidden.new_zeros((0, hidden.shape[-1])),
+            )
+        return torch.cat(frames, dim=0), torch.cat(frame_hidden_states, dim=0)
+
+
 class Qwen3TTSForConditionalGeneration(Qwen3TTSPreTrainedModel, GenerationMixin):
     config_class = Qwen3TTSConfig
 
@@ -1808,6 +3267,12 @@ class Qwen3TTSForConditionalGeneration(Qwen3TTSPreTrainedModel, GenerationMixin)
 
         self.speech_tokenizer = None
         self.generate_config = None
+        self.prefix_cache = None
+        self.speculative_stats = None
+        self.termination_reasons = None
+        self.termination_stats = None
+        # (weights key, embeddings of the constant prompt tokens), see `_prompt_embeddings`
+        self._prompt_embedding_cache = None
 
         self.supported_speakers = self.config.talker_config.spk_id.keys()
         self.supported_languages = ["auto"]
@@ -1827,7 +3292,80 @@ class Qwen3TTSForConditionalGeneration(Qwen3TTSPreTrainedModel, GenerationMixin)
     
     def load_generate_config(self, generate_config):
         self.generate_config = generate_config
-    
+
+    def compile_decode_steps(self, **compile_kwargs):
+        """
+        Compile the fixed-shape decode steps of the talker and of the code predictor with `torch.compile`.
+
+        The compiled talker step is used by `generate(..., cache_implementation="static")`; the code predictor then
+        switches to static cache layers as well. `compile_kwargs` are forwarded to `torch.compile`
+        (e.g. `mode="reduce-overhead"` on CUDA).
+        """
+        self.talker.model.compile_decode_step(**compile_kwargs)
+        self.talker.code_predictor.model.compile_decode_step(**compile_kwargs)
+
+    def enable_prefix_cache(self, max_entries: int = 8):
+        """
+        Reuse the talker KV states of prompt prefixes across `generate` calls: the instruct text, the codec think /
+        language tags and the speaker (and, for ICL voice clone, the reference text) are prefilled once per distinct
+        prefix and forked for every later request sharing it. Applies to single-item calls and to continuous batching
+        (`max_batch_size`). Set `self.prefix_cache = None` to disable it again.
+        """
+        if self.prefix_cache is None:
+            self.prefix_cache = Qwen3TTSPrefixCache(max_entries)
+        else:
+            self.prefix_cache.max_entries = max_entries
+
+    def quantize_weights(
+        self,
+        bits: int = 8,
+        group_size: int = 128,
+        include_speech_tokenizer: bool = False,
+        cache_path: Optional[str] = None,
+        cache_version: Optional[str] = None,
+    ) -> int:
+        """
+        Replace the linear layers of the talker (transformer, `text_projection`, `codec_head`) and of the code
+        predictor (transformer and `lm_head`s) by weight-only int8 or int4 layers, see `Qwen3TTSWeightOnlyLinear`.
+        The kernels are CPU only, so the model has to be on CPU.
+
+        Args:
+            bits (`int`, *optional*, defaults to 8):
+                8 for per-channel int8 weights, 4 for int4 weights with one scale and zero point per `group_size`
+                input features.
+            group_size (`int`, *optional*, defaults to 128):
+                Group size of the int4 scales. Layers whose input size is not a multiple of it stay in floating point.
+            include_speech_tokenizer (`bool`, *optional*, defaults to `False`):
+                Quantize the linear layers of the codec decoder too. Off by default since the decoder is dominated by
+                convolutions and its output is the most sensitive to weight noise.
+            cache_path (`str`, *optional*):
+                Safetensors file to read the quantized weights from, or to write them to when it does not exist yet
+                or was written for other weights. It only skips the quantization pass, the float weights are still
+                loaded first.
+            cache_version (`str`, *optional*):
+                Version of the float weights stored in the cache file, e.g. the checkpoint's mtime. A cache written
+                for another version is ignored and overwritten.
+
+        Returns:
+            `int`: The number of quantized layers.
+        """
+        if self.talker.device.type != "cpu":
+            raise ValueError(f"Weight-only quantization runs on CPU only, the model is on {self.talker.device}.")
+        modules = {"talker": self.talker}
+        if include_speech_tokenizer:
+            if self.speech_tokenizer is None:
+                raise ValueError("`include_speech_tokenizer=True` requires a loaded speech tokenizer.")
+            modules["speech_tokenizer.decoder"] = self.speech_tokenizer.model.decoder
+        num_layers = quantize_linear_layers(
+            modules, bits=bits, group_size=group_size, cache_path=cache_path, cache_version=cache_version
+        )
+
+        # prefix KV states were computed with the float weights (the prompt embeddings follow the weights by themselves)
+        if self.prefix_cache is not None:
+            self.prefix_cache.clear()
+        logger.info(f"Quantized {num_layers} linear layers to int{bits}.")
+        return num_layers
+
     def get_supported_speakers(self):
         return self.supported_speakers
     
@@ -1946,6 +3484,7 @@ class Qwen3TTSForConditionalGeneration(Qwen3TTSPreTrainedModel, GenerationMixin)
             self.talker.get_text_embeddings()(torch.cat([ref_id, text_id], 
                                                             dim=-1)))
         text_embed = torch.cat([text_embed, tts_eos_embed], dim=1)
+        prompt_embeddings = self._prompt_embeddings()
         # codec embed (codec bos + codec) 1 T2 D
         codec_embed = []
         for i in range(self.talker.config.num_code_groups):
@@ -1954,28 +3493,12 @@ class Qwen3TTSForConditionalGeneration(Qwen3TTSPreTrainedModel, GenerationMixin)
             else:
                 codec_embed.append(self.talker.code_predictor.get_input_embeddings()[i-1](ref_code[:, i:i+1]))
         codec_embed = torch.cat(codec_embed, dim=1).sum(1).unsqueeze(0)
-        codec_embed = torch.cat([self.talker.get_input_embeddings()(
-                                    torch.tensor(
-                                        [[
-                                            self.config.talker_config.codec_bos_id,
-                                        ]],
-                                        device=self.talker.device,
-                                        dtype=text_id.dtype,
-                                    )
-                                ), codec_embed], dim=1)
+        codec_embed = torch.cat([prompt_embeddings["codec_bos"], codec_embed], dim=1)
         # compute lens
         text_lens = text_embed.shape[1]
         codec_lens = codec_embed.shape[1]
         if non_streaming_mode:
-            icl_input_embed = text_embed + self.talker.get_input_embeddings()(
-                                                torch.tensor(
-                                                    [[
-                                                        self.config.talker_config.codec_pad_id,
-                                                    ] * text_lens],
-                                                    device=self.talker.device,
-                                                    dtype=text_id.dtype,
-                                                )
-                                            )
+            icl_input_embed = text_embed + prompt_embeddings["codec_pad"]
             icl_input_embed = torch.cat([icl_input_embed, codec_embed + tts_pad_embed], dim=1)
             return icl_input_embed, tts_pad_embed
         else:
@@ -1985,6 +3508,331 @@ class Qwen3TTSForConditionalGeneration(Qwen3TTSPreTrainedModel, GenerationMixin)
                 text_embed = torch.cat([text_embed] + [tts_pad_embed] * (codec_lens - text_lens), dim=1)
                 return text_embed + codec_embed, tts_pad_embed
 
+    def _prompt_embeddings(self) -> dict:
+        """
+        Embeddings of the constant tokens of the talker prompt, computed once instead of for every item: the projected
+        tts bos / eos / pad text tokens, the codec pad / bos tokens, the codec think / language tags of every language
+        and the codec embedding of every preset speaker. They are stacked as the rows of `rows` (row 0 is zeros), from
+        which `_build_talker_inputs` gathers whole prompts; `codec_rows`, `codec_tags` and `speakers` hold row indices
+        and the named embeddings are `(1, 1, hidden_size)` views of single rows. The projected role and instruct
+        tokens seen so far are cached by token ids, see `_prompt_segment_embedding`.
+
+        The table is rebuilt whenever the embedding or projection weights are modified (weight loading, fine-tuning,
+        quantization) or moved to another device or dtype.
+        """
+        modules = (self.talker.get_text_embeddings(), self.talker.text_projection, self.talker.get_input_embeddings())
+        key = tuple(
+            (t.device, t.dtype, t.data_ptr(), 0 if t.is_inference() else t._version)
+            for module in modules
+            for t in (*module.parameters(), *module.buffers())
+        )
+        if self._prompt_embedding_cache is not None and self._prompt_embedding_cache[0] == key:
+            return self._prompt_embedding_cache[1]
+
+        config = self.config.talker_config
+        tts_embeds = self.talker.text_projection(
+            self.talker.get_text_embeddings()(
+                torch.tensor(
+                    [[self.config.tts_bos_token_id, self.config.tts_eos_token_id, self.config.tts_pad_token_id]],
+                    device=self.talker.device,
+                )
+            )
+        )[0]
+
+        language_ids = sorted(set(config.codec_language_id.values()))
+        speaker_ids = sorted(set(config.spk_id.values()))
+        codec_ids = [
+            config.codec_nothink_id,
+            config.codec_think_id,
+            config.codec_think_bos_id,
+            config.codec_think_eos_id,
+            config.codec_pad_id,
+            config.codec_bos_id,
+        ] + language_ids + speaker_ids
+        codec_embeds = self.talker.get_input_embeddings()(torch.tensor(codec_ids, device=self.talker.device))
+
+        # row 0: zeros, rows 1-3: tts bos / eos / pad, then one row per codec id
+        rows = torch.cat([tts_embeds.new_zeros(1, tts_embeds.shape[-1]), tts_embeds, codec_embeds], dim=0)
+        codec_rows = {codec_id: 4 + i for i, codec_id in enumerate(codec_ids)}
+
+        # codec tags keyed by language id, None for auto
+        codec_tags = {
+            None: [codec_rows[config.codec_nothink_id], codec_rows[config.codec_think_bos_id],
+                   codec_rows[config.codec_think_eos_id]]
+        }
+        for language_id in language_ids:
+            codec_tags[language_id] = [
+                codec_rows[config.codec_think_id],
+                codec_rows[config.codec_think_bos_id],
+                codec_rows[language_id],
+                codec_rows[config.codec_think_eos_id],
+            ]
+
+        table = {
+            "rows": rows,
+            "zero_row": 0,
+            "tts_bos_row": 1,
+            "tts_eos_row": 2,
+            "tts_pad_row": 3,
+            "codec_rows": codec_rows,
+            "codec_tags": codec_tags,
+            "speakers": {speaker_id: codec_rows[speaker_id] for speaker_id in speaker_ids},
+            "tts_bos": rows[None, 1:2],
+            "tts_eos": rows[None, 2:3],
+            "tts_pad": rows[None, 3:4],
+            "codec_pad": rows[None, codec_rows[config.codec_pad_id]].unsqueeze(1),
+            "codec_bos": rows[None, codec_rows[config.codec_bos_id]].unsqueeze(1),
+            # filled by `_prompt_segment_embedding`
+            "segments": OrderedDict(),
+        }
+        self._prompt_embedding_cache = (key, table)
+        return table
+
+    def _prompt_segment_embedding(
+        self, prompt_embeddings: dict, token_ids: torch.Tensor, max_entries: int = 64
+    ) -> torch.Tensor:
+        """
+        Projected text embedding of a prompt prefix segment of shape `(1, length)`: the role tokens
+        (`<|im_start|>assistant\n`) that open every talker prompt or an instruct prompt. Each distinct segment is
+        projected on its own, so its embedding does not depend on the rest of the batch and the prompt prefixes keep
+        hitting the prefix cache, and is cached by token ids (the `max_entries` most recently used ones) in the
+        `prompt_embeddings` table.
+        """
+        segments = prompt_embeddings["segments"]
+        key = tuple(token_ids[0].tolist())
+        embed = segments.get(key)
+        if embed is None:
+            embed = self.talker.text_projection(self.talker.get_text_embeddings()(token_ids.to(self.talker.device)))
+            segments[key] = embed
+            while len(segments) > max_entries:
+                segments.popitem(last=False)
+        else:
+            segments.move_to_end(key)
+        return embed
+
+    def _build_talker_inputs(
+        self,
+        input_ids: list[torch.Tensor],
+        instruct_ids: Optional[list[torch.Tensor]],
+        ref_ids: Optional[list[torch.Tensor]],
+        voice_clone_prompt: Optional[dict],
+        languages: list[str],
+        speakers: Optional[list[str]],
+        non_streaming_mode: bool,
+    ):
+        """
+        Build the talker prompts of all items at once.
+
+        Every embedding a prompt is made of is a row of one table: the constant rows of `_prompt_embeddings`, followed
+        by the rows computed for this batch (the texts to synthesize, projected in one call, the role / instruct
+        segments, the voice clone speaker embeddings and the ICL prompts). Each prompt position adds a text row to a
+        codec row, so the left-padded batch is two gathers and one add over index tensors built on the host, and the
+        right-padded trailing text hiddens are one more gather.
+
+        Returns:
+            talker_input_embeds (`list[torch.FloatTensor]`): Prompt embeddings of shape
+                `(1, prompt_length, hidden_size)`, views into `padded_input_embeds`.
+            trailing_text_hiddens (`list[torch.FloatTensor]`): Text embeddings added to the generated frames, of shape
+                `(1, text_length, hidden_size)`, views into `padded_trailing_text_hiddens`.
+            tts_pad_embed (`torch.FloatTensor`): Text padding embedding of shape `(1, 1, hidden_size)`.
+            prefix_lengths (`list[int]`): Length of the prompt prefix that does not depend on the text to synthesize.
+            padded_input_embeds (`torch.FloatTensor`): All prompts, left-padded with zeros, of shape
+                `(num_items, max_prompt_length, hidden_size)`.
+            padded_trailing_text_hiddens (`torch.FloatTensor`): All trailing text hiddens, right-padded with
+                `tts_pad_embed`, of shape `(num_items, max_text_length, hidden_size)`.
+        """
+        num_items = len(input_ids)
+        config = self.config.talker_config
+        prompt_embeddings = self._prompt_embeddings()
+        tts_pad_embed = prompt_embeddings["tts_pad"]
+        zero_row = prompt_embeddings["zero_row"]
+        tts_bos_row = prompt_embeddings["tts_bos_row"]
+        tts_eos_row = prompt_embeddings["tts_eos_row"]
+        tts_pad_row = prompt_embeddings["tts_pad_row"]
+        codec_pad_row = prompt_embeddings["codec_rows"][config.codec_pad_id]
+        codec_bos_row = prompt_embeddings["codec_rows"][config.codec_bos_id]
+
+        segments = [prompt_embeddings["rows"]]
+        num_rows = segments[0].shape[0]
+
+        def add_rows(embeds: torch.Tensor) -> int:
+            # append the rows of `embeds` of shape `(1, length, hidden_size)` and return the index of the first one
+            nonlocal num_rows
+            segments.append(embeds[0])
+            num_rows += embeds.shape[1]
+            return num_rows - embeds.shape[1]
+
+        segment_rows = {}
+
+        def prompt_segment_rows(token_ids: torch.Tensor) -> list[int]:
+            key = tuple(token_ids[0].tolist())
+            if key not in segment_rows:
+                embed = self._prompt_segment_embedding(prompt_embeddings, token_ids)
+                start = add_rows(embed)
+                segment_rows[key] = list(range(start, start + embed.shape[1]))
+            return segment_rows[key]
+
+        voice_clone_spk_embeds = None
+        # voice clone speaker prompt generate
+        if voice_clone_prompt is not None:
+            voice_clone_spk_embeds = self.generate_speaker_prompt(voice_clone_prompt)
+
+        def use_icl(index):
+            return (
+                voice_clone_prompt is not None
+                and voice_clone_prompt["ref_code"] is not None
+                and voice_clone_prompt["icl_mode"][index]
+            )
+
+        # the texts to synthesize are projected in one call for all items
+        text_segments = [
+            None if use_icl(index) else input_id[:, 3 : max(input_id.shape[1] - 5, 4)]
+            for index, input_id in enumerate(input_ids)
+        ]
+        text_starts = [None] * num_items
+        present = [index for index, segment in enumerate(text_segments) if segment is not None]
+        if present:
+            text_start = add_rows(
+                self.talker.text_projection(
+                    self.talker.get_text_embeddings()(
+                        torch.cat([text_segments[index] for index in present], dim=1).to(self.talker.device)
+                    )
+                )
+            )
+            for index in present:
+                text_starts[index] = text_start
+                text_start += text_segments[index].shape[1]
+
+        text_rows_list = []
+        codec_rows_list = []
+        trailing_rows_list = []
+        # length of the prompt prefix that does not depend on the text to synthesize (see `enable_prefix_cache`)
+        prefix_lengths = []
+        if speakers is None:
+            speakers = [None] * num_items
+        for index, (input_id, language, speaker) in enumerate(zip(input_ids, languages, speakers)):
+            speaker_rows = []
+            if voice_clone_spk_embeds is None:
+                if speaker == "" or speaker == None: # Instruct create speaker
+                    pass
+                else:
+                    if speaker.lower() not in config.spk_id:
+                        raise NotImplementedError(f"Speaker {speaker} not implemented")
+                    else:
+                        speaker_rows = [prompt_embeddings["speakers"][config.spk_id[speaker.lower()]]]
+            else:
+                if voice_clone_prompt["x_vector_only_mode"][index] or voice_clone_prompt["icl_mode"][index]:
+                    speaker_rows = [add_rows(voice_clone_spk_embeds[index].view(1, 1, -1))]
+
+            assert language is not None
+
+            if language.lower() == "auto":
+                language_id = None
+            else:
+                if language.lower() not in config.codec_language_id:
+                    raise NotImplementedError(f"Language {language} not implemented")
+                else:
+                    language_id = config.codec_language_id[language.lower()]
+            
+            if (language.lower() in ["chinese", "auto"] and \
+                   speaker != "" and speaker is not None and \
+                     config.spk_is_dialect[speaker.lower()] != False):
+                dialect = config.spk_is_dialect[speaker.lower()]
+                language_id = config.codec_language_id[dialect]
+
+            # codec: tag and speaker, then codec pad + codec bos
+            codec_input_rows = prompt_embeddings["codec_tags"][language_id] + speaker_rows + [codec_pad_row, codec_bos_row]
+
+            # '<|im_start|>assistant\n我叫通义千问，是阿里云的开源大模型。<|im_end|>\n<|im_start|>assistant\n'
+
+            # [instruct] + <|im_start|>assistant\n on top of nothing, then tts_pad * 4 + tts_bos on top of the codec
+            # rows before codec bos
+            text_rows = []
+            if instruct_ids is not None and instruct_ids[index] is not None:
+                text_rows += prompt_segment_rows(instruct_ids[index])
+            text_rows += prompt_segment_rows(input_id[:, :3])
+            codec_rows = [zero_row] * len(text_rows) + codec_input_rows[:-1]
+            text_rows += [tts_pad_row] * (len(codec_input_rows) - 2) + [tts_bos_row]
+            prefix_length = len(text_rows)
+
+            if use_icl(index):
+                icl_input_embed, trailing_text_hidden = self.generate_icl_prompt(
+                    text_id=input_id[:, 3:-5],
+                    ref_id=ref_ids[index][:, 3:-2],
+                    ref_code=voice_clone_prompt["ref_code"][index].to(self.talker.device),
+                    tts_pad_embed=tts_pad_embed,
+                    tts_eos_embed=prompt_embeddings["tts_eos"],
+                    non_streaming_mode=non_streaming_mode,
+                )
+                icl_start = add_rows(icl_input_embed)
+                text_rows += range(icl_start, icl_start + icl_input_embed.shape[1])
+                codec_rows += [zero_row] * icl_input_embed.shape[1]
+                if trailing_text_hidden is tts_pad_embed:
+                    trailing_rows = [tts_pad_row]
+                else:
+                    trailing_start = add_rows(trailing_text_hidden)
+                    trailing_rows = list(range(trailing_start, trailing_start + trailing_text_hidden.shape[1]))
+                # the ICL prompt starts with the reference text on top of the reference codes
+                ref_text_length = ref_ids[index][:, 3:-2].shape[1]
+                if not non_streaming_mode:
+                    ref_text_length = min(ref_text_length, voice_clone_prompt["ref_code"][index].shape[0] + 1)
+                prefix_length += ref_text_length
+            elif non_streaming_mode:
+                # the whole text and tts eos on top of codec pads, then tts pad on top of codec bos
+                text_length = max(input_id.shape[1] - 8, 0)
+                text_rows += list(range(text_starts[index], text_starts[index] + text_length))
+                text_rows += [tts_eos_row, tts_pad_row]
+                codec_rows += [codec_pad_row] * (text_length + 1) + [codec_bos_row]
+                trailing_rows = [tts_pad_row]
+            else:
+                #  tts_text_first_token on top of codec bos
+                text_rows.append(text_starts[index])
+                codec_rows.append(codec_bos_row)
+                # 叫通义千问，是阿里云的开源大模型。
+                text_end = text_starts[index] + text_segments[index].shape[1]
+                trailing_rows = list(range(text_starts[index] + 1, text_end)) + [tts_eos_row]
+            text_rows_list.append(text_rows)
+            codec_rows_list.append(codec_rows)
+            trailing_rows_list.append(trailing_rows)
+            # leave at least two positions to prefill so that the talker forward takes its prefill branch
+            prefix_lengths.append(min(prefix_length, len(text_rows) - 2))
+
+        table = torch.cat(segments, dim=0)
+        max_length = max(len(rows) for rows in text_rows_list)
+        max_trailing_length = max(len(rows) for rows in trailing_rows_list)
+        prompt_index = torch.tensor(
+            [
+                [[zero_row] * (max_length - len(rows)) + rows for rows in rows_list]
+                for rows_list in (text_rows_list, codec_rows_list)
+            ],
+            device=table.device,
+        )
+        trailing_index = torch.tensor(
+            [rows + [tts_pad_row] * (max_trailing_length - len(rows)) for rows in trailing_rows_list],
+            device=table.device,
+        )
+        padded_input_embeds = table[prompt_index[0]] + table[prompt_index[1]]
+        padded_trailing_text_hiddens = table[trailing_index]
+
+        talker_input_embeds = [
+            padded_input_embeds[index : index + 1, max_length - len(rows) :] for index, rows in enumerate(text_rows_list)
+        ]
+        trailing_text_hiddens = [
+            padded_trailing_text_hiddens[index : index + 1, : len(rows)] for index, rows in enumerate(trailing_rows_list)
+        ]
+        return (
+            talker_input_embeds,
+            trailing_text_hiddens,
+            tts_pad_embed,
+            prefix_lengths,
+            padded_input_embeds,
+            padded_trailing_text_hiddens,
+        )
+
+    def _record_termination(self, runaway_detector: Qwen3TTSRunawayDetector, num_items: int, max_new_tokens: int):
+        self.termination_reasons = [runaway_detector.reasons[index] for index in range(num_items)]
+        self.termination_stats = [runaway_detector.statistics(index, max_new_tokens) for index in range(num_items)]
+
     @torch.no_grad()
     def generate(
         self,
@@ -2006,9 +3854,28 @@ class Qwen3TTSForConditionalGeneration(Qwen3TTSPreTrainedModel, GenerationMixin)
         subtalker_temperature: float = 0.9,
         eos_token_id: Optional[int] = None,
         repetition_penalty: float = 1.05,
+        codec_streamer: Optional[Qwen3TTSCodecStreamer] = None,
+        cache_implementation: Optional[str] = None,
+        return_hidden_states: bool = True,
+        max_batch_size: Optional[int] = None,
+        draft_model: Optional["Qwen3TTSForConditionalGeneration"] = None,
+        num_draft_frames: int = 4,
+        draft_voice_clone_prompt: list[dict] = None,
+        codes_callback: Optional[Callable[[int, torch.LongTensor], None]] = None,
+        max_frames_per_token: Optional[float] = None,
+        detect_runaway: bool = False,
+        runaway_window: int = 50,
         **kwargs,
     ):
-        talker_kwargs = {
+        # `codes_callback(index, codes)` is called as soon as the codes of item `index` are final, e.g. to start
+        # decoding them while the talker works on the remaining items. Only continuous batching (`max_batch_size`)
+        # and speculative decoding finish items one by one; a left-padded batch calls it for every item at the end.
+        # `max_frames_per_token` caps the frames of an item at that many per text token and `detect_runaway` stops
+        # items looping on repeated codes or silence for `runaway_window` frames (see `Qwen3TTSRunawayDetector`);
+        # `codec_streamer` then holds the last `runaway_window` frames back so that a dropped loop is never streamed.
+        # Why every item terminated is stored in `self.termination_reasons`, with the frames kept and the talker
+        # steps run and saved in `self.termination_stats`.
+        sampling_kwargs = {
             "max_new_tokens": max_new_tokens,
             "min_new_tokens": 2,
             "do_sample": do_sample,
@@ -2023,242 +3890,218 @@ class Qwen3TTSForConditionalGeneration(Qwen3TTSPreTrainedModel, GenerationMixin)
             if eos_token_id is not None
             else self.config.talker_config.codec_eos_token_id,
             "repetition_penalty": repetition_penalty,
-            "suppress_tokens": [
-                i
-                for i in range(self.config.talker_config.vocab_size - 1024, self.config.talker_config.vocab_size)
-                if i not in (self.config.talker_config.codec_eos_token_id,)
-            ],
-            "output_hidden_states": getattr(kwargs, "output_hidden_states", True),
-            "return_dict_in_generate": getattr(kwargs, "return_dict_in_generate", True)
         }
+        talker_kwargs = {
+            **sampling_kwargs,
+            # penalty, min_new_tokens, suppression and warping run in place in one processor instead of the separate
+            # processors and warpers `generate()` would build from these arguments
+            "logits_processor": LogitsProcessorList(
+                [
+                    Qwen3TTSCodecLogitsProcessor(
+                        self.talker.codec_suppress_mask,
+                        sampling_kwargs["eos_token_id"],
+                        min_new_tokens=sampling_kwargs["min_new_tokens"],
+                        repetition_penalty=repetition_penalty,
+                        do_sample=do_sample,
+                        top_k=top_k,
+                        top_p=top_p,
+                        temperature=temperature,
+                    )
+                ]
+            ),
+            "min_new_tokens": None,
+            "repetition_penalty": None,
+            "top_k": None,
+            "top_p": None,
+            "temperature": None,
+            "output_hidden_states": False,
+            "return_dict_in_generate": False,
+        }
+        if cache_implementation is not None:
+            # e.g. "static": KV cache preallocated for prompt length + `max_new_tokens`. The decode step is compiled
+            # via `compile_decode_steps` instead of compiling the whole talker forward.
+            talker_kwargs["cache_implementation"] = cache_implementation
+            talker_kwargs["disable_compile"] = True
+        if codec_streamer is not None:
+            talker_kwargs["codec_streamer"] = codec_streamer
+            talker_kwargs["stopping_criteria"] = StoppingCriteriaList(
+                [Qwen3TTSCodecStreamerStoppingCriteria(codec_streamer)]
+            )
         
-        talker_input_embeds = [[] for _ in range(len(input_ids))]
-
-        voice_clone_spk_embeds = None
-        # voice clone speaker prompt generate
-        if voice_clone_prompt is not None:
-            voice_clone_spk_embeds = self.generate_speaker_prompt(voice_clone_prompt)
-        
-        # instruct text prompt generate
-        if instruct_ids is not None:
-            for index, instruct_id in enumerate(instruct_ids):
-                if instruct_id is not None:
-                    talker_input_embeds[index].append(self.talker.text_projection(
-                                                  self.talker.get_text_embeddings()(instruct_id)))
-
-        # tts text prompt generate
-        trailing_text_hiddens = []
-        if speakers is None:
-            speakers = [None] * len(input_ids)
-        for index, (input_id, language, speaker) in enumerate(zip(input_ids, languages, speakers)):
-            if voice_clone_spk_embeds is None:
-                if speaker == "" or speaker == None: # Instruct create speaker
-                    speaker_embed = None
-                else:
-                    if speaker.lower() not in self.config.talker_config.spk_id:
-                        raise NotImplementedError(f"Speaker {speaker} not implemented")
-                    else:
-                        spk_id = self.config.talker_config.spk_id[speaker.lower()]
-                        speaker_embed = self.talker.get_input_embeddings()(
-                                            torch.tensor(
-                                                spk_id,
-                                                device=self.talker.device,
-                                                dtype=input_id.dtype,
-                                            )
-                                        )
-            else:
-                if voice_clone_prompt["x_vector_only_mode"][index] or voice_clone_prompt["icl_mode"][index]:
-                    speaker_embed = voice_clone_spk_embeds[index]
-                else:
-                    speaker_embed = None
-
-            assert language is not None
+        (
+            talker_input_embeds,
+            trailing_text_hiddens,
+            tts_pad_embed,
+            prefix_lengths,
+            padded_input_embeds,
+            padded_trailing_text_hiddens,
+        ) = self._build_talker_inputs(
+            input_ids, instruct_ids, ref_ids, voice_clone_prompt, languages, speakers, non_streaming_mode
+        )
 
-            if language.lower() == "auto":
-                language_id = None
-            else:
-                if language.lower() not in self.config.talker_config.codec_language_id:
-                    raise NotImplementedError(f"Language {language} not implemented")
-                else:
-                    language_id = self.config.talker_config.codec_language_id[language.lower()]
-            
-            if (language.lower() in ["chinese", "auto"] and \
-                   speaker != "" and speaker is not None and \
-                     self.config.talker_config.spk_is_dialect[speaker.lower()] != False):
-                dialect = self.config.talker_config.spk_is_dialect[speaker.lower()]
-                language_id = self.config.talker_config.codec_language_id[dialect]
-            
-            tts_bos_embed, tts_eos_embed, tts_pad_embed = self.talker.text_projection(
-                self.talker.get_text_embeddings()(
-                    torch.tensor(
-                        [[self.config.tts_bos_token_id, self.config.tts_eos_token_id, self.config.tts_pad_token_id]],
-                        device=self.talker.device,
-                        dtype=input_id.dtype,
+        frame_budgets = None
+        if max_frames_per_token is not None:
+            frame_budgets = [
+                Qwen3TTSRunawayDetector.frame_budget(max_frames_per_token, input_id.shape[1]) for input_id in input_ids
+            ]
+        runaway_detector = Qwen3TTSRunawayDetector(
+            sampling_kwargs["eos_token_id"],
+            frame_budgets=frame_budgets,
+            detect_loops=detect_runaway,
+            window=runaway_window,
+        )
+        if codec_streamer is not None:
+            codec_streamer.hold_back(runaway_window if detect_runaway else 0)
+
+        if draft_model is not None:
+            # speculative decoding: `draft_model` (e.g. the 0.6B model for the 1.7B one) proposes several frames that
+            # the talker verifies in one pass. Its prompt is built from the same inputs with its own embeddings and,
+            # for voice clone, its own speaker embeddings in `draft_voice_clone_prompt`.
+            if max_batch_size is not None:
+                raise ValueError("`draft_model` can not be combined with `max_batch_size`.")
+            draft_input_embeds, draft_trailing_text_hiddens, draft_tts_pad_embed, *_ = draft_model._build_talker_inputs(
+                input_ids,
+                instruct_ids,
+                ref_ids,
+                draft_voice_clone_prompt if draft_voice_clone_prompt is not None else voice_clone_prompt,
+                languages,
+                speakers,
+                non_streaming_mode,
+            )
+            decoder = Qwen3TTSSpeculativeDecoder(
+                self.talker, draft_model.talker, num_draft_frames=num_draft_frames, **sampling_kwargs
+            )
+            talker_codes_list, talker_hidden_states_list = [], []
+            for index in range(len(talker_input_embeds)):
+                past_key_values = None
+                if self.prefix_cache is not None and prefix_lengths[index] > 0:
+                    past_key_values = self.prefix_cache.fork(
+                        self.talker, talker_input_embeds[index][:, : prefix_lengths[index]]
                     )
+                codes, hidden_states = decoder.generate(
+                    talker_input_embeds[index],
+                    trailing_text_hiddens[index],
+                    tts_pad_embed,
+                    draft_input_embeds[index],
+                    draft_trailing_text_hiddens[index],
+                    draft_tts_pad_embed,
+                    past_key_values=past_key_values,
+                    codec_streamer=codec_streamer,
+                    runaway_detector=runaway_detector,
+                    request_id=index,
                 )
-            ).chunk(3, dim=1)  # 3 * [1 1 d]
-            
-            # codec: tag and speaker
-            if language_id is None:
-                codec_prefill_list = [[
-                                        self.config.talker_config.codec_nothink_id,
-                                        self.config.talker_config.codec_think_bos_id,
-                                        self.config.talker_config.codec_think_eos_id,
-                                    ]]
-            else:
-                codec_prefill_list = [[
-                                        self.config.talker_config.codec_think_id,
-                                        self.config.talker_config.codec_think_bos_id,
-                                        language_id,
-                                        self.config.talker_config.codec_think_eos_id,
-                                    ]]
-
-            codec_input_emebdding_0 = self.talker.get_input_embeddings()(
-                                                    torch.tensor(
-                                                        codec_prefill_list,
-                                                        device=self.talker.device,
-                                                        dtype=input_id.dtype,
-                                                    )
-                                                )
-            codec_input_emebdding_1 = self.talker.get_input_embeddings()(
-                                                    torch.tensor(
-                                                        [[
-                                                            self.config.talker_config.codec_pad_id,
-                                                            self.config.talker_config.codec_bos_id,
-                                                        ]],
-                                                        device=self.talker.device,
-                                                        dtype=input_id.dtype,
-                                                    )
-                                                )
-            if speaker_embed is None:
-                codec_input_emebdding = torch.cat([codec_input_emebdding_0,
-                                                   codec_input_emebdding_1], dim=1)
-            else:
-                codec_input_emebdding = torch.cat([codec_input_emebdding_0,
-                                                   speaker_embed.view(1, 1, -1),
-                                                   codec_input_emebdding_1], dim=1)
-
-            # '<|im_start|>assistant\n我叫通义千问，是阿里云的开源大模型。<|im_end|>\n<|im_start|>assistant\n'
-
-            # <|im_start|>assistant\n
-            _talker_input_embed_role = self.talker.text_projection(
-                                        self.talker.get_text_embeddings()(input_id[:, :3])
-                                        )
-
-            # tts_pad * 4 + tts_bos
-            _talker_input_embed = torch.cat((tts_pad_embed.expand(-1, codec_input_emebdding.shape[1] - 2, -1),
-                                            tts_bos_embed,
-                                            ), dim=1) + codec_input_emebdding[:, :-1]
-
-            talker_input_embed = torch.cat((_talker_input_embed_role, _talker_input_embed), dim=1)
-
-            if voice_clone_prompt is not None and voice_clone_prompt["ref_code"] is not None and voice_clone_prompt["icl_mode"][index]:
-                icl_input_embed, trailing_text_hidden = self.generate_icl_prompt(
-                    text_id=input_id[:, 3:-5],
-                    ref_id=ref_ids[index][:, 3:-2],
-                    ref_code=voice_clone_prompt["ref_code"][index].to(self.talker.device),
-                    tts_pad_embed=tts_pad_embed,
-                    tts_eos_embed=tts_eos_embed,
-                    non_streaming_mode=non_streaming_mode,
-                )
-                talker_input_embed = torch.cat([talker_input_embed, icl_input_embed], dim=1)
-            else:
-                #  tts_text_first_token
-                talker_input_embed = torch.cat([talker_input_embed, 
-                                                self.talker.text_projection(self.talker.get_text_embeddings()(input_id[:, 3:4])) + codec_input_emebdding[:, -1:]], 
-                                                dim=1)
-                if non_streaming_mode:
-                    talker_input_embed = talker_input_embed[:, :-1] # 去掉原本放进去的text
-                    talker_input_embed = torch.cat([talker_input_embed,
-                                                    torch.cat((self.talker.text_projection(
-                                                        self.talker.get_text_embeddings()(input_id[:, 3:-5])
-                                                    ), tts_eos_embed), dim=1) + self.talker.get_input_embeddings()(
-                                                        torch.tensor(
-                                                            [[
-                                                                self.config.talker_config.codec_pad_id,
-                                                            ] * (input_id[:, 3:-5].shape[1] + 1)],
-                                                            device=self.talker.device,
-                                                            dtype=input_id.dtype,
-                                                        )
-                                                    ), 
-                                                    tts_pad_embed + self.talker.get_input_embeddings()(
-                                                        torch.tensor(
-                                                            [[
-                                                                self.config.talker_config.codec_bos_id,
-                                                            ]],
-                                                            device=self.talker.device,
-                                                            dtype=input_id.dtype,
-                                                        )
-                                                    ) 
-                                                    ], dim=1)
-                    trailing_text_hidden = tts_pad_embed
-                else:
-                    # 叫通义千问，是阿里云的开源大模型。
-                    trailing_text_hidden = torch.cat((self.talker.text_projection(
-                                                        self.talker.get_text_embeddings()(input_id[:, 4:-5])
-                                                    ), tts_eos_embed), dim=1)
-            talker_input_embeds[index].append(talker_input_embed)
-            trailing_text_hiddens.append(trailing_text_hidden)
-        
-        for index, talker_input_embed in enumerate(talker_input_embeds):
-            talker_input_embeds[index] = torch.cat([item for item in talker_input_embed if item is not None], dim=1)
-
-        # for batch inferquence
+                if codec_streamer is not None:
+                    codec_streamer.release(runaway_detector.num_frames[index])
+                talker_codes_list.append(codes)
+                talker_hidden_states_list.append(hidden_states)
+                if codes_callback is not None:
+                    codes_callback(index, codes)
+            self.speculative_stats = {**decoder.stats, "acceptance_rate": decoder.acceptance_rate}
+            self._record_termination(runaway_detector, len(talker_codes_list), max_new_tokens)
+            return talker_codes_list, talker_hidden_states_list if return_hidden_states else None
+
+        if max_batch_size is not None:
+            # continuous batching: at most `max_batch_size` items are decoded at once and every finished item hands
+            # its slot to the next one instead of waiting for the longest item of a left-padded batch
+            if codec_streamer is not None:
+                raise ValueError("`codec_streamer` can not be combined with `max_batch_size`.")
+            engine = Qwen3TTSContinuousBatchingEngine(
+                self.talker,
+                tts_pad_embed,
+                max_batch_size=max_batch_size,
+                return_hidden_states=return_hidden_states,
+                prefix_cache=self.prefix_cache,
+                runaway_detector=runaway_detector,
+                **sampling_kwargs,
+            )
+            for index, (talker_input_embed, trailing_text_hidden, prefix_length) in enumerate(
+                zip(talker_input_embeds, trailing_text_hiddens, prefix_lengths)
+            ):
+                engine.add_request(index, talker_input_embed, trailing_text_hidden, prefix_length)
+            talker_codes_list = [None] * len(talker_input_embeds)
+            talker_hidden_states_list = [None] * len(talker_input_embeds) if return_hidden_states else None
+            for index, codes, hidden_states in engine.run():
+                talker_codes_list[index] = codes
+                if talker_hidden_states_list is not None:
+                    talker_hidden_states_list[index] = hidden_states
+                if codes_callback is not None:
+                    codes_callback(index, codes)
+            self._record_termination(runaway_detector, len(talker_codes_list), max_new_tokens)
+            return talker_codes_list, talker_hidden_states_list
+
+        if runaway_detector.active:
+            stopping_criteria = talker_kwargs.setdefault("stopping_criteria", StoppingCriteriaList())
+            stopping_criteria.append(Qwen3TTSRunawayStoppingCriteria(runaway_detector))
+
+        # for batch inferquence: the prompts are already left-padded with zeros and the trailing text hiddens
+        # right-padded with tts pad by `_build_talker_inputs`
         original_lengths = torch.tensor([t.shape[1] for t in talker_input_embeds])
-        # left padding for talker input embeds
-        sequences = [t.squeeze(0) for t in talker_input_embeds]
-        sequences_reversed = [t.flip(dims=[0]) for t in sequences]
-        padded_reversed = torch.nn.utils.rnn.pad_sequence(
-            sequences_reversed,
-            batch_first=True,
-            padding_value=0.0
-        )
-        talker_input_embeds = padded_reversed.flip(dims=[1])
+        talker_input_embeds = padded_input_embeds
+        trailing_text_hiddens = padded_trailing_text_hiddens
         # generate mask
         batch_size, max_len = talker_input_embeds.shape[0], talker_input_embeds.shape[1]
         indices = torch.arange(max_len).expand(batch_size, -1)
         num_pads = max_len - original_lengths
         talker_attention_mask = (indices >= num_pads.unsqueeze(1)).long().to(talker_input_embeds.device)
-        # padding trailing text hiddens
-        pad_embedding_vector = tts_pad_embed.squeeze()
-        sequences_to_pad = [t.squeeze(0) for t in trailing_text_hiddens]
-        trailing_text_original_lengths = [s.shape[0] for s in sequences_to_pad]
-        padded_hiddens = torch.nn.utils.rnn.pad_sequence(
-            sequences_to_pad,
-            batch_first=True,
-            padding_value=0.0
-        )
-        arange_tensor = torch.arange(max(trailing_text_original_lengths), 
-                                     device=padded_hiddens.device).expand(len(trailing_text_original_lengths), -1)
-        lengths_tensor = torch.tensor(trailing_text_original_lengths, device=padded_hiddens.device).unsqueeze(1)
-        padding_mask = arange_tensor >= lengths_tensor
-        padded_hiddens[padding_mask] = pad_embedding_vector
-        trailing_text_hiddens = padded_hiddens
 
         # forward
-        talker_result = self.talker.generate(
+        codec_accumulator = Qwen3TTSCodecAccumulator(
+            batch_size=batch_size,
+            max_frames=max_new_tokens,
+            num_code_groups=self.config.talker_config.num_code_groups,
+            hidden_size=self.config.talker_config.hidden_size if return_hidden_states else None,
+            device=talker_input_embeds.device,
+            dtype=talker_input_embeds.dtype,
+        )
+        if (
+            self.prefix_cache is not None
+            and batch_size == 1
+            and prefix_lengths[0] > 0
+            and cache_implementation is None
+        ):
+            talker_kwargs["past_key_values"] = self.prefix_cache.fork(
+                self.talker, talker_input_embeds[:, : prefix_lengths[0]]
+            )
+        self.talker.generate(
             inputs_embeds=talker_input_embeds,
             attention_mask=talker_attention_mask,
             trailing_text_hidden=trailing_text_hiddens,
             tts_pad_embed=tts_pad_embed,
+            codec_accumulator=codec_accumulator,
             **talker_kwargs,
         )
 
-        talker_codes = torch.stack([hid[-1] for hid in talker_result.hidden_states if hid[-1] is not None], dim=1)
-        talker_hidden_states = torch.cat([hid[0][-1][:, -1:] for hid in talker_result.hidden_states], dim=1)[:, :-1]
-        
+        talker_codes = codec_accumulator.get_codes()
+        talker_hidden_states = codec_accumulator.get_hidden_states()
+
         first_codebook = talker_codes[:, :, 0]
         is_stop_token = (first_codebook ==  self.config.talker_config.codec_eos_token_id)
         stop_indices = torch.argmax(is_stop_token.int(), dim=1)
         has_stop_token = is_stop_token.any(dim=1)
-        effective_lengths = torch.where(has_stop_token, stop_indices, talker_codes.shape[1])
-        
+        effective_lengths = torch.where(has_stop_token, stop_indices, talker_codes.shape[1]).tolist()
+        stopped = codec_streamer is not None and codec_streamer.stopped
+        for i, has_stop in enumerate(has_stop_token.tolist()):
+            if has_stop:
+                runaway_detector.finish(i, "eos", effective_lengths[i])
+            else:
+                runaway_detector.finish(i, "stopped" if stopped else "max_new_tokens", effective_lengths[i])
+            effective_lengths[i] = min(effective_lengths[i], runaway_detector.num_frames[i])
+        self._record_termination(runaway_detector, batch_size, max_new_tokens)
+        if codec_streamer is not None:
+            codec_streamer.release(max(effective_lengths))
+
         talker_codes_list = [talker_codes[i, :length, ] for i, length in enumerate(effective_lengths)]
-        talker_hidden_states_list = [talker_hidden_states[i, :length, :] for i, length in enumerate(effective_lengths)]
-        
+        talker_hidden_states_list = None
+        if talker_hidden_states is not None:
+            talker_hidden_states_list = [talker_hidden_states[i, :length, :] for i, length in enumerate(effective_lengths)]
+        if codes_callback is not None:
+            for index, codes in enumerate(talker_codes_list):
+                codes_callback(index, codes)
+
         return talker_codes_list, talker_hidden_states_list
 
 __all__ = [
+    "Qwen3TTSCodecStreamer",
     "Qwen3TTSForConditionalGeneration",
     "Qwen3TTSTalkerForConditionalGeneration",
     "Qwen3TTSPreTrainedModel",
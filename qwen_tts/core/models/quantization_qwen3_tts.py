@@ -0,0 +1,219 @@
+# coding=utf-8
+# Copyright 2026 The Qwen team, Alibaba Group and the HuggingFace Inc. team. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Weight-only int8 / int4 quantization of linear layers, aimed at CPU inference."""
+import os
+from typing import Optional
+
+import torch
+from safetensors import safe_open
+from safetensors.torch import load_file, save_file
+from torch import nn
+from transformers.utils import logging
+
+logger = logging.get_logger(__name__)
+
+QUANTIZATION_FORMAT_VERSION = "1"
+
+
+def _pack_int4(values: torch.Tensor) -> torch.Tensor:
+    # two 4-bit values per byte, the even column in the low nibble
+    values = values.to(torch.uint8)
+    return values[:, ::2] | (values[:, 1::2] << 4)
+
+
+def _unpack_int4(packed: torch.Tensor) -> torch.Tensor:
+    return torch.stack((packed & 0xF, packed >> 4), dim=-1).reshape(packed.shape[0], -1)
+
+
+def quantize_linear_weight(weight: torch.Tensor, bits: int = 8, group_size: int = 128) -> dict[str, torch.Tensor]:
+    """
+    Quantize a linear `weight` of shape `(out_features, in_features)`.
+
+    int8 is symmetric with one scale per output channel. int4 is asymmetric with a scale and zero point per group of
+    `group_size` input features, in the convention of the CPU int4 kernel: `w = (q - 8) * scale + zero`.
+
+    Returns:
+        `dict[str, torch.Tensor]`: `qweight` (int8, or int4 packed two per uint8) and the bfloat16 `scales` (int8)
+        or `scales_and_zeros` of shape `(in_features // group_size, out_features, 2)` (int4).
+    """
+    weight = weight.detach().float()
+    if bits == 8:
+        scales = weight.abs().amax(dim=1).clamp(min=1e-8) / 127
+        qweight = torch.round(weight / scales[:, None]).clamp(-128, 127).to(torch.int8)
+        return {"qweight": qweight, "scales": scales.to(torch.bfloat16)}
+    if bits == 4:
+        out_features, in_features = weight.shape
+        groups = weight.reshape(out_features, in_features // group_size, group_size)
+        w_min, w_max = groups.amin(dim=-1), groups.amax(dim=-1)
+        scales = (w_max - w_min).clamp(min=1e-8) / 15
+        qweight = torch.round((groups - w_min[..., None]) / scales[..., None]).clamp(0, 15)
+        zeros = w_min + 8 * scales
+        scales_and_zeros = torch.stack((scales, zeros), dim=-1).transpose(0, 1).contiguous()
+        return {
+            "qweight": _pack_int4(qweight.reshape(out_features, in_features)),
+            "scales_and_zeros": scales_and_zeros.to(torch.bfloat16),
+        }
+    raise ValueError(f"`bits` must be 8 or 4, got {bits}")
+
+
+def supports_weight_only(linear: nn.Linear, bits: int, group_size: int) -> bool:
+    if bits == 4:
+        # the CPU int4 kernel packs blocks of 16 output channels
+        return linear.in_features % group_size == 0 and linear.out_features % 16 == 0
+    return True
+
+
+class Qwen3TTSWeightOnlyLinear(nn.Module):
+    """
+    Drop-in replacement of `nn.Linear` holding int8 or int4 weights.
+
+    The matmul runs in the packed CPU weight-only kernels (`_weight_int8pack_mm` / `_weight_int4pack_mm_for_cpu`)
+    with bfloat16 activations, and the output is cast back to the input dtype. There is no fast path on other
+    devices, so the layer refuses to be built or run anywhere but on CPU. int4 weights are repacked into the kernel
+    layout when the layer is built.
+    """
+
+    def __init__(self, in_features: int, out_features: int, bits: int = 8, group_size: int = 128, bias: bool = True):
+        super().__init__()
+        if bits not in (8, 4):
+            raise ValueError(f"`bits` must be 8 or 4, got {bits}")
+        self.in_features = in_features
+        self.out_features = out_features
+        self.bits = bits
+        self.group_size = group_size
+        if bits == 8:
+            self.register_buffer("qweight", torch.empty(out_features, in_features, dtype=torch.int8))
+            self.register_buffer("scales", torch.empty(out_features, dtype=torch.bfloat16))
+        else:
+            self.register_buffer("qweight", torch.empty(out_features, in_features // 2, dtype=torch.uint8))
+            self.register_buffer(
+                "scales_and_zeros", torch.empty(in_features // group_size, out_features, 2, dtype=torch.bfloat16)
+            )
+        self.bias = nn.Parameter(torch.empty(out_features), requires_grad=False) if bias else None
+
+    @classmethod
+    def from_linear(
+        cls,
+        linear: nn.Linear,
+        bits: int = 8,
+        group_size: int = 128,
+        quantized: Optional[dict[str, torch.Tensor]] = None,
+    ) -> "Qwen3TTSWeightOnlyLinear":
+        """
+        Build the quantized counterpart of `linear`, from the already quantized tensors `quantized` (see
+        `quantize_linear_weight`) if given.
+        """
+        if linear.weight.device.type != "cpu":
+            raise ValueError(f"Weight-only quantized layers run on CPU only, got a layer on {linear.weight.device}.")
+        if quantized is None:
+            quantized = quantize_linear_weight(linear.weight, bits, group_size)
+        module = cls(linear.in_features, linear.out_features, bits, group_size, bias=linear.bias is not None)
+        if linear.bias is not None:
+            module.bias.data = linear.bias.detach().clone()
+        if bits == 8:
+            module.qweight = quantized["qweight"]
+            module.scales = quantized["scales"]
+        else:
+            qweight = _unpack_int4(quantized["qweight"]).int()
+            module.qweight = torch.ops.aten._convert_weight_to_int4pack_for_cpu(qweight, 1)
+            module.scales_and_zeros = quantized["scales_and_zeros"]
+        return module
+
+    def forward(self, hidden_states: torch.Tensor) -> torch.Tensor:
+        if hidden_states.device.type != "cpu":
+            raise RuntimeError(f"Weight-only quantized layers run on CPU only, got inputs on {hidden_states.device}.")
+
+        inputs = hidden_states.reshape(-1, self.in_features).to(torch.bfloat16)
+        if self.bits == 8:
+            outputs = torch.ops.aten._weight_int8pack_mm(inputs, self.qweight, self.scales)
+        else:
+            outputs = torch.ops.aten._weight_int4pack_mm_for_cpu(
+                inputs, self.qweight, self.group_size, self.scales_and_zeros
+            )
+        outputs = outputs.to(hidden_states.dtype).reshape(*hidden_states.shape[:-1], self.out_features)
+        if self.bias is not None:
+            outputs = outputs + self.bias
+        return outputs
+
+    def extra_repr(self) -> str:
+        return (
+            f"in_features={self.in_features}, out_features={self.out_features}, bits={self.bits}, "
+            f"group_size={self.group_size}, bias={self.bias is not None}"
+        )
+
+
+def quantize_linear_layers(
+    modules: dict[str, nn.Module],
+    bits: int = 8,
+    group_size: int = 128,
+    cache_path: Optional[str] = None,
+    cache_version: Optional[str] = None,
+) -> int:
+    """
+    Replace the `nn.Linear` layers inside `modules` (a mapping of name prefix to module) by
+    `Qwen3TTSWeightOnlyLinear`. Layers the int4 kernel can not handle stay in floating point.
+
+    With `cache_path`, the quantized tensors are read from that safetensors file if it was written for the same
+    layers, settings and `cache_version` (e.g. the mtime of the float checkpoint), and the file is (over)written
+    otherwise. This only skips the quantization pass: the float weights still have to be loaded first.
+
+    Returns:
+        `int`: The number of replaced layers.
+    """
+    targets = {}
+    for prefix, root in modules.items():
+        for name, module in root.named_modules():
+            if isinstance(module, nn.Linear) and supports_weight_only(module, bits, group_size):
+                targets[f"{prefix}.{name}"] = (root, name, module)
+
+    metadata = {
+        "format_version": QUANTIZATION_FORMAT_VERSION,
+        "bits": str(bits),
+        "group_size": str(group_size),
+        "layers": ",".join(sorted(targets)),
+        "cache_version": cache_version or "",
+    }
+    cached = None
+    if cache_path is not None and os.path.isfile(cache_path):
+        with safe_open(cache_path, framework="pt") as f:
+            if f.metadata() == metadata:
+                cached = load_file(cache_path)
+            else:
+                logger.warning(
+                    f"Quantized weight cache {cache_path} was written for other weights or settings, overwriting it."
+                )
+
+    to_save = {}
+    num_layers = len(targets)
+    # pop each layer so its float weight is freed as soon as it is replaced
+    for full_name in sorted(targets):
+        root, name, linear = targets.pop(full_name)
+        if cached is not None:
+            quantized = {
+                key: cached[f"{full_name}.{key}"]
+                for key in ("qweight", "scales", "scales_and_zeros")
+                if f"{full_name}.{key}" in cached
+            }
+        else:
+            quantized = quantize_linear_weight(linear.weight, bits, group_size)
+            to_save.update({f"{full_name}.{key}": value.cpu() for key, value in quantized.items()})
+        parent_name, _, child_name = name.rpartition(".")
+        parent = root.get_submodule(parent_name) if parent_name else root
+        setattr(parent, child_name, Qwen3TTSWeightOnlyLinear.from_linear(linear, bits, group_size, quantized))
+
+    if cache_path is not None and cached is None:
+        os.makedirs(os.path.dirname(os.path.abspath(cache_path)), exist_ok=True)
+        save_file(to_save, cache_path, metadata=metadata)
+    return num_layers
@@ -24,6 +24,7 @@ from torch import nn
 from torch.nn import Parameter
 from torch.nn import functional as F
 from transformers import MimiConfig, MimiModel
+from transformers.models.mimi.modeling_mimi import MimiConv1d
 from transformers.activations import ACT2FN
 from transformers.cache_utils import Cache, DynamicCache
 from transformers.integrations import use_kernel_forward_from_hub
@@ -175,6 +176,27 @@ class Qwen3TTSTokenizerV2DecoderPreTrainedModel(PreTrainedModel):
     _supports_attention_backend = True
 
 
+class Qwen3TTSTokenizerV2DecoderState:
+    """
+    Streaming state of `Qwen3TTSTokenizerV2Decoder`: the left context of every causal conv, the last input frames of
+    every transposed conv and the KV cache of the sliding-window `pre_transformer`.
+
+    All decoder blocks are causal, so feeding the codes chunk by chunk with the same state produces exactly the
+    samples of a single forward pass over all codes, while every frame is decoded once.
+
+    Example:
+        state = Qwen3TTSTokenizerV2DecoderState(decoder.config)
+        for codes in chunks:  # (batch_size, num_quantizers, chunk_length)
+            wav = decoder(codes, state=state)
+    """
+
+    def __init__(self, config: Qwen3TTSTokenizerV2DecoderConfig):
+        self.past_key_values = DynamicCache(config=config)
+        # keyed by module: the inputs the next call still needs
+        self.conv_tails = {}
+        self.num_frames = 0
+
+
 class Qwen3TTSTokenizerV2CausalConvNet(nn.Module):
     def __init__(
         self,
@@ -205,11 +227,26 @@ class Qwen3TTSTokenizerV2CausalConvNet(nn.Module):
         ideal_length = (math.ceil(n_frames) - 1) * self.stride + (self.kernel_size - self.padding)
         return ideal_length - length
 
-    def forward(self, hidden_state):
+    def forward(self, hidden_state, state: Optional[Qwen3TTSTokenizerV2DecoderState] = None):
+        if state is not None:
+            return self._stream(hidden_state, state)
         extra_padding = self._get_extra_padding_for_conv1d(hidden_state)
         hidden_state = F.pad(hidden_state, (self.padding, extra_padding), mode="constant", value=0)
         return self.conv(hidden_state).contiguous()
 
+    def _stream(self, hidden_state, state: Qwen3TTSTokenizerV2DecoderState):
+        if self.stride != 1:
+            raise ValueError("Streaming is only supported for causal convs with stride 1.")
+        if hidden_state.shape[-1] == 0:
+            return hidden_state.new_zeros(*hidden_state.shape[:-2], self.conv.out_channels, 0)
+        # the zero left padding of the first call, the last `padding` inputs afterwards
+        tail = state.conv_tails.get(self)
+        if tail is None:
+            tail = hidden_state.new_zeros(*hidden_state.shape[:-1], self.padding)
+        hidden_state = torch.cat((tail, hidden_state), dim=-1)
+        state.conv_tails[self] = hidden_state[..., hidden_state.shape[-1] - self.padding :]
+        return self.conv(hidden_state).contiguous()
+
 
 class Qwen3TTSTokenizerV2CausalTransConvNet(nn.Module):
     def __init__(self, in_channels, out_channels, kernel_size, stride=1):
@@ -219,8 +256,18 @@ class Qwen3TTSTokenizerV2CausalTransConvNet(nn.Module):
         pad = kernel_size - stride
         self.left_pad = math.ceil(pad)
         self.right_pad = pad = self.left_pad
-
-    def forward(self, hidden_state):
+        # output frame `t` also depends on the next `context` input frames
+        self.context = math.ceil(pad / stride)
+
+    def forward(self, hidden_state, state: Optional[Qwen3TTSTokenizerV2DecoderState] = None):
+        if state is not None:
+            # keep the last `context` inputs: the outputs they still contribute to are produced by the next call
+            tail = state.conv_tails.get(self)
+            if tail is not None:
+                hidden_state = torch.cat((tail, hidden_state), dim=-1)
+            state.conv_tails[self] = hidden_state[..., max(hidden_state.shape[-1] - self.context, 0) :]
+            if hidden_state.shape[-1] <= self.context:
+                return hidden_state.new_zeros(*hidden_state.shape[:-2], self.conv.out_channels, 0)
         hidden_state = self.conv(hidden_state)
         hidden_state = hidden_state[..., self.left_pad : hidden_state.shape[-1] - self.right_pad]
         return hidden_state.contiguous()
@@ -242,10 +289,10 @@ class Qwen3TTSTokenizerV2ConvNeXtBlock(nn.Module):
         self.pwconv2 = nn.Linear(4 * dim, dim)
         self.gamma = nn.Parameter(1e-6 * torch.ones(dim))
 
-    def forward(self, hidden_states):
+    def forward(self, hidden_states, state: Optional[Qwen3TTSTokenizerV2DecoderState] = None):
         input = hidden_states
 
-        hidden_states = self.dwconv(hidden_states)
+        hidden_states = self.dwconv(hidden_states, state=state)
         hidden_states = hidden_states.permute(0, 2, 1)
         hidden_states = self.norm(hidden_states)
         hidden_states = self.pwconv1(hidden_states)
@@ -651,13 +698,13 @@ class Qwen3TTSTokenizerV2DecoderDecoderResidualUnit(nn.Module):
         self.act2 = SnakeBeta(dim)
         self.conv2 = Qwen3TTSTokenizerV2CausalConvNet(dim, dim, kernel_size=1)
 
-    def forward(self, hidden_state):
+    def forward(self, hidden_state, state: Optional[Qwen3TTSTokenizerV2DecoderState] = None):
         residual = hidden_state
 
         hidden_state = self.act1(hidden_state)
-        hidden_state = self.conv1(hidden_state)
+        hidden_state = self.conv1(hidden_state, state=state)
         hidden_state = self.act2(hidden_state)
-        hidden_state = self.conv2(hidden_state)
+        hidden_state = self.conv2(hidden_state, state=state)
         return hidden_state + residual
 
 
@@ -678,9 +725,9 @@ class Qwen3TTSTokenizerV2DecoderDecoderBlock(Qwen3TTSTokenizerV2DecoderPreTraine
 
         self.block = nn.ModuleList(block)
 
-    def forward(self, hidden):
+    def forward(self, hidden, state: Optional[Qwen3TTSTokenizerV2DecoderState] = None):
         for block in self.block:
-            hidden = block(hidden)
+            hidden = block(hidden) if isinstance(block, SnakeBeta) else block(hidden, state=state)
         return hidden
 
 
@@ -699,9 +746,12 @@ class EuclideanCodebook(nn.Module):
         self.cluster_usage = nn.Parameter(torch.ones(codebook_size))
         self.embedding_sum = nn.Parameter(torch.zeros(codebook_size, dim))
 
+    @property
+    def embedding(self) -> torch.Tensor:
+        return self.embedding_sum / self.cluster_usage.clamp(min=self.epsilon)[:, None]
+
     def decode(self, codes: torch.Tensor) -> torch.Tensor:
-        embedding = self.embedding_sum / self.cluster_usage.clamp(min=self.epsilon)[:, None]
-        quantized = F.embedding(codes, embedding)
+        quantized = F.embedding(codes, self.embedding)
         return quantized
 
 
@@ -803,6 +853,19 @@ class ResidualVectorQuantizer(nn.Module):
         return quantized
 
 
+def _fold_projection(module: nn.Module, table: torch.Tensor) -> torch.Tensor:
+    """Apply the (linear) projection `module` to the float32 rows of `table`."""
+    if isinstance(module, nn.Identity):
+        return table
+    if isinstance(module, (nn.Linear, nn.Conv1d)):
+        # the quantizer projections are pointwise, a 1x1 conv is a linear layer over the channels
+        weight = module.weight[..., 0] if isinstance(module, nn.Conv1d) else module.weight
+        bias = module.bias.float() if module.bias is not None else None
+        return F.linear(table, weight.float(), bias)
+    dtype = next(module.parameters()).dtype
+    return module(table.to(dtype)).float()
+
+
 class SplitResidualVectorQuantizer(nn.Module):
     """Residual Vector Quantizer with separate projections for the first quantizer and the rest.
 
@@ -838,13 +901,42 @@ class SplitResidualVectorQuantizer(nn.Module):
             **kwargs,
         )
 
+        self._table_cache = None
+
+    def _build_dequantization_table(self) -> torch.Tensor:
+        tables = []
+        for rvq in (self.rvq_first, self.rvq_rest):
+            for layer in rvq.vq.layers:
+                table = _fold_projection(layer.project_out, layer._codebook.embedding.float())
+                tables.append(_fold_projection(rvq.output_proj, table))
+        return torch.stack(tables).to(self.rvq_first.vq.layers[0]._codebook.embedding_sum.dtype)
+
+    def dequantization_table(self) -> torch.Tensor:
+        """
+        Stacked `[n_q, bins, dimension]` table whose row `[k, c]` is the contribution of code `c` of codebook `k` to
+        the decoded representation, with the codebook normalisation and the output projections folded in.
+
+        The table is built once and reused as long as the parameters are not modified; with gradients enabled it is
+        rebuilt on every call so that they flow into the parameters.
+        """
+        if torch.is_grad_enabled() and any(p.requires_grad for p in self.parameters()):
+            return self._build_dequantization_table()
+        key = tuple((p.device, p.dtype, p.data_ptr(), p._version) for p in self.parameters())
+        if self._table_cache is None or self._table_cache[0] != key:
+            with torch.no_grad():
+                self._table_cache = (key, self._build_dequantization_table())
+        return self._table_cache[1]
+
     def decode(self, codes: torch.Tensor) -> torch.Tensor:
         """Decode the given codes to the quantized representation."""
         # codes is [B, K, T], with T frames, K nb of codebooks.
-        quantized = self.rvq_first.decode(codes[:, : self.n_q_semantic])
-        if codes.shape[1] > self.n_q_semantic:
-            quantized += self.rvq_rest.decode(codes[:, self.n_q_semantic :])
-        return quantized
+        batch_size, num_codebooks, length = codes.shape
+        table = self.dequantization_table()[:num_codebooks]
+        # one gather-and-sum over the flattened table: row `k * bins + c` for code `c` of codebook `k`
+        offsets = torch.arange(num_codebooks, device=codes.device) * table.shape[1]
+        indices = (codes + offsets[:, None]).transpose(1, 2).reshape(-1, num_codebooks)
+        quantized = F.embedding_bag(indices, table.reshape(-1, table.shape[-1]), mode="sum")
+        return quantized.reshape(batch_size, length, -1).transpose(1, 2)
 
 
 class Qwen3TTSTokenizerV2Decoder(Qwen3TTSTokenizerV2DecoderPreTrainedModel):
@@ -892,24 +984,52 @@ class Qwen3TTSTokenizerV2Decoder(Qwen3TTSTokenizerV2DecoderPreTrainedModel):
 
         self.post_init()
 
-    def forward(self, codes):
+    def forward(self, codes, state: Optional[Qwen3TTSTokenizerV2DecoderState] = None):
+        """
+        Decode `codes` of shape `(batch_size, num_quantizers, length)` into waveforms of shape `(batch_size, 1,
+        num_samples)`.
+
+        With a `state`, `codes` continue the codes of the previous calls with that state and only the samples that
+        become final with them are returned: the transposed convs hold back the last frame until its successor
+        arrives. The concatenated outputs match a single call over all codes.
+        """
         if codes.shape[1] != self.config.num_quantizers:
             raise ValueError(f"Expected {self.config.num_quantizers} layer of codes, got {codes.shape[1]}")
 
         hidden = self.quantizer.decode(codes)
-        hidden = self.pre_conv(hidden).transpose(1, 2)
+        hidden = self.pre_conv(hidden, state=state).transpose(1, 2)
 
-        hidden = self.pre_transformer(inputs_embeds=hidden).last_hidden_state
+        if state is None:
+            hidden = self.pre_transformer(inputs_embeds=hidden).last_hidden_state
+        else:
+            hidden = self.pre_transformer(
+                inputs_embeds=hidden, past_key_values=state.past_key_values, use_cache=True
+            ).last_hidden_state
+            state.num_frames += codes.shape[-1]
         hidden = hidden.permute(0, 2, 1)
         for blocks in self.upsample:
             for block in blocks:
-                hidden = block(hidden)
+                hidden = block(hidden, state=state)
         wav = hidden
         for block in self.decoder:
-            wav = block(wav)
+            wav = block(wav) if isinstance(block, SnakeBeta) else block(wav, state=state)
         return wav.clamp(min=-1, max=1)
 
-    def chunked_decode(self, codes, chunk_size=300, left_context_size=25):
+    def chunked_decode(self, codes, chunk_size=300, left_context_size=None):
+        """
+        Decode `codes` in chunks of `chunk_size` frames to bound the activation memory. By default the chunks are
+        decoded with a `Qwen3TTSTokenizerV2DecoderState`, which gives the output of a single forward pass without
+        decoding any frame twice; with `left_context_size`, every chunk is instead decoded from scratch together with
+        that many preceding frames.
+        """
+        if left_context_size is None:
+            state = Qwen3TTSTokenizerV2DecoderState(self.config)
+            wavs = [
+                self(codes[..., start : start + chunk_size], state=state)
+                for start in range(0, codes.shape[-1], chunk_size)
+            ]
+            return torch.cat(wavs, dim=-1)
+
         wavs = []
         start_index = 0
         while start_index < codes.shape[-1]:
@@ -921,6 +1041,49 @@ class Qwen3TTSTokenizerV2Decoder(Qwen3TTSTokenizerV2DecoderPreTrainedModel):
             start_index = end_index
         return torch.cat(wavs, dim=-1)
 
+    def parallel_chunked_decode(self, codes, chunk_size=300, left_context_size=25, max_windows_per_batch=None):
+        """
+        Decode long `codes` as overlapping windows stacked along the batch dimension, instead of one chunk after the
+        other, to keep the hardware busy on long single utterances.
+
+        Every window covers `chunk_size` frames plus up to `left_context_size` preceding frames as context and one
+        following frame, which completes the samples of its last frame. Windows of the same length run in one forward
+        (at most `max_windows_per_batch` at a time) and the chunk samples of every window are stitched together. As
+        with `chunked_decode(left_context_size=...)`, the history beyond the left context is not seen, so the output
+        is close to, not identical with, a single forward pass.
+        """
+        total_frames = codes.shape[-1]
+        windows = []
+        for start in range(0, total_frames, chunk_size):
+            end = min(start + chunk_size, total_frames)
+            context = min(left_context_size, start)
+            windows.append((start - context, min(end + 1, total_frames), context, end - start))
+
+        # (first, interior and last windows) -> at most three distinct lengths
+        by_length = {}
+        for index, (window_start, window_end, _, _) in enumerate(windows):
+            by_length.setdefault(window_end - window_start, []).append(index)
+
+        batch_size = codes.shape[0]
+        wavs = [None] * len(windows)
+        for indices in by_length.values():
+            step = max_windows_per_batch or len(indices)
+            for offset in range(0, len(indices), step):
+                group = indices[offset : offset + step]
+                stacked = torch.cat([codes[..., windows[i][0] : windows[i][1]] for i in group], dim=0)
+                for i, wav in zip(group, self(stacked).split(batch_size, dim=0)):
+                    _, _, context, length = windows[i]
+                    wavs[i] = wav[..., context * self.total_upsample : (context + length) * self.total_upsample]
+        return torch.cat(wavs, dim=-1)
+
+
+def _pad_conv_input_to_stride(module: MimiConv1d, args: tuple) -> tuple:
+    # outside of streaming, `MimiConv1d` pads the right end of its input to a whole number of strides; with a padding
+    # cache it does not, which drops the samples of a last, incomplete frame
+    hidden_states = args[0]
+    extra_padding = int(module._get_extra_padding_for_conv1d(hidden_states))
+    return (module._pad1d(hidden_states, (0, extra_padding), mode=module.pad_mode), *args[1:])
+
 
 class Qwen3TTSTokenizerV2Encoder(MimiModel):
     def __init__(self, config: MimiConfig):
@@ -989,6 +1152,7 @@ class Qwen3TTSTokenizerV2Model(Qwen3TTSTokenizerV2PreTrainedModel):
         input_values: torch.Tensor,
         padding_mask: Optional[torch.Tensor] = None,
         return_dict: Optional[bool] = None,
+        chunk_size: Optional[int] = None,
     ) -> Union[tuple[torch.Tensor, Optional[torch.Tensor]], Qwen3TTSTokenizerV2EncoderOutput]:
         """
         Encodes the input audio waveform into discrete codes.
@@ -1001,12 +1165,16 @@ class Qwen3TTSTokenizerV2Model(Qwen3TTSTokenizerV2PreTrainedModel):
                 for *masked*.
             return_dict (`bool`, *optional*):
                 Whether or not to return a [`~utils.ModelOutput`] instead of a plain tuple.
+            chunk_size (`int`, *optional*):
+                If set, the waveform is encoded in windows of `chunk_size` frames, see `streaming_encode`.
         """
         return_dict = return_dict if return_dict is not None else self.config.return_dict
 
-        encoded_frames = self.encoder.encode(input_values=input_values.unsqueeze(1),
-                                             return_dict=True)
-        audio_codes = encoded_frames.audio_codes[:, :self.encoder_valid_num_quantizers]
+        if chunk_size is None:
+            audio_codes = self.encoder.encode(input_values=input_values.unsqueeze(1), return_dict=True).audio_codes
+        else:
+            audio_codes = self.streaming_encode(input_values, chunk_size)
+        audio_codes = audio_codes[:, :self.encoder_valid_num_quantizers]
         audio_codes = [code[..., :-(-mask.sum() // self.encode_downsample_rate)].transpose(0, 1) for code, mask in zip(audio_codes, padding_mask)]
 
         if not return_dict:
@@ -1016,10 +1184,56 @@ class Qwen3TTSTokenizerV2Model(Qwen3TTSTokenizerV2PreTrainedModel):
 
         return Qwen3TTSTokenizerV2EncoderOutput(audio_codes)
 
+    def streaming_encode(self, input_values: torch.Tensor, chunk_size: int = 750) -> torch.Tensor:
+        """
+        Encode `input_values` of shape `(batch_size, sequence_length)` in windows of `chunk_size` frames, carrying the
+        left context of the causal encoder convs and the sliding-window KV cache of the encoder transformer from one
+        window to the next. The codes match a single pass over the whole waveform, while the activation memory only
+        depends on `chunk_size`, so arbitrarily long recordings can be encoded. Every window but the last one covers
+        whole frames; when the waveform ends inside a frame, the convs of the last window pad their inputs on the
+        right the way the single pass does, so the last frame gets the same codes too.
+
+        Returns:
+            `torch.LongTensor` of shape `(batch_size, num_quantizers, num_frames)`.
+        """
+        if chunk_size < 1:
+            raise ValueError(f"`chunk_size` must be >= 1, got {chunk_size}")
+        num_samples = input_values.shape[-1]
+        input_values = input_values.unsqueeze(1)
+
+        # whole frames per window, so that every window starts on a stride boundary of the downsampling convs
+        window = chunk_size * self.encode_downsample_rate
+        past_key_values = DynamicCache(config=self.encoder.config)
+        padding_cache = None
+        audio_codes = []
+        for start in range(0, num_samples, window):
+            hooks = []
+            if start + window >= num_samples and num_samples % self.encode_downsample_rate:
+                hooks = [
+                    module.register_forward_pre_hook(_pad_conv_input_to_stride)
+                    for module in self.encoder.modules()
+                    if isinstance(module, MimiConv1d) and module.causal
+                ]
+            try:
+                encoded_frames = self.encoder.encode(
+                    input_values=input_values[..., start : start + window],
+                    encoder_past_key_values=past_key_values,
+                    padding_cache=padding_cache,
+                    use_streaming=True,
+                    return_dict=True,
+                )
+            finally:
+                for hook in hooks:
+                    hook.remove()
+            padding_cache = encoded_frames.padding_cache
+            audio_codes.append(encoded_frames.audio_codes)
+        return torch.cat(audio_codes, dim=-1)
+
     def decode(
         self,
         audio_codes: torch.Tensor,
         return_dict: Optional[bool] = None,
+        parallel_chunks: bool = False,
     ) -> Union[tuple[torch.Tensor, torch.Tensor], Qwen3TTSTokenizerV2DecoderOutput]:
         """
         Decodes the given frames into an output audio waveform.
@@ -1032,11 +1246,17 @@ class Qwen3TTSTokenizerV2Model(Qwen3TTSTokenizerV2PreTrainedModel):
                 Discret code embeddings computed using `model.encode`.
             return_dict (`bool`, *optional*):
                 Whether or not to return a [`~utils.ModelOutput`] instead of a plain tuple.
+            parallel_chunks (`bool`, *optional*, defaults to `False`):
+                Whether to decode long inputs as overlapping windows batched together (see
+                `Qwen3TTSTokenizerV2Decoder.parallel_chunked_decode`) instead of chunk after chunk.
 
         """
         return_dict = return_dict if return_dict is not None else self.config.return_dict
 
-        audio_values = self.decoder.chunked_decode(audio_codes.transpose(1, 2)).squeeze(1)
+        if parallel_chunks:
+            audio_values = self.decoder.parallel_chunked_decode(audio_codes.transpose(1, 2)).squeeze(1)
+        else:
+            audio_values = self.decoder.chunked_decode(audio_codes.transpose(1, 2)).squeeze(1)
 
         audio_lengths = (audio_codes[..., 0] > 0).sum(1) * self.decode_upsample_rate
         audio_values = [a[:l] for a, l in zip(audio_values, audio_lengths)]
@@ -1049,4 +1269,4 @@ class Qwen3TTSTokenizerV2Model(Qwen3TTSTokenizerV2PreTrainedModel):
         return Qwen3TTSTokenizerV2DecoderOutput(audio_values)
 
 
-__all__ = ["Qwen3TTSTokenizerV2Model", "Qwen3TTSTokenizerV2PreTrainedModel"]
+__all__ = ["Qwen3TTSTokenizerV2Model", "Qwen3TTSTokenizerV2PreTrainedModel", "Qwen3TTSTokenizerV2DecoderState"]
@@ -450,26 +450,44 @@ class DiTInputEmbedding(nn.Module):
         )
         self.spk_encoder = ECAPA_TimeDelayNet(config)
 
-    def forward(
+    def prepare_condition(
         self,
-        hidden_states: torch.Tensor,
         speaker_embedding: torch.Tensor,
         condition_vector: torch.Tensor,
         code_embed: torch.Tensor,
         drop_audio_cond: Optional[bool] = False,
         code_embed_uncond: Optional[bool] = None,
         apply_cfg: Optional[bool] = True,
-    ):
+    ) -> torch.Tensor:
+        """The input features besides the noised mel, which do not change over the ODE steps."""
         if apply_cfg:
-            hidden_states = torch.cat([hidden_states, hidden_states], dim=0)
             speaker_embedding = torch.cat([speaker_embedding, torch.zeros_like(speaker_embedding)], dim=0)
             condition_vector = torch.cat([condition_vector, torch.zeros_like(condition_vector)], dim=0)
             code_embed = torch.cat([code_embed, code_embed_uncond], dim=0)
         elif drop_audio_cond:  # cfg for cond audio
             condition_vector = torch.zeros_like(condition_vector)
             speaker_embedding = torch.zeros_like(speaker_embedding)
-        condition_vector = self.spk_encoder(condition_vector).unsqueeze(1).repeat(1, hidden_states.size(1), 1)
-        hidden_states = self.proj(torch.cat((hidden_states, condition_vector, code_embed, speaker_embedding), dim=-1))
+        condition_vector = self.spk_encoder(condition_vector).unsqueeze(1).repeat(1, code_embed.size(1), 1)
+        return torch.cat((condition_vector, code_embed, speaker_embedding), dim=-1)
+
+    def forward(
+        self,
+        hidden_states: torch.Tensor,
+        speaker_embedding: Optional[torch.Tensor] = None,
+        condition_vector: Optional[torch.Tensor] = None,
+        code_embed: Optional[torch.Tensor] = None,
+        drop_audio_cond: Optional[bool] = False,
+        code_embed_uncond: Optional[bool] = None,
+        apply_cfg: Optional[bool] = True,
+        condition: Optional[torch.Tensor] = None,
+    ):
+        if condition is None:
+            condition = self.prepare_condition(
+                speaker_embedding, condition_vector, code_embed, drop_audio_cond, code_embed_uncond, apply_cfg
+            )
+        if apply_cfg:
+            hidden_states = torch.cat([hidden_states, hidden_states], dim=0)
+        hidden_states = self.proj(torch.cat((hidden_states, condition), dim=-1))
 
         return hidden_states
 
@@ -689,8 +707,11 @@ class DiTDecoderLayer(nn.Module):
         self.ff_norm = nn.LayerNorm(config.hidden_size, elementwise_affine=False, eps=1e-6)
         self.ff = DiTMLP(dim=config.hidden_size, mult=config.ff_mult, dropout=config.dropout)
 
+    def attention_mask(self, block_diff):
+        return (block_diff >= -float(self.look_backward_block)) & (block_diff <= float(self.look_ahead_block))
+
     def forward(
-        self, hidden_states, timestep, position_embeddings=None, block_diff=None
+        self, hidden_states, timestep, position_embeddings=None, block_diff=None, attention_mask=None
     ):  # x: noised input, t: time embedding
         # pre-norm & modulation for attention input
         norm, gate_msa, shift_mlp, scale_mlp, gate_mlp = self.attn_norm(hidden_states, emb=timestep)
@@ -699,8 +720,7 @@ class DiTDecoderLayer(nn.Module):
         attn_output = self.attn(
             hidden_states=norm,
             position_embeddings=position_embeddings,
-            attention_mask=(block_diff >= -float(self.look_backward_block))
-            & (block_diff <= float(self.look_ahead_block)),
+            attention_mask=attention_mask if attention_mask is not None else self.attention_mask(block_diff),
         )
 
         # process attention output for input x
@@ -747,11 +767,14 @@ class SnakeBeta(nn.Module):
         beta = self.beta.unsqueeze(0).unsqueeze(-1)
         alpha = torch.exp(alpha)
         beta = torch.exp(beta)
-        hidden_states = hidden_states + (1.0 / (beta + self.no_div_by_zero)) * torch.pow(
-            torch.sin(hidden_states * alpha), 2
-        )
+        if torch.is_grad_enabled():
+            return hidden_states + (1.0 / (beta + self.no_div_by_zero)) * torch.pow(
+                torch.sin(hidden_states * alpha), 2
+            )
 
-        return hidden_states
+        # same arithmetic, in place on one temporary
+        periodic = torch.mul(hidden_states, alpha).sin_().square_()
+        return periodic.mul_(1.0 / (beta + self.no_div_by_zero)).add_(hidden_states)
 
 
 def kaiser_sinc_filter1d(cutoff, half_width, kernel_size):
@@ -800,6 +823,31 @@ def kaiser_sinc_filter1d(cutoff, half_width, kernel_size):
     return normalized_filter.view(1, 1, kernel_size)
 
 
+def replicate_edge_responses(padded_forward, forward, filter, length):
+    """
+    `padded_forward` resamples its input replicate padded, `forward` zero padded. Both are linear, so they differ by
+    the response to the first input sample at the start of the output plus the response to the last one at its end.
+
+    Returns:
+        `tuple[torch.Tensor, torch.Tensor]`: The start and end responses (float32), computed in float64 on impulses of
+        `length` samples (a multiple of the stride, long enough for the two edges not to overlap).
+    """
+    filter = filter.double()
+    impulses = torch.zeros(2, 1, length, dtype=torch.float64)
+    impulses[0, 0, 0] = 1
+    impulses[1, 0, -1] = 1
+    difference = (padded_forward(impulses, filter) - forward(impulses, filter))[:, 0]
+    left_width = int(difference[0].nonzero().max()) + 1
+    right_width = difference.shape[-1] - int(difference[1].nonzero().min())
+    return difference[0, :left_width].float(), difference[1, -right_width:].float()
+
+
+def add_replicate_edges(hidden_states, inputs, left_edge, right_edge):
+    hidden_states[..., : left_edge.shape[-1]] += inputs[..., :1] * left_edge
+    hidden_states[..., -right_edge.shape[-1] :] += inputs[..., -1:] * right_edge
+    return hidden_states
+
+
 class UpSample1d(nn.Module):
     def __init__(self, ratio=2, kernel_size=None):
         super().__init__()
@@ -813,17 +861,48 @@ class UpSample1d(nn.Module):
         filter = kaiser_sinc_filter1d(cutoff=0.5 / ratio, half_width=0.6 / ratio, kernel_size=self.kernel_size)
         self.register_buffer("filter", filter, persistent=False)
 
-    def forward(self, hidden_states):
+        # `forward` skips the replicate padding: the output of the unpadded input is cropped by the transposed
+        # convolution itself and the contribution of the padding is added back on the edges.
+        self.crop = (self.kernel_size - self.stride) // 2
+        self.min_length = self.kernel_size
+        left_edge, right_edge = replicate_edge_responses(
+            self._padded_forward, self._unpadded_forward, filter, 4 * self.kernel_size
+        )
+        # the gain folded into the taps (exact for power of two ratios)
+        self.register_buffer("scaled_filter", self.ratio * filter, persistent=False)
+        self.register_buffer("left_edge", left_edge, persistent=False)
+        self.register_buffer("right_edge", right_edge, persistent=False)
+
+    def _padded_forward(self, hidden_states, filter):
         channels = hidden_states.shape[1]
 
         hidden_states = F.pad(hidden_states, (self.pad, self.pad), mode="replicate")
         hidden_states = self.ratio * F.conv_transpose1d(
-            hidden_states, self.filter.expand(channels, -1, -1), stride=self.stride, groups=channels
+            hidden_states, filter.expand(channels, -1, -1), stride=self.stride, groups=channels
         )
         hidden_states = hidden_states[..., self.pad_left : -self.pad_right]
 
         return hidden_states
 
+    def _unpadded_forward(self, hidden_states, filter, scaled=False):
+        channels = hidden_states.shape[1]
+        hidden_states = F.conv_transpose1d(
+            hidden_states,
+            (filter if scaled else self.ratio * filter).expand(channels, -1, -1),
+            stride=self.stride,
+            padding=self.crop,
+            groups=channels,
+        )
+        if self.pad_right > self.pad_left:
+            hidden_states = hidden_states[..., : self.pad_left - self.pad_right]
+        return hidden_states
+
+    def forward(self, hidden_states):
+        if hidden_states.shape[-1] < self.min_length:
+            return self._padded_forward(hidden_states, self.filter)
+        upsampled = self._unpadded_forward(hidden_states, self.scaled_filter, scaled=True)
+        return add_replicate_edges(upsampled, hidden_states, self.left_edge, self.right_edge)
+
 
 class DownSample1d(nn.Module):
     def __init__(self, ratio=2, kernel_size=None):
@@ -840,15 +919,42 @@ class DownSample1d(nn.Module):
         self.pad_left = kernel_size // 2 - int(self.even)
         self.pad_right = kernel_size // 2
         self.stride = ratio
+        self.kernel_size = kernel_size
         filter = kaiser_sinc_filter1d(cutoff, half_width, kernel_size)
         self.register_buffer("filter", filter, persistent=False)
 
-    def forward(self, hidden_states):
+        # As in `UpSample1d`, `forward` convolves with zero padding (inside the convolution) and adds the
+        # contribution of the replicate padding on the edges, for lengths that are a multiple of the stride.
+        self.min_length = 2 * kernel_size
+        left_edge, right_edge = replicate_edge_responses(
+            self._padded_forward, self._unpadded_forward, filter, 4 * kernel_size * ratio
+        )
+        self.register_buffer("left_edge", left_edge, persistent=False)
+        self.register_buffer("right_edge", right_edge, persistent=False)
+
+    def _padded_forward(self, hidden_states, filter):
         channels = hidden_states.shape[1]
         hidden_states = F.pad(hidden_states, (self.pad_left, self.pad_right), mode="replicate")
-        out = F.conv1d(hidden_states, self.filter.expand(channels, -1, -1), stride=self.stride, groups=channels)
+        out = F.conv1d(hidden_states, filter.expand(channels, -1, -1), stride=self.stride, groups=channels)
         return out
 
+    def _unpadded_forward(self, hidden_states, filter):
+        channels = hidden_states.shape[1]
+        return F.conv1d(
+            hidden_states, filter.expand(channels, -1, -1), stride=self.stride, padding=self.pad_left, groups=channels
+        )
+
+    def forward(self, hidden_states):
+        length = hidden_states.shape[-1]
+        # the zero padded output is as long as the replicate padded one
+        same_length = (length + 2 * self.pad_left - self.kernel_size) // self.stride == (
+            length + self.pad_left + self.pad_right - self.kernel_size
+        ) // self.stride
+        if length < self.min_length or length % self.stride != 0 or not same_length:
+            return self._padded_forward(hidden_states, self.filter)
+        out = self._unpadded_forward(hidden_states, self.filter)
+        return add_replicate_edges(out, hidden_states, self.left_edge, self.right_edge)
+
 
 class TorchActivation1d(nn.Module):
     def __init__(
@@ -1085,6 +1191,9 @@ class Qwen3TTSTokenizerV1DecoderBigVGANModel(Qwen3TTSTokenizerV1DecoderPreTraine
         return torch.clamp(output_waveform, min=-1.0, max=1.0).squeeze(1)
 
 
+DIT_ODE_SOLVERS = ("euler", "midpoint", "heun", "multistep")
+
+
 @auto_docstring
 class Qwen3TTSTokenizerV1DecoderDiTModel(Qwen3TTSTokenizerV1DecoderPreTrainedModel):
     config: Qwen3TTSTokenizerV1DecoderDiTConfig
@@ -1120,37 +1229,36 @@ class Qwen3TTSTokenizerV1DecoderDiTModel(Qwen3TTSTokenizerV1DecoderPreTrainedMod
         self.proj_out = nn.Linear(config.hidden_size, config.mel_dim)
 
     def _create_block_diff(self, hidden_states):
-        batch, seq_len = hidden_states.shape[0], hidden_states.shape[1]
+        seq_len = hidden_states.shape[1]
         block_indices = torch.arange(seq_len, device=hidden_states.device) // self.block_size  # [seq_length]
 
         block_i = block_indices.unsqueeze(1)  # [seq_length, 1]
         block_j = block_indices.unsqueeze(0)  # [1, seq_length]
         block_diff = block_j - block_i  # (n, n)
 
-        return block_diff.expand(batch, self.num_attention_heads, seq_len, seq_len)
+        # broadcast over batch and heads
+        return block_diff[None, None]
 
-    def forward(
+    def prepare_step_inputs(
         self,
-        hidden_states,
         condition_vector,
         speaker_embedding,
         quantized_code,
-        time_step,
         drop_audio_conditioning=False,
         drop_code=False,
         apply_cfg=True,
     ):
-        batch_size = hidden_states.shape[0] * 2
-        if time_step.ndim == 0:
-            time_step = time_step.repeat(batch_size)
+        """
+        Compute what `forward` needs besides the noised input and the time step: the conditioning features, the
+        rotary tables and one attention mask per transformer block, shared by the blocks with the same look-back /
+        look-ahead. The tables and masks have a batch and head dimension of 1.
 
-        # Compute embeddings
-        time_embedding = self.time_embed(time_step)
+        Returns:
+            `dict`: To pass to `forward` as `step_inputs`, for all the ODE steps of one `sample` call.
+        """
         text_embedding = self.text_embed(quantized_code, drop_code=False if apply_cfg else drop_code)
         text_embedding_unconditioned = self.text_embed(quantized_code, drop_code=True) if apply_cfg else None
-
-        hidden_states = self.input_embed(
-            hidden_states,
+        condition = self.input_embed.prepare_condition(
             speaker_embedding,
             condition_vector,
             text_embedding,
@@ -1159,17 +1267,59 @@ class Qwen3TTSTokenizerV1DecoderDiTModel(Qwen3TTSTokenizerV1DecoderPreTrainedMod
             apply_cfg=apply_cfg,
         )
 
-        # Compute positional encodings
-        position_embeddings = self.rotary_embed(hidden_states)
-        blockwise_difference = self._create_block_diff(hidden_states)
+        position_embeddings = self.rotary_embed(condition[:1])
+        blockwise_difference = self._create_block_diff(condition)
+        masks = {}
+        attention_masks = []
+        for transformer_block in self.transformer_blocks:
+            key = (transformer_block.look_backward_block, transformer_block.look_ahead_block)
+            if key not in masks:
+                masks[key] = transformer_block.attention_mask(blockwise_difference)
+            attention_masks.append(masks[key])
+
+        return {
+            "condition": condition,
+            "position_embeddings": position_embeddings,
+            "attention_masks": attention_masks,
+        }
+
+    def forward(
+        self,
+        hidden_states,
+        condition_vector,
+        speaker_embedding,
+        quantized_code,
+        time_step,
+        drop_audio_conditioning=False,
+        drop_code=False,
+        apply_cfg=True,
+        step_inputs=None,
+    ):
+        if step_inputs is None:
+            step_inputs = self.prepare_step_inputs(
+                condition_vector,
+                speaker_embedding,
+                quantized_code,
+                drop_audio_conditioning=drop_audio_conditioning,
+                drop_code=drop_code,
+                apply_cfg=apply_cfg,
+            )
+
+        batch_size = hidden_states.shape[0] * 2 if apply_cfg else hidden_states.shape[0]
+        if time_step.ndim == 0:
+            time_step = time_step.repeat(batch_size)
+
+        # Compute embeddings
+        time_embedding = self.time_embed(time_step)
+        hidden_states = self.input_embed(hidden_states, apply_cfg=apply_cfg, condition=step_inputs["condition"])
 
         # Transformer blocks
-        for transformer_block in self.transformer_blocks:
+        for transformer_block, attention_mask in zip(self.transformer_blocks, step_inputs["attention_masks"]):
             hidden_states = transformer_block(
                 hidden_states,
                 time_embedding,
-                position_embeddings=position_embeddings,
-                block_diff=blockwise_difference,
+                position_embeddings=step_inputs["position_embeddings"],
+                attention_mask=attention_mask,
             )
 
         hidden_states = self.norm_out(hidden_states, time_embedding)
@@ -1195,14 +1345,52 @@ class Qwen3TTSTokenizerV1DecoderDiTModel(Qwen3TTSTokenizerV1DecoderPreTrainedMod
         num_steps=10,
         guidance_scale=0.5,
         sway_coefficient=-1.0,
+        solver="euler",
+        generator=None,
+        guidance_schedule=None,
     ):
-        noise_initialization = torch.randn([quantized_code.shape[0], 30000, self.mel_dim], dtype=reference_mel_spectrogram.dtype)
+        """
+        Integrate the flow from noise to the mel spectrogram over `num_steps` time points (`num_steps - 1` intervals).
+        The initial noise is drawn on the device of `quantized_code`, from `generator` (on that device) if given.
+
+        `guidance_schedule` selects the DiT evaluations that use classifier-free guidance, the others run the
+        conditional branch only, at half the batch:
+            - `None`: all of them.
+            - `int` k: those of the first k ODE steps.
+            - `(start, end)`: those at a flow time in `[start, end]` (0 is the noise, 1 the mel).
+
+        `solver` is one of `DIT_ODE_SOLVERS`:
+            - "euler": first order, one DiT evaluation per interval.
+            - "midpoint" / "heun": second order, two evaluations per interval.
+            - "multistep": second-order Adams-Bashforth on the previous velocity, one evaluation per interval, so it
+              reaches about the accuracy of the two-evaluation solvers at the cost of Euler.
+        """
+        if solver not in DIT_ODE_SOLVERS:
+            raise ValueError(f"`solver` must be one of {DIT_ODE_SOLVERS}, got {solver!r}")
+        if num_steps < 2:
+            raise ValueError(f"`num_steps` must be >= 2, got {num_steps}")
+        if guidance_schedule is not None and not isinstance(guidance_schedule, int):
+            guidance_start, guidance_end = guidance_schedule
         maximum_duration = quantized_code.shape[1] * self.repeats
-        initial_state = noise_initialization[:, :maximum_duration].to(quantized_code.device)
+        initial_state = torch.randn(
+            [quantized_code.shape[0], maximum_duration, self.mel_dim],
+            generator=generator,
+            device=quantized_code.device,
+            dtype=reference_mel_spectrogram.dtype,
+        )
         conditioning_vector = conditioning_vector.unsqueeze(1).repeat(1, maximum_duration, 1)
-
-        def ode_function(time_step, hidden_states):
-            if guidance_scale < 1e-5:
+        step_inputs = self.prepare_step_inputs(reference_mel_spectrogram, conditioning_vector, quantized_code)
+        # the conditional half of the guided batch
+        conditional_step_inputs = dict(step_inputs, condition=step_inputs["condition"][: quantized_code.shape[0]])
+
+        def ode_function(time_step, hidden_states, step=0):
+            if guidance_schedule is None:
+                guided = True
+            elif isinstance(guidance_schedule, int):
+                guided = step < guidance_schedule
+            else:
+                guided = guidance_start <= float(time_step) <= guidance_end
+            if guidance_scale < 1e-5 or not guided:
                 prediction = self(
                     hidden_states=hidden_states,
                     speaker_embedding=conditioning_vector,
@@ -1211,6 +1399,8 @@ class Qwen3TTSTokenizerV1DecoderDiTModel(Qwen3TTSTokenizerV1DecoderPreTrainedMod
                     time_step=time_step,
                     drop_audio_conditioning=False,
                     drop_code=False,
+                    apply_cfg=False,
+                    step_inputs=conditional_step_inputs,
                 )
                 return prediction
 
@@ -1221,6 +1411,7 @@ class Qwen3TTSTokenizerV1DecoderDiTModel(Qwen3TTSTokenizerV1DecoderPreTrainedMod
                 condition_vector=reference_mel_spectrogram,
                 time_step=time_step,
                 apply_cfg=True,
+                step_inputs=step_inputs,
             )
             guided_prediction, null_prediction = torch.chunk(model_output, 2, dim=0)
 
@@ -1235,9 +1426,21 @@ class Qwen3TTSTokenizerV1DecoderDiTModel(Qwen3TTSTokenizerV1DecoderPreTrainedMod
             time_embedding += sway_coefficient * (torch.cos(torch.pi / 2 * time_embedding) - 1 + time_embedding)
 
         values = initial_state.clone()
-        for t0, t1 in zip(time_embedding[:-1], time_embedding[1:]):
+        previous_velocity, previous_dt = None, None
+        for step, (t0, t1) in enumerate(zip(time_embedding[:-1], time_embedding[1:])):
             dt = t1 - t0
-            vt = ode_function(t0, values)
+            vt = ode_function(t0, values, step)
+            if solver == "midpoint":
+                vt = ode_function(t0 + dt / 2, values + vt * (dt / 2), step)
+            elif solver == "heun":
+                vt = (vt + ode_function(t1, values + vt * dt, step)) / 2
+            elif solver == "multistep" and previous_velocity is not None:
+                # variable step size Adams-Bashforth 2
+                ratio = dt / previous_dt
+                vt, previous_velocity = vt + (vt - previous_velocity) * (ratio / 2), vt
+            else:
+                previous_velocity = vt
+            previous_dt = dt
             values = values + vt * dt
 
         generated_mel_spectrogram = values.permute(0, 2, 1)
@@ -1279,9 +1482,17 @@ class Qwen3TTSTokenizerV1Decoder(Qwen3TTSTokenizerV1DecoderPreTrainedModel):
         num_steps=10,
         guidance_scale=0.5,
         sway_coefficient=-1.0,
+        solver="euler",
+        generator=None,
+        guidance_schedule=None,
         **kwargs,
     ):
-        """Generates a waveform from input code and conditioning parameters."""
+        """
+        Generates a waveform from input code and conditioning parameters.
+
+        `num_steps`, `guidance_scale`, `sway_coefficient`, `solver`, `generator` and `guidance_schedule` are passed
+        to `Qwen3TTSTokenizerV1DecoderDiTModel.sample`.
+        """
 
         mel_spectrogram = self.dit.sample(
             conditioning,
@@ -1290,6 +1501,9 @@ class Qwen3TTSTokenizerV1Decoder(Qwen3TTSTokenizerV1DecoderPreTrainedModel):
             num_steps=num_steps,
             guidance_scale=guidance_scale,
             sway_coefficient=sway_coefficient,
+            solver=solver,
+            generator=generator,
+            guidance_schedule=guidance_schedule,
         )
 
         waveform = self.bigvgan(mel_spectrogram)
@@ -1393,8 +1607,12 @@ class Qwen3TTSTokenizerV1Model(Qwen3TTSTokenizerV1PreTrainedModel):
 
         self.post_init()
     
-    def load_encoder_xvector_extractor(self, model_path):
-        self.encoder_xvector_extractor = XVectorExtractor(model_path)
+    def load_encoder_xvector_extractor(self, model_path, **extractor_kwargs):
+        """
+        Load the CAM++ x-vector extractor. `extractor_kwargs` are forwarded to `XVectorExtractor`, e.g. the
+        onnxruntime `intra_op_num_threads`, `inter_op_num_threads` and `providers`.
+        """
+        self.encoder_xvector_extractor = XVectorExtractor(model_path, **extractor_kwargs)
     
     def get_model_type(self):
         return self.config.model_type
@@ -1425,8 +1643,13 @@ class Qwen3TTSTokenizerV1Model(Qwen3TTSTokenizerV1PreTrainedModel):
         revision="main",
         use_safetensors=None,
         weights_only=True,
+        xvector_extractor_kwargs=None,
         **kwargs,
     ):
+        """
+        Load the model and its CAM++ x-vector extractor (`campplus.onnx`). `xvector_extractor_kwargs` are forwarded to
+        `load_encoder_xvector_extractor`.
+        """
         model = super().from_pretrained(
             pretrained_model_name_or_path,
             *model_args,
@@ -1455,7 +1678,7 @@ class Qwen3TTSTokenizerV1Model(Qwen3TTSTokenizerV1PreTrainedModel):
         )
         if encoder_xvector_extractor_path is None:
             raise ValueError(f"""{pretrained_model_name_or_path}/{encoder_xvector_extractor_path} not exists""")
-        model.load_encoder_xvector_extractor(encoder_xvector_extractor_path)
+        model.load_encoder_xvector_extractor(encoder_xvector_extractor_path, **(xvector_extractor_kwargs or {}))
 
         return model
 
@@ -1464,6 +1687,8 @@ class Qwen3TTSTokenizerV1Model(Qwen3TTSTokenizerV1PreTrainedModel):
         input_values: torch.Tensor,
         padding_mask: Optional[torch.Tensor] = None,
         return_dict: Optional[bool] = None,
+        xvector_batch_size: Optional[int] = None,
+        max_padding_frames: Optional[int] = None,
     ) -> Union[tuple[torch.Tensor, Optional[torch.Tensor]], Qwen3TTSTokenizerV1EncoderOutput]:
         """
         Encodes the input audio waveform into discrete codes.
@@ -1476,6 +1701,10 @@ class Qwen3TTSTokenizerV1Model(Qwen3TTSTokenizerV1PreTrainedModel):
                 for *masked*.
             return_dict (`bool`, *optional*):
                 Whether or not to return a [`~utils.ModelOutput`] instead of a plain tuple.
+            xvector_batch_size (`int`, *optional*):
+                Clips per CAM++ run of the x-vector extractor, see `XVectorExtractor.extract_codes`.
+            max_padding_frames (`int`, *optional*):
+                Fbank frames a clip may be padded by to share a CAM++ run, see `XVectorExtractor.extract_codes`.
         """
         return_dict = return_dict if return_dict is not None else self.config.return_dict
 
@@ -1484,14 +1713,14 @@ class Qwen3TTSTokenizerV1Model(Qwen3TTSTokenizerV1PreTrainedModel):
         codes, codes_lens = self.encoder.quantize_speech(wavs)
         codes = [c[:l] for c, l in zip(codes, codes_lens)]
 
-        xvectors = []
-        ref_mels = []
-        for wav in wavs:
-            xvector, ref_mel = self.encoder_xvector_extractor.extract_code(wav.cpu().numpy())
-            xvector = torch.tensor(xvector).to(wav.dtype).to(wav.device)
-            ref_mel = torch.tensor(ref_mel).to(wav.dtype).to(wav.device)
-            xvectors.append(xvector)
-            ref_mels.append(ref_mel)
+        extract_kwargs = {}
+        if xvector_batch_size is not None:
+            extract_kwargs["batch_size"] = xvector_batch_size
+        if max_padding_frames is not None:
+            extract_kwargs["max_padding_frames"] = max_padding_frames
+        xvectors, ref_mels = self.encoder_xvector_extractor.extract_codes([wav.cpu() for wav in wavs], **extract_kwargs)
+        xvectors = [torch.tensor(x).to(wav.dtype).to(wav.device) for x, wav in zip(xvectors, wavs)]
+        ref_mels = [torch.tensor(m).to(wav.dtype).to(wav.device) for m, wav in zip(ref_mels, wavs)]
 
         if not return_dict:
             return (
@@ -1508,6 +1737,10 @@ class Qwen3TTSTokenizerV1Model(Qwen3TTSTokenizerV1PreTrainedModel):
         xvectors: torch.Tensor,
         ref_mels: torch.Tensor,
         return_dict: Optional[bool] = None,
+        num_steps: int = 10,
+        solver: str = "euler",
+        generator: Optional[torch.Generator] = None,
+        guidance_schedule: Optional[Union[int, tuple[float, float]]] = None,
     ) -> Union[tuple[torch.Tensor, torch.Tensor], Qwen3TTSTokenizerV1DecoderOutput]:
         """
         Decodes the given frames into an output audio waveform.
@@ -1524,13 +1757,26 @@ class Qwen3TTSTokenizerV1Model(Qwen3TTSTokenizerV1PreTrainedModel):
                 Reference mel spectrogram computed using `model.encode`.
             return_dict (`bool`, *optional*):
                 Whether or not to return a [`~utils.ModelOutput`] instead of a plain tuple.
+            num_steps (`int`, *optional*, defaults to 10):
+                Number of time points of the DiT flow-matching ODE.
+            solver (`str`, *optional*, defaults to `"euler"`):
+                ODE solver of the DiT, one of `DIT_ODE_SOLVERS` (see `Qwen3TTSTokenizerV1DecoderDiTModel.sample`).
+            generator (`torch.Generator`, *optional*):
+                Generator on the model device for the initial noise of the DiT.
+            guidance_schedule (`int` or `tuple[float, float]`, *optional*):
+                Restricts classifier-free guidance to the first `guidance_schedule` ODE steps, or to the flow times
+                in the `(start, end)` interval; the other steps run the conditional branch only.
 
         """
         return_dict = return_dict if return_dict is not None else self.config.return_dict
 
         audio_values = self.decoder(code=audio_codes,
                                     reference_mel=ref_mels,
-                                    conditioning=xvectors)
+                                    conditioning=xvectors,
+                                    num_steps=num_steps,
+                                    solver=solver,
+                                    generator=generator,
+                                    guidance_schedule=guidance_schedule)
         
         audio_lengths = (audio_codes > 0).sum(1) * self.decode_upsample_rate
         audio_values = [a[:l] for a, l in zip(audio_values, audio_lengths)]
@@ -13,8 +13,6 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
-import sox
-import copy
 import torch
 import operator
 import onnxruntime
@@ -25,8 +23,9 @@ import torchaudio.compliance.kaldi as kaldi
 
 from librosa.filters import mel as librosa_mel_fn
 from itertools import accumulate
-from typing import List
+from typing import List, Optional, Sequence, Tuple
 from torch import Tensor
+from torch.nn.utils.rnn import pad_sequence
 
 from .core_vq import DistributedGroupResidualVectorQuantization
 from .whisper_encoder import WhisperEncoder, Conv1d, ConvTranspose1d
@@ -116,16 +115,32 @@ class MelSpectrogramFeatures(nn.Module):
         
 
 class XVectorExtractor(nn.Module):
-    def __init__(self, audio_codec_with_xvector):
+    """
+    CAM++ x-vector and reference mel extraction for the 25Hz tokenizer.
+
+    The ONNX session runs on `providers` (CPU by default) with `intra_op_num_threads` / `inter_op_num_threads`
+    threads (onnxruntime's default for `None`). Clips are peak normalised to `norm_db_level` dBFS in process.
+    """
+    def __init__(
+        self,
+        audio_codec_with_xvector,
+        intra_op_num_threads: Optional[int] = 1,
+        inter_op_num_threads: Optional[int] = None,
+        providers: Optional[Sequence] = None,
+        norm_db_level: float = -6.0,
+    ):
         super().__init__()
         option = onnxruntime.SessionOptions()
         option.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
-        option.intra_op_num_threads = 1
-        providers = ["CPUExecutionProvider"]
+        if intra_op_num_threads is not None:
+            option.intra_op_num_threads = intra_op_num_threads
+        if inter_op_num_threads is not None:
+            option.inter_op_num_threads = inter_op_num_threads
+        providers = ["CPUExecutionProvider"] if providers is None else list(providers)
         self.ort_session = onnxruntime.InferenceSession(audio_codec_with_xvector, sess_options=option, providers=providers)
+        self.ort_input_name = self.ort_session.get_inputs()[0].name
 
-        self.tfm = sox.Transformer()
-        self.tfm.norm(db_level=-6)
+        self.norm_db_level = norm_db_level
 
         self.mel_ext = MelSpectrogramFeatures(
             filter_length=1024,
@@ -138,25 +153,76 @@ class XVectorExtractor(nn.Module):
         )
 
     def extract_code(self, audio):
+        xvectors, ref_mels = self.extract_codes([audio])
+        return xvectors[0], ref_mels[0]
+
+    def extract_codes(self, audios, batch_size: int = 4, max_padding_frames: int = 0) -> Tuple[List, List]:
+        """
+        Extract the x-vectors and reference mels of 16kHz clips (numpy arrays or tensors).
+
+        The fbanks are sorted by length and run through the ONNX session in batches of up to `batch_size` clips
+        whose frame counts differ by at most `max_padding_frames` (10 ms each), shorter ones zero padded. CAM++ pools
+        statistics over all the frames, so padding shifts the x-vectors of the padded clips; with the default of 0 only
+        clips of equal length share a run and the result is the same as clip by clip. Check a tolerance against the
+        unpadded x-vectors with `scripts/check_xvector_batching.py` before raising it. On the CPU provider larger
+        batches than the default are no faster; raise `batch_size` for GPU providers.
+
+        Returns:
+            Tuple[List[np.ndarray], List[np.ndarray]]: The normalised x-vectors and the `(frames, 80)` reference mels,
+            in input order.
+        """
         with torch.no_grad():
-            norm_audio = self.sox_norm(audio)
-
-            norm_audio = torch.from_numpy(copy.deepcopy(norm_audio)).unsqueeze(0)
-            feat = kaldi.fbank(norm_audio,
-                            num_mel_bins=80,
-                            dither=0,
-                            sample_frequency=16000)
-            feat = feat - feat.mean(dim=0, keepdim=True)
-            norm_embedding = self.ort_session.run(None, {self.ort_session.get_inputs()[0].name: feat.unsqueeze(dim=0).cpu().numpy()})[0].flatten()
-            norm_embedding = F.normalize(torch.from_numpy(norm_embedding), dim=0)
-            
-            ref_mel = self.mel_ext.extract(audio=norm_audio)
-        
-        return norm_embedding.numpy(), ref_mel.permute(0,2,1).squeeze(0).numpy()
-    
-    def sox_norm(self, audio):
-        wav_norm = self.tfm.build_array(input_array=audio, sample_rate_in=16000)
-        return wav_norm
+            norm_audios = [self.peak_norm(torch.as_tensor(audio, dtype=torch.float32).cpu()) for audio in audios]
+            feats = [self.fbank(norm_audio) for norm_audio in norm_audios]
+
+            xvectors = [None] * len(feats)
+            order = sorted(range(len(feats)), key=lambda i: feats[i].shape[0])
+            start = 0
+            while start < len(order):
+                end = start + 1
+                while (
+                    end < len(order)
+                    and end - start < batch_size
+                    and feats[order[end]].shape[0] - feats[order[start]].shape[0] <= max_padding_frames
+                ):
+                    end += 1
+                group = order[start:end]
+                for i, xvector in zip(group, self.run_xvectors([feats[i] for i in group])):
+                    xvectors[i] = xvector.numpy()
+                start = end
+
+            ref_mels = [
+                self.mel_ext.extract(audio=norm_audio.unsqueeze(0)).permute(0, 2, 1).squeeze(0).numpy()
+                for norm_audio in norm_audios
+            ]
+
+        return xvectors, ref_mels
+
+    def fbank(self, norm_audio: torch.Tensor) -> torch.Tensor:
+        """The mean normalised `(frames, 80)` kaldi fbank of a peak normalised clip, the CAM++ input."""
+        feat = kaldi.fbank(norm_audio.unsqueeze(0),
+                           num_mel_bins=80,
+                           dither=0,
+                           sample_frequency=16000)
+        return feat - feat.mean(dim=0, keepdim=True)
+
+    def run_xvectors(self, feats: List[torch.Tensor]) -> torch.Tensor:
+        """
+        Run `feats`, zero padded to the longest, through the ONNX session in one batch; normalised x-vectors. A session
+        whose batch axis is fixed gets one clip per run, unpadded.
+        """
+        if len(feats) > 1 and isinstance(self.ort_session.get_inputs()[0].shape[0], int):
+            return torch.cat([self.run_xvectors([feat]) for feat in feats], dim=0)
+        batch = pad_sequence(feats, batch_first=True)
+        embeddings = self.ort_session.run(None, {self.ort_input_name: batch.numpy()})[0]
+        return F.normalize(torch.from_numpy(embeddings).reshape(len(feats), -1), dim=-1)
+
+    def peak_norm(self, audio: torch.Tensor) -> torch.Tensor:
+        """Scale `audio` to a peak of `norm_db_level` dBFS, like `sox norm`."""
+        peak = audio.abs().max() if audio.numel() > 0 else 0
+        if peak == 0:
+            return audio
+        return audio * (10 ** (self.norm_db_level / 20) / peak)
 
 
 class WhisperEncoderVQ(WhisperEncoder):
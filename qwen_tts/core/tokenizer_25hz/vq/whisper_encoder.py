@@ -32,7 +32,7 @@ except ImportError:
     try:
         from flash_attn.flash_attn_interface import flash_attn_unpadded_func as flash_attn_varlen_func
     except ImportError:
-        print("\n********\nWarning: flash-attn is not installed. Will only run the manual PyTorch version. Please install flash-attn for faster inference.\n********\n ")
+        print("\n********\nWarning: flash-attn is not installed. Will run the PyTorch scaled_dot_product_attention version. Please install flash-attn for faster inference.\n********\n ")
         flash_attn_varlen_func = None
 
 
@@ -107,10 +107,8 @@ def log_mel_spectrogram(
     return log_spec
 
 
-import ast
-
 def get_T_after_cnn(L_in, dilation=1):
-    for (padding, kernel_size, stride) in ast.literal_eval("[(1,3,1)] + [(1,3,2)] "):
+    for (padding, kernel_size, stride) in [(1, 3, 1), (1, 3, 2)]:
         L_out = L_in + 2 * padding - dilation * (kernel_size - 1) - 1
         L_out = 1 + L_out // stride
         L_in = L_out
@@ -182,15 +180,15 @@ class MultiHeadAttention(nn.Module):
         
         if self.use_flash_attention:
             if flash_attn_varlen_func is None:
-                x = self.qkv_attention_manual(q, k, v, cu_seqlens=cu_seqlens)
+                x = self.qkv_attention_sdpa(q, k, v, cu_seqlens=cu_seqlens)
             else:
                 if q.dtype not in [torch.float16, torch.bfloat16]:
-                    x = self.qkv_attention_manual(q, k, v, cu_seqlens=cu_seqlens)
+                    x = self.qkv_attention_sdpa(q, k, v, cu_seqlens=cu_seqlens)
                     self.use_flash_attention = False
                 else:
                     x = self.qkv_flash_attention(q, k, v, cu_seqlens=cu_seqlens)
         else:
-            x = self.qkv_attention_manual(q, k, v, cu_seqlens=cu_seqlens)
+            x = self.qkv_attention_sdpa(q, k, v, cu_seqlens=cu_seqlens)
 
         output = self.out(x)
         return output
@@ -213,6 +211,47 @@ class MultiHeadAttention(nn.Module):
         x = x.reshape(n_ctx, n_state)
         return x
 
+    def qkv_attention_sdpa(
+        self, q: Tensor, k: Tensor, v: Tensor, cu_seqlens: Tensor
+    ):
+        """
+        Attention within each `cu_seqlens` window without flash-attn. The packed q/k/v rows are gathered into
+        window-length order by one index op, so the windows of each length form one contiguous `(n_windows, seqlen)`
+        batch that `scaled_dot_product_attention` attends without a mask (the diagonal blocks of the block-diagonal
+        mask, with no padding), and the outputs are scattered back by the same index. There are only a few distinct
+        lengths (the `n_window` windows and one tail per audio).
+        """
+        n_ctx, n_state = q.shape
+        head_dim = n_state // self.n_head
+
+        cu_seqlens = cu_seqlens.to(device=q.device, dtype=torch.long)
+        seqlens = cu_seqlens[1:] - cu_seqlens[:-1]
+        lengths, counts = torch.unique_consecutive(seqlens.sort(stable=True).values, return_counts=True)
+
+        qkv = torch.cat([q, k, v], dim=-1)
+        if len(lengths) == 1:
+            rows = None
+        else:
+            order = torch.argsort(seqlens, stable=True)
+            sorted_seqlens = seqlens[order]
+            rows = torch.repeat_interleave(cu_seqlens[:-1][order] - (sorted_seqlens.cumsum(0) - sorted_seqlens), sorted_seqlens)
+            rows = rows + torch.arange(n_ctx, device=q.device)
+            qkv = qkv.index_select(0, rows)
+
+        outputs = []
+        offset = 0
+        for seqlen, count in zip(lengths.tolist(), counts.tolist()):
+            window_qkv = qkv[offset:offset + seqlen * count].view(count, seqlen, 3, self.n_head, head_dim)
+            window_q, window_k, window_v = window_qkv.permute(2, 0, 3, 1, 4).unbind(0)
+            x = F.scaled_dot_product_attention(window_q, window_k, window_v)
+            outputs.append(x.transpose(1, 2).reshape(seqlen * count, n_state))
+            offset += seqlen * count
+        x = outputs[0] if len(outputs) == 1 else torch.cat(outputs, dim=0)
+
+        if rows is not None:
+            x = torch.empty_like(x).index_copy_(0, rows, x)
+        return x
+
     def qkv_attention_manual(
         self, q: Tensor, k: Tensor, v: Tensor, cu_seqlens: Tensor
     ):
@@ -244,10 +283,11 @@ class MultiHeadAttention(nn.Module):
         k_padded = k_padded.transpose(1, 2)
         v_padded = v_padded.transpose(1, 2)
 
-        attn_mask = torch.arange(max_seqlen, device=q.device)[None, :] < torch.tensor(seqlens, device=q.device)[:, None]
-        attn_mask = attn_mask.unsqueeze(1).unsqueeze(2)
+        valid = torch.arange(max_seqlen, device=q.device)[None, :] < torch.tensor(seqlens, device=q.device)[:, None]
+        valid = valid.unsqueeze(1).unsqueeze(2)
 
-        attn_mask = attn_mask.masked_fill(attn_mask == 0, -torch.finfo(q.dtype).max)
+        attn_mask = torch.zeros(valid.shape, dtype=q.dtype, device=q.device)
+        attn_mask = attn_mask.masked_fill(~valid, -torch.finfo(q.dtype).max)
 
         attn_scores = torch.matmul(q_padded, k_padded.transpose(-2, -1)) * scale
         attn_scores = attn_scores + attn_mask
@@ -15,11 +15,11 @@
 # limitations under the License.
 from typing import Any, List, Tuple, Union
 
-import librosa
 import numpy as np
 import torch
 from qwen_tts.core.models.configuration_qwen3_tts import Qwen3TTSConfig
 from qwen_tts.core.models.modeling_qwen3_tts import mel_spectrogram
+from qwen_tts.inference.audio_io import load_audios, read_audio
 from torch.utils.data import Dataset
 
 AudioLike = Union[
@@ -41,13 +41,7 @@ class TTSDataset(Dataset):
         return len(self.data_list)
     
     def _load_audio_to_np(self, x: str) -> Tuple[np.ndarray, int]:
-        
-        audio, sr = librosa.load(x, sr=None, mono=True)
-
-        if audio.ndim > 1:
-            audio = np.mean(audio, axis=-1)
-
-        return audio.astype(np.float32), int(sr)
+        return read_audio(x)
 
     def _normalize_audio_inputs(self, audios: Union[AudioLike, List[AudioLike]]) -> List[Tuple[np.ndarray, int]]:
         """
@@ -75,10 +69,11 @@ class TTSDataset(Dataset):
         else:
             items = [audios]
 
+        loaded = iter(load_audios([a for a in items if isinstance(a, str)]))
         out: List[Tuple[np.ndarray, int]] = []
         for a in items:
             if isinstance(a, str):
-                out.append(self._load_audio_to_np(a))
+                out.append(next(loaded))
             elif isinstance(a, tuple) and len(a) == 2 and isinstance(a[0], np.ndarray):
                 out.append((a[0].astype(np.float32), int(a[1])))
             elif isinstance(a, np.ndarray):
@@ -118,23 +113,24 @@ class TTSDataset(Dataset):
 
 
     def __getitem__(self, idx):
-        item = self.data_list[idx]
+        return self.__getitems__([idx])[0]
 
-        audio_path  = item["audio"]
+    def __getitems__(self, indices):
+        # called by the DataLoader with the indices of a whole batch, so that the reference audios of the batch are
+        # decoded together on the audio thread pool
+        items = [self.data_list[idx] for idx in indices]
+        normalized = self._normalize_audio_inputs([self._ensure_list(item['ref_audio'])[0] for item in items])
+        return [self._build_item(item, wav, sr) for item, (wav, sr) in zip(items, normalized)]
+
+    def _build_item(self, item, wav, sr):
         text        = item["text"]
         audio_codes = item["audio_codes"]
-        language        = item.get('language','Auto')
-        ref_audio_path  = item['ref_audio']
 
         text = self._build_assistant_text(text)
         text_ids = self._tokenize_texts(text)
 
         audio_codes = torch.tensor(audio_codes, dtype=torch.long)
 
-        ref_audio_list = self._ensure_list(ref_audio_path)
-        normalized = self._normalize_audio_inputs(ref_audio_list)
-        wav,sr = normalized[0]
-
         ref_mel = self.extract_mels(audio=wav, sr=sr)
 
         return {
@@ -17,16 +17,30 @@
 import argparse
 import json
 
+import soundfile as sf
+
 from qwen_tts import Qwen3TTSTokenizer
 
 BATCH_INFER_NUM = 32
 
+
+def audio_duration(audio):
+    """Duration read from the file header, 0 for inputs that have to be decoded first (URLs, base64, ...)"""
+    try:
+        return sf.info(audio).duration
+    except Exception:
+        return 0.0
+
+
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("--device", type=str, default="cuda:0")
     parser.add_argument("--tokenizer_model_path", type=str, default="Qwen/Qwen3-TTS-Tokenizer-12Hz")
     parser.add_argument("--input_jsonl", type=str, required=True)
     parser.add_argument("--output_jsonl", type=str, required=True)
+    parser.add_argument("--batch_size", type=int, default=BATCH_INFER_NUM)
+    parser.add_argument("--chunk_size", type=int, default=None,
+                        help="Encode in windows of this many codec frames (750 = 60 s) to bound memory on long recordings")
     args = parser.parse_args()
 
     tokenizer_12hz = Qwen3TTSTokenizer.from_pretrained(
@@ -37,31 +51,18 @@ def main():
     total_lines = open(args.input_jsonl).readlines()
     total_lines = [json.loads(line.strip()) for line in total_lines]
 
-    final_lines = []
-    batch_lines = []
-    batch_audios = []
-    for line in total_lines:
-
-        batch_lines.append(line)
-        batch_audios.append(line['audio'])
-
-        if len(batch_lines) >= BATCH_INFER_NUM:
-            enc_res = tokenizer_12hz.encode(batch_audios)
-            for code, line in zip(enc_res.audio_codes, batch_lines):
-                line['audio_codes'] = code.cpu().tolist()
-                final_lines.append(line)
-            batch_lines.clear()
-            batch_audios.clear()
-
-    if len(batch_audios) > 0:
-        enc_res = tokenizer_12hz.encode(batch_audios)
+    # batch recordings of similar length together so that little compute goes into padding
+    order = sorted(range(len(total_lines)), key=lambda i: audio_duration(total_lines[i]['audio']), reverse=True)
+    for start in range(0, len(order), args.batch_size):
+        batch_lines = [total_lines[i] for i in order[start:start + args.batch_size]]
+        enc_res = tokenizer_12hz.encode(
+            [line['audio'] for line in batch_lines],
+            chunk_size=args.chunk_size,
+        )
         for code, line in zip(enc_res.audio_codes, batch_lines):
             line['audio_codes'] = code.cpu().tolist()
-            final_lines.append(line)
-        batch_lines.clear()
-        batch_audios.clear()
 
-    final_lines = [json.dumps(line, ensure_ascii=False) for line in final_lines]
+    final_lines = [json.dumps(line, ensure_ascii=False) for line in total_lines]
 
     with open(args.output_jsonl, 'w') as f:
         for line in final_lines:
@@ -0,0 +1,203 @@
+# coding=utf-8
+# Copyright 2026 The Alibaba Qwen team.
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Audio loading and resampling shared by the model, the tokenizer, the fine-tuning dataset and the ComfyUI nodes.
+
+Lists of inputs are decoded and resampled on a thread pool (soundfile and soxr release the GIL), which keeps the
+output identical to `librosa.resample`. Given an accelerator `device`, waveforms sharing a sampling rate are instead
+resampled as one batched `torchaudio` op, with one resampler kept per `(orig_sr, target_sr, device)` so its filter
+kernel is built only once. Its filter differs slightly from soxr, so callers only pass a device when the user opted in
+(`resample_on_device`).
+"""
+import base64
+import io
+import os
+import threading
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Sequence, Tuple, Union
+from urllib.parse import urlparse
+
+import librosa
+import numpy as np
+import soundfile as sf
+import torch
+import torchaudio
+
+_POOL: Optional[ThreadPoolExecutor] = None
+_POOL_LOCK = threading.Lock()
+_RESAMPLERS = {}
+_RESAMPLERS_LOCK = threading.Lock()
+
+
+def is_probably_base64(s: str) -> bool:
+    if s.startswith("data:audio"):
+        return True
+    # Heuristic: no filesystem path separators and long enough.
+    if ("/" not in s and "\\" not in s) and len(s) > 256:
+        return True
+    return False
+
+
+def is_url(s: str) -> bool:
+    try:
+        u = urlparse(s)
+        return u.scheme in ("http", "https") and bool(u.netloc)
+    except Exception:
+        return False
+
+
+def decode_base64_to_wav_bytes(b64: str) -> bytes:
+    # Accept both "data:audio/wav;base64,...." and raw base64
+    if "," in b64 and b64.strip().startswith("data:"):
+        b64 = b64.split(",", 1)[1]
+    return base64.b64decode(b64)
+
+
+def read_audio(x: str) -> Tuple[np.ndarray, int]:
+    """
+    Read a wav path, URL or base64 audio string (raw or data URL).
+
+    Returns:
+        Tuple[np.ndarray, int]: The mono float32 waveform and its sampling rate.
+    """
+    if is_url(x):
+        with urllib.request.urlopen(x) as resp:
+            audio_bytes = resp.read()
+        with io.BytesIO(audio_bytes) as f:
+            audio, sr = sf.read(f, dtype="float32", always_2d=False)
+    elif is_probably_base64(x):
+        wav_bytes = decode_base64_to_wav_bytes(x)
+        with io.BytesIO(wav_bytes) as f:
+            audio, sr = sf.read(f, dtype="float32", always_2d=False)
+    else:
+        audio, sr = librosa.load(x, sr=None, mono=True)
+
+    if audio.ndim > 1:
+        audio = np.mean(audio, axis=-1)
+
+    return audio.astype(np.float32), int(sr)
+
+
+def get_resampler(orig_sr: int, target_sr: int, device: Union[str, torch.device] = "cpu") -> torchaudio.transforms.Resample:
+    """Shared `torchaudio` resampler for `orig_sr` -> `target_sr` on `device`, created on first use."""
+    key = (int(orig_sr), int(target_sr), str(torch.device(device)))
+    with _RESAMPLERS_LOCK:
+        resampler = _RESAMPLERS.get(key)
+        if resampler is None:
+            resampler = torchaudio.transforms.Resample(int(orig_sr), int(target_sr)).to(device)
+            _RESAMPLERS[key] = resampler
+    return resampler
+
+
+def _on_accelerator(device: Optional[Union[str, torch.device]]) -> bool:
+    return device is not None and torch.device(device).type != "cpu"
+
+
+def resample(
+    audio: np.ndarray,
+    orig_sr: int,
+    target_sr: int,
+    device: Optional[Union[str, torch.device]] = None,
+) -> np.ndarray:
+    """
+    Resample a 1-D waveform. On an accelerator `device` the shared `torchaudio` resampler runs there, otherwise this
+    is `librosa.resample` (soxr).
+    """
+    if int(orig_sr) == int(target_sr):
+        return audio.astype(np.float32)
+    if not _on_accelerator(device):
+        return librosa.resample(y=audio.astype(np.float32), orig_sr=int(orig_sr), target_sr=int(target_sr))
+    return resample_batch([audio], orig_sr, target_sr, device=device)[0]
+
+
+def resample_batch(
+    audios: Sequence[np.ndarray],
+    orig_sr: int,
+    target_sr: int,
+    device: Optional[Union[str, torch.device]] = None,
+) -> List[np.ndarray]:
+    """
+    Resample 1-D waveforms sharing `orig_sr`. On an accelerator `device`, they are zero-padded into one batch and
+    resampled by a single `torchaudio` op there; every output is trimmed to its own length. Otherwise the waveforms
+    are resampled with `librosa.resample` on the thread pool.
+    """
+    if int(orig_sr) == int(target_sr):
+        return [a.astype(np.float32) for a in audios]
+    if not _on_accelerator(device):
+        return map_threaded(lambda a: resample(a, orig_sr, target_sr), audios)
+    if len(audios) == 0:
+        return []
+
+    lengths = [len(a) for a in audios]
+    batch = torch.zeros(len(audios), max(lengths), dtype=torch.float32)
+    for i, a in enumerate(audios):
+        batch[i, : len(a)] = torch.from_numpy(np.asarray(a, dtype=np.float32))
+    with torch.inference_mode():
+        out = get_resampler(orig_sr, target_sr, device)(batch.to(device)).cpu().numpy()
+    return [out[i, : -(-n * int(target_sr) // int(orig_sr))] for i, n in enumerate(lengths)]
+
+
+def map_threaded(fn, items: Sequence) -> list:
+    """`[fn(x) for x in items]` on the shared thread pool, in input order."""
+    if len(items) <= 1:
+        return [fn(x) for x in items]
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None:
+            _POOL = ThreadPoolExecutor(max_workers=min(8, os.cpu_count() or 1), thread_name_prefix="qwen3-tts-audio")
+    return list(_POOL.map(fn, items))
+
+
+def load_audios(
+    sources: Sequence[str],
+    target_sr: Optional[int] = None,
+    device: Optional[Union[str, torch.device]] = None,
+) -> List[Tuple[np.ndarray, int]]:
+    """
+    Read `sources` (see `read_audio`) on the thread pool and, if `target_sr` is given, resample them to it (see
+    `resample_audios`).
+
+    Returns:
+        List[Tuple[np.ndarray, int]]: `(waveform, sr)` per source, in input order.
+    """
+    loaded = map_threaded(read_audio, sources)
+    if target_sr is None:
+        return loaded
+    return resample_audios(loaded, target_sr, device=device)
+
+
+def resample_audios(
+    audios: Sequence[Tuple[np.ndarray, int]],
+    target_sr: int,
+    device: Optional[Union[str, torch.device]] = None,
+) -> List[Tuple[np.ndarray, int]]:
+    """
+    Resample `(waveform, sr)` pairs to `target_sr`: one batch per distinct `sr` on an accelerator `device`, on the
+    thread pool otherwise (see `resample_batch`).
+
+    Returns:
+        List[Tuple[np.ndarray, int]]: `(waveform, target_sr)` per input, in input order.
+    """
+    if not _on_accelerator(device):
+        return map_threaded(lambda x: (resample(x[0], x[1], target_sr), int(target_sr)), audios)
+
+    out: List[Optional[Tuple[np.ndarray, int]]] = [None] * len(audios)
+    for sr in set(sr for _, sr in audios):
+        indices = [i for i, (_, s) in enumerate(audios) if s == sr]
+        for i, wav in zip(indices, resample_batch([audios[i][0] for i in indices], sr, target_sr, device=device)):
+            out[i] = (wav, int(target_sr))
+    return out
@@ -13,20 +13,29 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
-import base64
-import io
-import urllib.request
+import dataclasses
+import hashlib
+import os
+import threading
+from collections import OrderedDict
 from dataclasses import dataclass
-from typing import Any, Dict, List, Optional, Tuple, Union
-from urllib.parse import urlparse
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
 
-import librosa
 import numpy as np
-import soundfile as sf
 import torch
 from transformers import AutoConfig, AutoModel, AutoProcessor
+from transformers.utils import logging
 
-from ..core.models import Qwen3TTSConfig, Qwen3TTSForConditionalGeneration, Qwen3TTSProcessor
+from ..core.models import (
+    Qwen3TTSCodecStreamer,
+    Qwen3TTSConfig,
+    Qwen3TTSForConditionalGeneration,
+    Qwen3TTSProcessor,
+)
+from .audio_io import load_audios, read_audio, resample_audios
+from .qwen3_tts_tokenizer import Qwen3TTSDecodeWorker
+
+logger = logging.get_logger(__name__)
 
 AudioLike = Union[
     str,                     # wav path, URL, base64
@@ -36,6 +45,13 @@ AudioLike = Union[
 
 MaybeList = Union[Any, List[Any]]
 
+# per-request fields accepted by `Qwen3TTSModel.generate_many`, by tts_model_type
+GENERATE_MANY_FIELDS = {
+    "custom_voice": ("text", "speaker", "language", "instruct"),
+    "voice_design": ("text", "instruct", "language"),
+    "base": ("text", "language", "ref_audio", "ref_text", "x_vector_only_mode", "voice_clone_prompt"),
+}
+
 
 @dataclass
 class VoiceClonePromptItem:
@@ -51,6 +67,78 @@ class VoiceClonePromptItem:
     ref_text: Optional[str] = None
 
 
+class Qwen3TTSReferenceCache:
+    """
+    LRU cache of the reference codes and speaker embeddings extracted from reference audio, so that voice-clone calls
+    reusing the same clip (e.g. one call per sentence of a paragraph) run the codec encoder and the speaker encoder
+    only once. Entries are keyed by a hash of the waveform, its sample rate, `x_vector_only_mode` and the model id,
+    and hold a `VoiceClonePromptItem` without `ref_text`, which is filled in per call.
+
+    With `cache_dir`, entries are also written there as `<key>.pt` files and looked up when they are not in memory,
+    which carries them across processes. The cache may be shared by concurrent calls: the in-memory entries and the
+    counters are guarded by a lock, file reads and writes run outside it.
+    """
+
+    def __init__(self, max_entries: int = 16, cache_dir: Optional[str] = None):
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(wav: np.ndarray, sr: int, x_vector_only_mode: bool, model_id: str) -> str:
+        digest = hashlib.sha1(np.ascontiguousarray(wav, dtype=np.float32).tobytes())
+        digest.update(f"{int(sr)}-{bool(x_vector_only_mode)}-{model_id}".encode("utf-8"))
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.pt")
+
+    def get(self, key: str, device: Optional[torch.device] = None) -> Optional[VoiceClonePromptItem]:
+        with self._lock:
+            item = self.entries.get(key)
+            if item is not None:
+                self.hits += 1
+                self.entries.move_to_end(key)
+                return item
+        if self.cache_dir is not None and os.path.isfile(self._path(key)):
+            item = VoiceClonePromptItem(**torch.load(self._path(key), map_location=device, weights_only=True))
+            self._insert(key, item, hit=True)
+            return item
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: str, item: VoiceClonePromptItem) -> None:
+        self._insert(key, item)
+        if self.cache_dir is not None:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            data = {
+                field: value.cpu() if isinstance(value, torch.Tensor) else value
+                for field, value in dataclasses.asdict(item).items()
+            }
+            # write to a temporary file first so concurrent readers never see a partial entry
+            tmp_path = f"{self._path(key)}.{os.getpid()}.{threading.get_ident()}.tmp"
+            torch.save(data, tmp_path)
+            os.replace(tmp_path, self._path(key))
+
+    def _insert(self, key: str, item: VoiceClonePromptItem, hit: bool = False) -> None:
+        with self._lock:
+            if hit:
+                self.hits += 1
+            self.entries[key] = item
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Drop the in-memory entries; files in `cache_dir` are kept."""
+        with self._lock:
+            self.entries.clear()
+
+
 class Qwen3TTSModel:
     """
     A HuggingFace-style wrapper for Qwen3 TTS models (CustomVoice/VoiceDesign/Base) that provides:
@@ -59,6 +147,12 @@ class Qwen3TTSModel:
           * CustomVoice: generate_custom_voice()
           * VoiceDesign: generate_voice_design()
           * Base: generate_voice_clone() + create_voice_clone_prompt()
+      - streaming variants (*_stream) that yield (wav_chunk, sample_rate) while the talker is still generating
+      - generate_many() for long lists of requests, batched by length
+      - enable_reference_cache() to extract the features of a reference clip only once across voice-clone calls
+      - resample_on_device: if True (`from_pretrained(..., resample_on_device=True)`), reference audio is resampled by
+        a batched `torchaudio` op on the model's accelerator device, for the speaker encoder and the speech tokenizer.
+        The default, False, keeps soxr on every device, whose output differs slightly from `torchaudio`'s filter.
       - consistent output: (wavs: List[np.ndarray], sample_rate: int)
 
     Notes:
@@ -71,6 +165,10 @@ class Qwen3TTSModel:
         self.model = model
         self.processor = processor
         self.generate_defaults = generate_defaults or {}
+        self.draft_model: Optional["Qwen3TTSModel"] = None
+        self.num_draft_frames = 4
+        self.reference_cache: Optional[Qwen3TTSReferenceCache] = None
+        self._resample_on_device = False
 
         self.device = getattr(model, "device", None)
         if self.device is None:
@@ -98,8 +196,9 @@ class Qwen3TTSModel:
             pretrained_model_name_or_path (str):
                 HuggingFace repo id or local directory of the model.
             **kwargs:
-                Forwarded as-is into `AutoModel.from_pretrained(...)`.
-                Typical examples: device_map="cuda:0", dtype=torch.bfloat16, attn_implementation="flash_attention_2".
+                Forwarded into `AutoModel.from_pretrained(...)`, except `resample_on_device` (see the class
+                docstring). Typical examples: device_map="cuda:0", dtype=torch.bfloat16,
+                attn_implementation="flash_attention_2".
 
         Returns:
             Qwen3TTSModel:
@@ -109,6 +208,7 @@ class Qwen3TTSModel:
         AutoModel.register(Qwen3TTSConfig, Qwen3TTSForConditionalGeneration)
         AutoProcessor.register(Qwen3TTSConfig, Qwen3TTSProcessor)
 
+        resample_on_device = bool(kwargs.pop("resample_on_device", False))
         model = AutoModel.from_pretrained(pretrained_model_name_or_path, **kwargs)
         if not isinstance(model, Qwen3TTSForConditionalGeneration):
             raise TypeError(
@@ -124,7 +224,21 @@ class Qwen3TTSModel:
             processor = AutoProcessor.from_pretrained(pretrained_model_name_or_path)
 
         generate_defaults = model.generate_config
-        return cls(model=model, processor=processor, generate_defaults=generate_defaults)
+        inst = cls(model=model, processor=processor, generate_defaults=generate_defaults)
+        inst.resample_on_device = resample_on_device
+        return inst
+
+    @property
+    def resample_on_device(self) -> bool:
+        """Whether reference audio is resampled on the model's accelerator device, see the class docstring."""
+        return self._resample_on_device
+
+    @resample_on_device.setter
+    def resample_on_device(self, value: bool) -> None:
+        self._resample_on_device = bool(value)
+        speech_tokenizer = getattr(self.model, "speech_tokenizer", None)
+        if speech_tokenizer is not None:
+            speech_tokenizer.resample_on_device = self._resample_on_device
 
     def _supported_languages_set(self) -> Optional[set]:
         langs = getattr(self.model, "get_supported_languages", None)
@@ -191,42 +305,8 @@ class Qwen3TTSModel:
         if bad:
             raise ValueError(f"Unsupported speakers: {bad}. Supported: {sorted(supported)}")
 
-    def _is_probably_base64(self, s: str) -> bool:
-        if s.startswith("data:audio"):
-            return True
-        if ("/" not in s and "\\" not in s) and len(s) > 256:
-            return True
-        return False
-
-    def _is_url(self, s: str) -> bool:
-        try:
-            u = urlparse(s)
-            return u.scheme in ("http", "https") and bool(u.netloc)
-        except Exception:
-            return False
-
-    def _decode_base64_to_wav_bytes(self, b64: str) -> bytes:
-        if "," in b64 and b64.strip().startswith("data:"):
-            b64 = b64.split(",", 1)[1]
-        return base64.b64decode(b64)
-
     def _load_audio_to_np(self, x: str) -> Tuple[np.ndarray, int]:
-        if self._is_url(x):
-            with urllib.request.urlopen(x) as resp:
-                audio_bytes = resp.read()
-            with io.BytesIO(audio_bytes) as f:
-                audio, sr = sf.read(f, dtype="float32", always_2d=False)
-        elif self._is_probably_base64(x):
-            wav_bytes = self._decode_base64_to_wav_bytes(x)
-            with io.BytesIO(wav_bytes) as f:
-                audio, sr = sf.read(f, dtype="float32", always_2d=False)
-        else:
-            audio, sr = librosa.load(x, sr=None, mono=True)
-
-        if audio.ndim > 1:
-            audio = np.mean(audio, axis=-1)
-
-        return audio.astype(np.float32), int(sr)
+        return read_audio(x)
 
     def _normalize_audio_inputs(self, audios: Union[AudioLike, List[AudioLike]]) -> List[Tuple[np.ndarray, int]]:
         """
@@ -253,10 +333,12 @@ class Qwen3TTSModel:
         else:
             items = [audios]
 
+        # paths / URLs / base64 strings are decoded together on the audio thread pool
+        loaded = iter(load_audios([a for a in items if isinstance(a, str)]))
         out: List[Tuple[np.ndarray, int]] = []
         for a in items:
             if isinstance(a, str):
-                out.append(self._load_audio_to_np(a))
+                out.append(next(loaded))
             elif isinstance(a, tuple) and len(a) == 2 and isinstance(a[0], np.ndarray):
                 out.append((a[0].astype(np.float32), int(a[1])))
             elif isinstance(a, np.ndarray):
@@ -290,6 +372,85 @@ class Qwen3TTSModel:
             input_ids.append(input_id)
         return input_ids
 
+    def enable_speculative_decoding(self, draft_model: "Qwen3TTSModel", num_draft_frames: int = 4) -> None:
+        """
+        Generate with speculative decoding: `draft_model`, a smaller model of the same type (e.g. the 0.6B model for
+        the 1.7B one), proposes `num_draft_frames` codec frames at a time and this model verifies them in a single
+        talker pass. The output follows the distribution of this model; only the speed depends on the draft.
+
+        Calls with `max_batch_size` keep using continuous batching without a draft. The statistics of the last call,
+        including `acceptance_rate`, are stored in `model.speculative_stats`.
+
+        Args:
+            draft_model (Qwen3TTSModel):
+                Draft model sharing the codec tokenizer and text tokenizer of this model.
+            num_draft_frames (int):
+                Number of frames proposed per verification pass.
+        """
+        if draft_model.model.tts_model_type != self.model.tts_model_type:
+            raise ValueError(
+                f"Draft model type {draft_model.model.tts_model_type} does not match {self.model.tts_model_type}."
+            )
+        if num_draft_frames < 1:
+            raise ValueError(f"`num_draft_frames` must be >= 1, got {num_draft_frames}")
+        self.draft_model = draft_model
+        self.num_draft_frames = num_draft_frames
+
+    def disable_speculative_decoding(self) -> None:
+        self.draft_model = None
+
+    def enable_reference_cache(self, max_entries: int = 16, cache_dir: Optional[str] = None) -> None:
+        """
+        Cache the reference codes and speaker embeddings extracted by `create_voice_clone_prompt`, and thus by every
+        voice-clone entry point called with `ref_audio`, see `Qwen3TTSReferenceCache`. Set `self.reference_cache =
+        None` to disable it again.
+
+        Args:
+            max_entries (int):
+                Number of reference clips kept in memory.
+            cache_dir (Optional[str]):
+                Directory for an on-disk tier shared across processes.
+        """
+        if self.reference_cache is None:
+            self.reference_cache = Qwen3TTSReferenceCache(max_entries, cache_dir)
+        else:
+            self.reference_cache.max_entries = max_entries
+            self.reference_cache.cache_dir = cache_dir
+
+    def _build_draft_voice_clone_prompt(
+        self,
+        voice_clone_prompt: Dict[str, Any],
+        ref_audio: Optional[Union[AudioLike, List[AudioLike]]],
+    ) -> Dict[str, Any]:
+        """
+        Voice clone prompt for the draft model: the speaker embeddings are extracted again by the draft model's speaker
+        encoder, from `ref_audio` or, if it is not given, from the decoded reference codes.
+        """
+        draft = self.draft_model.model
+        spk_embeddings = voice_clone_prompt["ref_spk_embedding"]
+        if all(e.shape[-1] == draft.config.talker_config.hidden_size for e in spk_embeddings):
+            return voice_clone_prompt
+
+        if ref_audio is not None:
+            normalized = self._normalize_audio_inputs(ref_audio)
+        else:
+            ref_codes = voice_clone_prompt.get("ref_code", None)
+            if ref_codes is None or any(c is None for c in ref_codes):
+                raise ValueError(
+                    "Speculative voice clone with a draft model of another size needs `ref_audio` "
+                    "or ICL prompts that contain reference codes."
+                )
+            wavs, fs = self.model.speech_tokenizer.decode([{"audio_codes": c} for c in ref_codes])
+            normalized = [(wav, fs) for wav in wavs]
+        if len(normalized) == 1 and len(spk_embeddings) > 1:
+            normalized = normalized * len(spk_embeddings)
+
+        draft_spk_embeddings = []
+        device = draft.device if self.resample_on_device else None
+        for wav, sr in resample_audios(normalized, draft.speaker_encoder_sample_rate, device=device):
+            draft_spk_embeddings.append(draft.extract_speaker_embedding(audio=wav, sr=sr))
+        return dict(voice_clone_prompt, ref_spk_embedding=draft_spk_embeddings)
+
     def _merge_generate_kwargs(
         self,
         do_sample: Optional[bool] = None,
@@ -355,8 +516,187 @@ class Qwen3TTSModel:
             subtalker_temperature=pick("subtalker_temperature", subtalker_temperature),
             max_new_tokens=pick("max_new_tokens", max_new_tokens),
         )
+        # runaway protection is off unless requested or configured in generate_config.json
+        for name in ("max_frames_per_token", "detect_runaway"):
+            if merged.get(name) is None and name in self.generate_defaults:
+                merged[name] = self.generate_defaults[name]
+        if self.draft_model is not None and merged.get("max_batch_size") is None:
+            merged.setdefault("draft_model", self.draft_model.model)
+            merged.setdefault("num_draft_frames", self.num_draft_frames)
         return merged
 
+    def _check_model_type(self, tts_model_type: str, method_name: str) -> None:
+        if self.model.tts_model_type != tts_model_type:
+            raise ValueError(
+                f"model with \ntokenizer_type: {self.model.tokenizer_type}\n"
+                f"tts_model_size: {self.model.tts_model_size}\n"
+                f"tts_model_type: {self.model.tts_model_type}\n"
+                f"does not support {method_name}, Please check Model Card or Readme for more details."
+            )
+
+    def _decode_codes(
+        self, codes_list: List[torch.Tensor], batch_size: Optional[int] = None, parallel_chunks: bool = False
+    ) -> Tuple[List[np.ndarray], int]:
+        """
+        Decode codec frames into waveforms, `batch_size` items per tokenizer call (all at once if None).
+        """
+        tokenizer = self.model.speech_tokenizer
+        if batch_size is None:
+            return tokenizer.decode([{"audio_codes": c} for c in codes_list], parallel_chunks=parallel_chunks)
+        wavs: List[np.ndarray] = []
+        fs = None
+        for start in range(0, len(codes_list), batch_size):
+            chunk = codes_list[start:start + batch_size]
+            chunk_wavs, fs = tokenizer.decode([{"audio_codes": c} for c in chunk], parallel_chunks=parallel_chunks)
+            wavs.extend(chunk_wavs)
+        return wavs, fs
+
+    def _generate_and_decode(
+        self,
+        generate_inputs: Dict[str, Any],
+        gen_kwargs: Dict[str, Any],
+        context_codes: Optional[List[Optional[torch.Tensor]]] = None,
+    ) -> Tuple[List[np.ndarray], int]:
+        """
+        Run `model.generate` and decode the codec frames of every sample. `context_codes[i]` (the reference codes in
+        ICL mode) is decoded as left context of sample i and its share of the waveform is cut off again.
+
+        With `pipeline_decode` in `gen_kwargs`, a sample is handed to a background `Qwen3TTSDecodeWorker` as soon as
+        its codes are final, so decoding overlaps with the talker still generating the other samples. That needs
+        samples finishing one by one (`max_batch_size` or a draft model); otherwise it is ignored with a warning. With
+        `parallel_decode`, long samples are decoded as overlapping windows batched together. `progress_callback` in
+        `gen_kwargs` is called as `progress_callback(num_finished, num_samples)` each time the codes of a sample are
+        final.
+        """
+        gen_kwargs = dict(gen_kwargs)
+        pipeline_decode = gen_kwargs.pop("pipeline_decode", False)
+        parallel_decode = gen_kwargs.pop("parallel_decode", False)
+        progress_callback = gen_kwargs.pop("progress_callback", None)
+        decode_batch_size = gen_kwargs.get("max_batch_size")
+        num_samples = len(generate_inputs["input_ids"])
+        num_finished = 0
+        if pipeline_decode and decode_batch_size is None and gen_kwargs.get("draft_model") is None:
+            # a left-padded batch finishes all samples at once when `generate` returns, leaving nothing to overlap
+            logger.warning_once(
+                "`pipeline_decode` has no effect without `max_batch_size` or a draft model, decoding after generation."
+            )
+            pipeline_decode = False
+
+        def report_progress():
+            nonlocal num_finished
+            num_finished += 1
+            if progress_callback is not None:
+                progress_callback(num_finished, num_samples)
+
+        def with_context(index: int, codes: torch.Tensor) -> torch.Tensor:
+            if context_codes is not None and context_codes[index] is not None:
+                return torch.cat([context_codes[index].to(codes.device), codes], dim=0)
+            return codes
+
+        if not pipeline_decode:
+            if progress_callback is not None:
+                gen_kwargs["codes_callback"] = lambda index, codes: report_progress()
+            talker_codes_list, _ = self.model.generate(**generate_inputs, return_hidden_states=False, **gen_kwargs)
+            codes_for_decode = [with_context(i, codes) for i, codes in enumerate(talker_codes_list)]
+            wavs_all, fs = self._decode_codes(codes_for_decode, decode_batch_size, parallel_decode)
+        else:
+            finished: Dict[int, torch.Tensor] = {}
+            group: List[int] = []
+            jobs = []
+            with Qwen3TTSDecodeWorker(self.model.speech_tokenizer) as worker:
+
+                def submit_group():
+                    jobs.append((list(group), worker.submit([finished[i] for i in group], parallel_decode)))
+                    group.clear()
+
+                def on_codes(index: int, codes: torch.Tensor):
+                    finished[index] = with_context(index, codes)
+                    group.append(index)
+                    if len(group) >= (decode_batch_size or 1):
+                        submit_group()
+                    report_progress()
+
+                self.model.generate(
+                    **generate_inputs, return_hidden_states=False, codes_callback=on_codes, **gen_kwargs
+                )
+                if group:
+                    submit_group()
+
+                wavs_all: List[np.ndarray] = [None] * len(finished)
+                fs = None
+                for indices, job in jobs:
+                    wavs, fs = job.result()
+                    for i, wav in zip(indices, wavs):
+                        wavs_all[i] = wav
+            codes_for_decode = [finished[i] for i in range(len(finished))]
+
+        wavs_out: List[np.ndarray] = []
+        for i, wav in enumerate(wavs_all):
+            if context_codes is not None and context_codes[i] is not None:
+                ref_len = int(context_codes[i].shape[0])
+                total_len = int(codes_for_decode[i].shape[0])
+                cut = int(ref_len / max(total_len, 1) * wav.shape[0])
+                wavs_out.append(wav[cut:])
+            else:
+                wavs_out.append(wav)
+        return wavs_out, fs
+
+    def _iter_codec_chunks(self, streamer: Qwen3TTSCodecStreamer, chunk_size: int) -> Iterator[torch.Tensor]:
+        frames = []
+        for frame in streamer:
+            frames.append(frame[0])
+            if len(frames) == chunk_size:
+                yield torch.stack(frames, dim=0)
+                frames = []
+        if frames:
+            yield torch.stack(frames, dim=0)
+
+    def _generate_stream(
+        self,
+        generate_inputs: Dict[str, Any],
+        gen_kwargs: Dict[str, Any],
+        chunk_size: int,
+        left_context_size: Optional[int],
+        context_codes: Optional[torch.Tensor] = None,
+    ) -> Iterator[Tuple[np.ndarray, int]]:
+        """
+        Run `model.generate` in a background thread and decode its codec frames every `chunk_size` frames.
+
+        Closing the returned generator early stops the generation after the current talker step.
+        """
+        if self.model.speech_tokenizer.get_model_type() != "qwen3_tts_tokenizer_12hz":
+            raise ValueError("Streaming synthesis is only supported by models using the 12Hz tokenizer.")
+        if chunk_size < 1:
+            raise ValueError(f"`chunk_size` must be >= 1, got {chunk_size}")
+        if len(generate_inputs["input_ids"]) != 1:
+            raise ValueError("Streaming synthesis only supports a single text per call.")
+
+        streamer = Qwen3TTSCodecStreamer()
+
+        def _run():
+            try:
+                self.model.generate(
+                    codec_streamer=streamer, return_hidden_states=False, **generate_inputs, **gen_kwargs
+                )
+            except BaseException as e:
+                streamer.error = e
+            finally:
+                streamer.end()
+
+        thread = threading.Thread(target=_run, daemon=True)
+        thread.start()
+        fs = self.model.speech_tokenizer.get_output_sample_rate()
+        try:
+            for wav in self.model.speech_tokenizer.stream_decode(
+                self._iter_codec_chunks(streamer, chunk_size),
+                context_codes=context_codes,
+                left_context_size=left_context_size,
+            ):
+                yield wav, fs
+        finally:
+            streamer.stop()
+            thread.join()
+
     # voice clone model
     @torch.inference_mode()
     def create_voice_clone_prompt(
@@ -404,13 +744,7 @@ class Qwen3TTSModel:
                 - If x_vector_only_mode=False but ref_text is missing.
                 - If batch lengths mismatch.
         """
-        if self.model.tts_model_type != "base":
-            raise ValueError(
-                f"model with \ntokenizer_type: {self.model.tokenizer_type}\n"
-                f"tts_model_size: {self.model.tts_model_size}\n"
-                f"tts_model_type: {self.model.tts_model_type}\n"
-                "does not support create_voice_clone_prompt, Please check Model Card or Readme for more details."
-            )
+        self._check_model_type("base", "create_voice_clone_prompt")
         
         ref_audio_list = self._ensure_list(ref_audio)
         ref_text_list = self._ensure_list(ref_text) if isinstance(ref_text, list) else ([ref_text] * len(ref_audio_list))
@@ -421,47 +755,61 @@ class Qwen3TTSModel:
                 f"Batch size mismatch: ref_audio={len(ref_audio_list)}, ref_text={len(ref_text_list)}, x_vector_only_mode={len(xvec_list)}"
             )
 
-        normalized = self._normalize_audio_inputs(ref_audio_list)
-
-        ref_wavs_for_code: List[np.ndarray] = []
-        ref_sr_for_code: List[int] = []
-        for wav, sr in normalized:
-            ref_wavs_for_code.append(wav)
-            ref_sr_for_code.append(sr)
-
-        if len(set(ref_sr_for_code)) == 1:
-            enc = self.model.speech_tokenizer.encode(ref_wavs_for_code, sr=ref_sr_for_code[0])
-            ref_codes = enc.audio_codes
-        else:
-            ref_codes = []
-            for wav, sr in normalized:
-                ref_codes.append(self.model.speech_tokenizer.encode(wav, sr=sr).audio_codes[0])
-
-        items: List[VoiceClonePromptItem] = []
-        for i, ((wav, sr), code, rtext, xvec_only) in enumerate(zip(normalized, ref_codes, ref_text_list, xvec_list)):
+        for i, (rtext, xvec_only) in enumerate(zip(ref_text_list, xvec_list)):
             if not xvec_only:
                 if rtext is None or rtext == "":
                     raise ValueError(f"ref_text is required when x_vector_only_mode=False (ICL mode). Bad index={i}")
 
-            wav_resample = wav
-            if sr != self.model.speaker_encoder_sample_rate:
-                wav_resample = librosa.resample(y=wav_resample.astype(np.float32), 
-                                           orig_sr=int(sr), 
-                                           target_sr=self.model.speaker_encoder_sample_rate)
-
-            spk_emb = self.model.extract_speaker_embedding(audio=wav_resample,
-                                                           sr=self.model.speaker_encoder_sample_rate)
-
-            items.append(
-                VoiceClonePromptItem(
-                    ref_code=None if xvec_only else code,
-                    ref_spk_embedding=spk_emb,
-                    x_vector_only_mode=bool(xvec_only),
-                    icl_mode=bool(not xvec_only),
-                    ref_text=rtext,
-                )
+        normalized = self._normalize_audio_inputs(ref_audio_list)
+
+        # indices sharing a reference (by cache key) are extracted once
+        cache = self.reference_cache
+        model_id = getattr(self.model, "name_or_path", "")
+        base_items: List[Optional[VoiceClonePromptItem]] = [None] * len(normalized)
+        pending: Dict[Any, List[int]] = {}
+        for i, ((wav, sr), xvec_only) in enumerate(zip(normalized, xvec_list)):
+            key = cache.key(wav, sr, xvec_only, model_id) if cache is not None else i
+            cached = cache.get(key, self.device) if cache is not None and key not in pending else None
+            if cached is not None:
+                base_items[i] = cached
+            else:
+                pending.setdefault(key, []).append(i)
+
+        # the reference codes are only needed in ICL mode
+        code_indices = [indices[0] for indices in pending.values() if not xvec_list[indices[0]]]
+        ref_codes: Dict[int, torch.Tensor] = {}
+        if code_indices:
+            code_srs = [normalized[i][1] for i in code_indices]
+            if len(set(code_srs)) == 1:
+                enc = self.model.speech_tokenizer.encode([normalized[i][0] for i in code_indices], sr=code_srs[0])
+                ref_codes = dict(zip(code_indices, enc.audio_codes))
+            else:
+                for i in code_indices:
+                    wav, sr = normalized[i]
+                    ref_codes[i] = self.model.speech_tokenizer.encode(wav, sr=sr).audio_codes[0]
+
+        # the reference audios of the speaker encoder are resampled in one go, batched on device if enabled
+        spk_wavs = resample_audios(
+            [normalized[indices[0]] for indices in pending.values()],
+            self.model.speaker_encoder_sample_rate,
+            device=self.device if self.resample_on_device else None,
+        )
+        for (key, indices), (wav_resample, spk_sr) in zip(pending.items(), spk_wavs):
+            i = indices[0]
+            spk_emb = self.model.extract_speaker_embedding(audio=wav_resample, sr=spk_sr)
+
+            item = VoiceClonePromptItem(
+                ref_code=ref_codes.get(i),
+                ref_spk_embedding=spk_emb,
+                x_vector_only_mode=bool(xvec_list[i]),
+                icl_mode=bool(not xvec_list[i]),
             )
-        return items
+            if cache is not None:
+                cache.put(key, item)
+            for j in indices:
+                base_items[j] = item
+
+        return [dataclasses.replace(item, ref_text=rtext) for item, rtext in zip(base_items, ref_text_list)]
 
     def _prompt_items_to_voice_clone_prompt(self, items: List[VoiceClonePromptItem]) -> Dict[str, Any]:
         return dict(
@@ -471,6 +819,67 @@ class Qwen3TTSModel:
             icl_mode=[it.icl_mode for it in items],
         )
 
+    def _prepare_voice_clone_inputs(
+        self,
+        text: Union[str, List[str]],
+        language: Union[str, List[str]],
+        ref_audio: Optional[Union[AudioLike, List[AudioLike]]],
+        ref_text: Optional[Union[str, List[Optional[str]]]],
+        x_vector_only_mode: Union[bool, List[bool]],
+        voice_clone_prompt: Optional[Union[Dict[str, Any], List[VoiceClonePromptItem]]],
+    ) -> Dict[str, Any]:
+        texts = self._ensure_list(text)
+        languages = self._ensure_list(language) if isinstance(language, list) else ([language] * len(texts) if language is not None else ["Auto"] * len(texts))
+        if len(languages) == 1 and len(texts) > 1:
+            languages = languages * len(texts)
+        if len(texts) != len(languages):
+            raise ValueError(f"Batch size mismatch: text={len(texts)}, language={len(languages)}")
+
+        self._validate_languages(languages)
+
+        if voice_clone_prompt is None:
+            if ref_audio is None:
+                raise ValueError("Either `voice_clone_prompt` or `ref_audio` must be provided.")
+            prompt_items = self.create_voice_clone_prompt(ref_audio=ref_audio, ref_text=ref_text, x_vector_only_mode=x_vector_only_mode)
+            if len(prompt_items) == 1 and len(texts) > 1:
+                prompt_items = prompt_items * len(texts)
+            if len(prompt_items) != len(texts):
+                raise ValueError(f"Batch size mismatch: prompt={len(prompt_items)}, text={len(texts)}")
+            voice_clone_prompt_dict = self._prompt_items_to_voice_clone_prompt(prompt_items)
+            ref_texts_for_ids = [it.ref_text for it in prompt_items]
+        else:
+            if isinstance(voice_clone_prompt, list):
+                prompt_items = voice_clone_prompt
+                if len(prompt_items) == 1 and len(texts) > 1:
+                    prompt_items = prompt_items * len(texts)
+                if len(prompt_items) != len(texts):
+                    raise ValueError(f"Batch size mismatch: prompt={len(prompt_items)}, text={len(texts)}")
+                voice_clone_prompt_dict = self._prompt_items_to_voice_clone_prompt(prompt_items)
+                ref_texts_for_ids = [it.ref_text for it in prompt_items]
+            else:
+                voice_clone_prompt_dict = voice_clone_prompt
+                ref_texts_for_ids = None
+
+        input_texts = [self._build_assistant_text(t) for t in texts]
+        input_ids = self._tokenize_texts(input_texts)
+
+        ref_ids = None
+        if ref_texts_for_ids is not None:
+            ref_ids = []
+            for i, rt in enumerate(ref_texts_for_ids):
+                if rt is None or rt == "":
+                    ref_ids.append(None)
+                else:
+                    ref_tok = self._tokenize_texts([self._build_ref_text(rt)])[0]
+                    ref_ids.append(ref_tok)
+
+        return dict(
+            input_ids=input_ids,
+            ref_ids=ref_ids,
+            voice_clone_prompt=voice_clone_prompt_dict,
+            languages=languages,
+        )
+
     # voice clone model
     @torch.no_grad()
     def generate_voice_clone(
@@ -539,6 +948,31 @@ class Qwen3TTSModel:
                 Temperature for sub-talker sampling (only valid for qwen3-tts-tokenizer-v2).
             max_new_tokens:
                 Maximum number of new codec tokens to generate.
+            max_batch_size:
+                If set, the samples are generated with continuous batching: at most `max_batch_size` samples are
+                decoded at once and a finished sample immediately hands its slot to the next one. Waveforms are
+                decoded `max_batch_size` samples at a time as well.
+            pipeline_decode:
+                If True, the waveform of a sample is decoded on a background thread as soon as its codes are final,
+                overlapping with the generation of the remaining samples. Only with `max_batch_size` or speculative
+                decoding do samples finish one by one; otherwise all codes are final only when generation ends, so
+                there is nothing to overlap and the option is ignored with a warning.
+            progress_callback:
+                Called as `progress_callback(num_finished, num_samples)` each time the codes of a sample are final,
+                e.g. to drive a progress bar during continuous batching. Without `max_batch_size` or speculative
+                decoding, all samples finish together and the calls only come once generation ends.
+            parallel_decode:
+                12Hz only. If True, long waveforms are decoded as overlapping windows stacked along the batch dimension
+                instead of chunk after chunk. This re-decodes the overlapping context frames to run the chunks in
+                parallel, so it only helps when the device has idle capacity, and the audio is not bit-exact at the
+                chunk seams.
+            max_frames_per_token:
+                If set, a sample stops after this many codec frames per text token, on top of `max_new_tokens`.
+            detect_runaway:
+                If True, a sample stops once its codes loop on a short repeated pattern or on silence; the looping
+                part is dropped. When streaming, the audio then lags `runaway_window` frames behind the talker so
+                that the loop is never emitted. `self.model.termination_reasons` tells why every sample ended and
+                `self.model.termination_stats` how many talker steps were saved.
             **kwargs:
                 Any other keyword arguments supported by HuggingFace Transformers `generate()` can be passed.
                 They will be forwarded to the underlying `Qwen3TTSForConditionalGeneration.generate(...)`.
@@ -551,92 +985,120 @@ class Qwen3TTSModel:
             ValueError:
                 If batch sizes mismatch or required prompt inputs are missing.
         """
-        if self.model.tts_model_type != "base":
-            raise ValueError(
-                f"model with \ntokenizer_type: {self.model.tokenizer_type}\n"
-                f"tts_model_size: {self.model.tts_model_size}\n"
-                f"tts_model_type: {self.model.tts_model_type}\n"
-                "does not support generate_voice_clone, Please check Model Card or Readme for more details."
+        self._check_model_type("base", "generate_voice_clone")
+
+        generate_inputs = self._prepare_voice_clone_inputs(
+            text, language, ref_audio, ref_text, x_vector_only_mode, voice_clone_prompt
+        )
+        voice_clone_prompt_dict = generate_inputs["voice_clone_prompt"]
+        gen_kwargs = self._merge_generate_kwargs(**kwargs)
+        if "draft_model" in gen_kwargs:
+            gen_kwargs["draft_voice_clone_prompt"] = self._build_draft_voice_clone_prompt(
+                voice_clone_prompt_dict, ref_audio if voice_clone_prompt is None else None
             )
-        
-        texts = self._ensure_list(text)
-        languages = self._ensure_list(language) if isinstance(language, list) else ([language] * len(texts) if language is not None else ["Auto"] * len(texts))
-        if len(languages) == 1 and len(texts) > 1:
-            languages = languages * len(texts)
-        if len(texts) != len(languages):
-            raise ValueError(f"Batch size mismatch: text={len(texts)}, language={len(languages)}")
 
-        self._validate_languages(languages)
+        return self._generate_and_decode(
+            dict(generate_inputs, non_streaming_mode=non_streaming_mode),
+            gen_kwargs,
+            context_codes=voice_clone_prompt_dict.get("ref_code", None),
+        )
 
-        if voice_clone_prompt is None:
-            if ref_audio is None:
-                raise ValueError("Either `voice_clone_prompt` or `ref_audio` must be provided.")
-            prompt_items = self.create_voice_clone_prompt(ref_audio=ref_audio, ref_text=ref_text, x_vector_only_mode=x_vector_only_mode)
-            if len(prompt_items) == 1 and len(texts) > 1:
-                prompt_items = prompt_items * len(texts)
-            if len(prompt_items) != len(texts):
-                raise ValueError(f"Batch size mismatch: prompt={len(prompt_items)}, text={len(texts)}")
-            voice_clone_prompt_dict = self._prompt_items_to_voice_clone_prompt(prompt_items)
-            ref_texts_for_ids = [it.ref_text for it in prompt_items]
-        else:
-            if isinstance(voice_clone_prompt, list):
-                prompt_items = voice_clone_prompt
-                if len(prompt_items) == 1 and len(texts) > 1:
-                    prompt_items = prompt_items * len(texts)
-                if len(prompt_items) != len(texts):
-                    raise ValueError(f"Batch size mismatch: prompt={len(prompt_items)}, text={len(texts)}")
-                voice_clone_prompt_dict = self._prompt_items_to_voice_clone_prompt(prompt_items)
-                ref_texts_for_ids = [it.ref_text for it in prompt_items]
-            else:
-                voice_clone_prompt_dict = voice_clone_prompt
-                ref_texts_for_ids = None
+    # voice clone model
+    @torch.no_grad()
+    def generate_voice_clone_stream(
+        self,
+        text: str,
+        language: str = None,
+        ref_audio: Optional[AudioLike] = None,
+        ref_text: Optional[str] = None,
+        x_vector_only_mode: bool = False,
+        voice_clone_prompt: Optional[Union[Dict[str, Any], List[VoiceClonePromptItem]]] = None,
+        non_streaming_mode: bool = False,
+        chunk_size: int = 12,
+        left_context_size: Optional[int] = None,
+        **kwargs,
+    ) -> Iterator[Tuple[np.ndarray, int]]:
+        """
+        Streaming variant of `generate_voice_clone` for a single text.
 
-        input_texts = [self._build_assistant_text(t) for t in texts]
-        input_ids = self._tokenize_texts(input_texts)
+        Waveform chunks are yielded as soon as `chunk_size` new codec frames have been generated, so playback can
+        start while the talker is still running. In ICL mode the reference codes serve as left context of the first
+        chunk. Closing the generator early stops the generation.
 
-        ref_ids = None
-        if ref_texts_for_ids is not None:
-            ref_ids = []
-            for i, rt in enumerate(ref_texts_for_ids):
-                if rt is None or rt == "":
-                    ref_ids.append(None)
-                else:
-                    ref_tok = self._tokenize_texts([self._build_ref_text(rt)])[0]
-                    ref_ids.append(ref_tok)
+        Args:
+            text, language, ref_audio, ref_text, x_vector_only_mode, voice_clone_prompt, non_streaming_mode:
+                Same as `generate_voice_clone`, for a single sample.
+            chunk_size:
+                Number of codec frames decoded and yielded per chunk (12 frames ~= 1 s of audio).
+            left_context_size:
+                If set, every chunk is re-decoded with that many previous frames as left context instead of keeping
+                a streaming decoder state. The default decodes every frame once and matches the non-streaming output.
+            **kwargs:
+                Generation parameters, same as `generate_voice_clone`.
+
+        Yields:
+            Tuple[np.ndarray, int]:
+                (wav_chunk, sample_rate)
+
+        Raises:
+            ValueError:
+                If the model does not use the 12Hz tokenizer or more than one text is given.
+        """
+        self._check_model_type("base", "generate_voice_clone_stream")
 
+        generate_inputs = self._prepare_voice_clone_inputs(
+            text, language, ref_audio, ref_text, x_vector_only_mode, voice_clone_prompt
+        )
+        ref_code_list = generate_inputs["voice_clone_prompt"].get("ref_code", None)
+        context_codes = ref_code_list[0] if ref_code_list is not None else None
         gen_kwargs = self._merge_generate_kwargs(**kwargs)
+        if "draft_model" in gen_kwargs:
+            gen_kwargs["draft_voice_clone_prompt"] = self._build_draft_voice_clone_prompt(
+                generate_inputs["voice_clone_prompt"], ref_audio if voice_clone_prompt is None else None
+            )
 
-        talker_codes_list, _ = self.model.generate(
-            input_ids=input_ids,
-            ref_ids=ref_ids,
-            voice_clone_prompt=voice_clone_prompt_dict,
-            languages=languages,
-            non_streaming_mode=non_streaming_mode,
-            **gen_kwargs,
+        yield from self._generate_stream(
+            dict(generate_inputs, non_streaming_mode=non_streaming_mode),
+            gen_kwargs,
+            chunk_size=chunk_size,
+            left_context_size=left_context_size,
+            context_codes=context_codes,
         )
 
-        codes_for_decode = []
-        for i, codes in enumerate(talker_codes_list):
-            ref_code_list = voice_clone_prompt_dict.get("ref_code", None)
-            if ref_code_list is not None and ref_code_list[i] is not None:
-                codes_for_decode.append(torch.cat([ref_code_list[i].to(codes.device), codes], dim=0))
-            else:
-                codes_for_decode.append(codes)
+    def _prepare_voice_design_inputs(
+        self,
+        text: Union[str, List[str]],
+        instruct: Union[str, List[str]],
+        language: Union[str, List[str]],
+    ) -> Dict[str, Any]:
+        texts = self._ensure_list(text)
+        languages = self._ensure_list(language) if isinstance(language, list) else ([language] * len(texts) if language is not None else ["Auto"] * len(texts))
+        instructs = self._ensure_list(instruct)
+
+        if len(languages) == 1 and len(texts) > 1:
+            languages = languages * len(texts)
+        if len(instructs) == 1 and len(texts) > 1:
+            instructs = instructs * len(texts)
 
-        wavs_all, fs = self.model.speech_tokenizer.decode([{"audio_codes": c} for c in codes_for_decode])
+        if not (len(texts) == len(languages) == len(instructs)):
+            raise ValueError(f"Batch size mismatch: text={len(texts)}, language={len(languages)}, instruct={len(instructs)}")
 
-        wavs_out: List[np.ndarray] = []
-        for i, wav in enumerate(wavs_all):
-            ref_code_list = voice_clone_prompt_dict.get("ref_code", None)
-            if ref_code_list is not None and ref_code_list[i] is not None:
-                ref_len = int(ref_code_list[i].shape[0])
-                total_len = int(codes_for_decode[i].shape[0])
-                cut = int(ref_len / max(total_len, 1) * wav.shape[0])
-                wavs_out.append(wav[cut:])
+        self._validate_languages(languages)
+
+        input_ids = self._tokenize_texts([self._build_assistant_text(t) for t in texts])
+
+        instruct_ids: List[Optional[torch.Tensor]] = []
+        for ins in instructs:
+            if ins is None or ins == "":
+                instruct_ids.append(None)
             else:
-                wavs_out.append(wav)
+                instruct_ids.append(self._tokenize_texts([self._build_instruct_text(ins)])[0])
 
-        return wavs_out, fs
+        return dict(
+            input_ids=input_ids,
+            instruct_ids=instruct_ids,
+            languages=languages,
+        )
 
     # voice design model
     @torch.no_grad()
@@ -681,6 +1143,31 @@ class Qwen3TTSModel:
                 Temperature for sub-talker sampling (only valid for qwen3-tts-tokenizer-v2).
             max_new_tokens:
                 Maximum number of new codec tokens to generate.
+            max_batch_size:
+                If set, the samples are generated with continuous batching: at most `max_batch_size` samples are
+                decoded at once and a finished sample immediately hands its slot to the next one. Waveforms are
+                decoded `max_batch_size` samples at a time as well.
+            pipeline_decode:
+                If True, the waveform of a sample is decoded on a background thread as soon as its codes are final,
+                overlapping with the generation of the remaining samples. Only with `max_batch_size` or speculative
+                decoding do samples finish one by one; otherwise all codes are final only when generation ends, so
+                there is nothing to overlap and the option is ignored with a warning.
+            progress_callback:
+                Called as `progress_callback(num_finished, num_samples)` each time the codes of a sample are final,
+                e.g. to drive a progress bar during continuous batching. Without `max_batch_size` or speculative
+                decoding, all samples finish together and the calls only come once generation ends.
+            parallel_decode:
+                12Hz only. If True, long waveforms are decoded as overlapping windows stacked along the batch dimension
+                instead of chunk after chunk. This re-decodes the overlapping context frames to run the chunks in
+                parallel, so it only helps when the device has idle capacity, and the audio is not bit-exact at the
+                chunk seams.
+            max_frames_per_token:
+                If set, a sample stops after this many codec frames per text token, on top of `max_new_tokens`.
+            detect_runaway:
+                If True, a sample stops once its codes loop on a short repeated pattern or on silence; the looping
+                part is dropped. When streaming, the audio then lags `runaway_window` frames behind the talker so
+                that the loop is never emitted. `self.model.termination_reasons` tells why every sample ended and
+                `self.model.termination_stats` how many talker steps were saved.
             **kwargs:
                 Any other keyword arguments supported by HuggingFace Transformers `generate()` can be passed.
                 They will be forwarded to the underlying `Qwen3TTSForConditionalGeneration.generate(...)`.
@@ -689,27 +1176,90 @@ class Qwen3TTSModel:
             Tuple[List[np.ndarray], int]:
                 (wavs, sample_rate)
         """
-        if self.model.tts_model_type != "voice_design":
-            raise ValueError(
-                f"model with \ntokenizer_type: {self.model.tokenizer_type}\n"
-                f"tts_model_size: {self.model.tts_model_size}\n"
-                f"tts_model_type: {self.model.tts_model_type}\n"
-                "does not support generate_voice_design, Please check Model Card or Readme for more details."
-            )
-        
+        self._check_model_type("voice_design", "generate_voice_design")
+
+        generate_inputs = self._prepare_voice_design_inputs(text, instruct, language)
+        gen_kwargs = self._merge_generate_kwargs(**kwargs)
+
+        return self._generate_and_decode(dict(generate_inputs, non_streaming_mode=non_streaming_mode), gen_kwargs)
+
+    # voice design model
+    @torch.no_grad()
+    def generate_voice_design_stream(
+        self,
+        text: str,
+        instruct: str,
+        language: str = None,
+        non_streaming_mode: bool = False,
+        chunk_size: int = 12,
+        left_context_size: Optional[int] = None,
+        **kwargs,
+    ) -> Iterator[Tuple[np.ndarray, int]]:
+        """
+        Streaming variant of `generate_voice_design` for a single text.
+
+        Waveform chunks are yielded as soon as `chunk_size` new codec frames have been generated, so playback can
+        start while the talker is still running. Closing the generator early stops the generation.
+
+        Args:
+            text, instruct, language, non_streaming_mode:
+                Same as `generate_voice_design`, for a single sample.
+            chunk_size:
+                Number of codec frames decoded and yielded per chunk (12 frames ~= 1 s of audio).
+            left_context_size:
+                If set, every chunk is re-decoded with that many previous frames as left context instead of keeping
+                a streaming decoder state. The default decodes every frame once and matches the non-streaming output.
+            **kwargs:
+                Generation parameters, same as `generate_voice_design`.
+
+        Yields:
+            Tuple[np.ndarray, int]:
+                (wav_chunk, sample_rate)
+
+        Raises:
+            ValueError:
+                If the model does not use the 12Hz tokenizer or more than one text is given.
+        """
+        self._check_model_type("voice_design", "generate_voice_design_stream")
+
+        generate_inputs = self._prepare_voice_design_inputs(text, instruct, language)
+        gen_kwargs = self._merge_generate_kwargs(**kwargs)
+
+        yield from self._generate_stream(
+            dict(generate_inputs, non_streaming_mode=non_streaming_mode),
+            gen_kwargs,
+            chunk_size=chunk_size,
+            left_context_size=left_context_size,
+        )
+
+    def _prepare_custom_voice_inputs(
+        self,
+        text: Union[str, List[str]],
+        speaker: Union[str, List[str]],
+        language: Union[str, List[str]],
+        instruct: Optional[Union[str, List[str]]],
+    ) -> Dict[str, Any]:
         texts = self._ensure_list(text)
         languages = self._ensure_list(language) if isinstance(language, list) else ([language] * len(texts) if language is not None else ["Auto"] * len(texts))
-        instructs = self._ensure_list(instruct)
+        speakers = self._ensure_list(speaker)
+        if self.model.tts_model_size in "0b6": # for 0b6 model, instruct is not supported
+            instruct = None
+        instructs = self._ensure_list(instruct) if isinstance(instruct, list) else ([instruct] * len(texts) if instruct is not None else [""] * len(texts))
 
         if len(languages) == 1 and len(texts) > 1:
             languages = languages * len(texts)
+        if len(speakers) == 1 and len(texts) > 1:
+            speakers = speakers * len(texts)
         if len(instructs) == 1 and len(texts) > 1:
             instructs = instructs * len(texts)
 
-        if not (len(texts) == len(languages) == len(instructs)):
-            raise ValueError(f"Batch size mismatch: text={len(texts)}, language={len(languages)}, instruct={len(instructs)}")
+        if not (len(texts) == len(languages) == len(speakers) == len(instructs)):
+            raise ValueError(
+                f"Batch size mismatch: text={len(texts)}, language={len(languages)}, speaker={len(speakers)}, instruct={len(instructs)}"
+            )
 
         self._validate_languages(languages)
+        self._validate_speakers(speakers)
 
         input_ids = self._tokenize_texts([self._build_assistant_text(t) for t in texts])
 
@@ -720,19 +1270,13 @@ class Qwen3TTSModel:
             else:
                 instruct_ids.append(self._tokenize_texts([self._build_instruct_text(ins)])[0])
 
-        gen_kwargs = self._merge_generate_kwargs(**kwargs)
-
-        talker_codes_list, _ = self.model.generate(
+        return dict(
             input_ids=input_ids,
             instruct_ids=instruct_ids,
             languages=languages,
-            non_streaming_mode=non_streaming_mode,
-            **gen_kwargs,
+            speakers=speakers,
         )
 
-        wavs, fs = self.model.speech_tokenizer.decode([{"audio_codes": c} for c in talker_codes_list])
-        return wavs, fs
-
     # custom voice model
     @torch.no_grad()
     def generate_custom_voice(
@@ -779,6 +1323,31 @@ class Qwen3TTSModel:
                 Temperature for sub-talker sampling (only valid for qwen3-tts-tokenizer-v2).
             max_new_tokens:
                 Maximum number of new codec tokens to generate.
+            max_batch_size:
+                If set, the samples are generated with continuous batching: at most `max_batch_size` samples are
+                decoded at once and a finished sample immediately hands its slot to the next one. Waveforms are
+                decoded `max_batch_size` samples at a time as well.
+            pipeline_decode:
+                If True, the waveform of a sample is decoded on a background thread as soon as its codes are final,
+                overlapping with the generation of the remaining samples. Only with `max_batch_size` or speculative
+                decoding do samples finish one by one; otherwise all codes are final only when generation ends, so
+                there is nothing to overlap and the option is ignored with a warning.
+            progress_callback:
+                Called as `progress_callback(num_finished, num_samples)` each time the codes of a sample are final,
+                e.g. to drive a progress bar during continuous batching. Without `max_batch_size` or speculative
+                decoding, all samples finish together and the calls only come once generation ends.
+            parallel_decode:
+                12Hz only. If True, long waveforms are decoded as overlapping windows stacked along the batch dimension
+                instead of chunk after chunk. This re-decodes the overlapping context frames to run the chunks in
+                parallel, so it only helps when the device has idle capacity, and the audio is not bit-exact at the
+                chunk seams.
+            max_frames_per_token:
+                If set, a sample stops after this many codec frames per text token, on top of `max_new_tokens`.
+            detect_runaway:
+                If True, a sample stops once its codes loop on a short repeated pattern or on silence; the looping
+                part is dropped. When streaming, the audio then lags `runaway_window` frames behind the talker so
+                that the loop is never emitted. `self.model.termination_reasons` tells why every sample ended and
+                `self.model.termination_stats` how many talker steps were saved.
             **kwargs:
                 Any other keyword arguments supported by HuggingFace Transformers `generate()` can be passed.
                 They will be forwarded to the underlying `Qwen3TTSForConditionalGeneration.generate(...)`.
@@ -791,59 +1360,209 @@ class Qwen3TTSModel:
             ValueError:
                 If any speaker/language is unsupported or batch sizes mismatch.
         """
-        if self.model.tts_model_type != "custom_voice":
-            raise ValueError(
-                f"model with \ntokenizer_type: {self.model.tokenizer_type}\n"
-                f"tts_model_size: {self.model.tts_model_size}\n"
-                f"tts_model_type: {self.model.tts_model_type}\n"
-                "does not support generate_custom_voice, Please check Model Card or Readme for more details."
-            )
+        self._check_model_type("custom_voice", "generate_custom_voice")
 
-        texts = self._ensure_list(text)
-        languages = self._ensure_list(language) if isinstance(language, list) else ([language] * len(texts) if language is not None else ["Auto"] * len(texts))
-        speakers = self._ensure_list(speaker)
-        if self.model.tts_model_size in "0b6": # for 0b6 model, instruct is not supported
-            instruct = None
-        instructs = self._ensure_list(instruct) if isinstance(instruct, list) else ([instruct] * len(texts) if instruct is not None else [""] * len(texts))
+        generate_inputs = self._prepare_custom_voice_inputs(text, speaker, language, instruct)
+        gen_kwargs = self._merge_generate_kwargs(**kwargs)
 
-        if len(languages) == 1 and len(texts) > 1:
-            languages = languages * len(texts)
-        if len(speakers) == 1 and len(texts) > 1:
-            speakers = speakers * len(texts)
-        if len(instructs) == 1 and len(texts) > 1:
-            instructs = instructs * len(texts)
+        return self._generate_and_decode(dict(generate_inputs, non_streaming_mode=non_streaming_mode), gen_kwargs)
 
-        if not (len(texts) == len(languages) == len(speakers) == len(instructs)):
-            raise ValueError(
-                f"Batch size mismatch: text={len(texts)}, language={len(languages)}, speaker={len(speakers)}, instruct={len(instructs)}"
-            )
+    # custom voice model
+    @torch.no_grad()
+    def generate_custom_voice_stream(
+        self,
+        text: str,
+        speaker: str,
+        language: str = None,
+        instruct: Optional[str] = None,
+        non_streaming_mode: bool = False,
+        chunk_size: int = 12,
+        left_context_size: Optional[int] = None,
+        **kwargs,
+    ) -> Iterator[Tuple[np.ndarray, int]]:
+        """
+        Streaming variant of `generate_custom_voice` for a single text.
 
-        self._validate_languages(languages)
-        self._validate_speakers(speakers)
+        Waveform chunks are yielded as soon as `chunk_size` new codec frames have been generated, so playback can
+        start while the talker is still running. Closing the generator early stops the generation.
 
-        input_ids = self._tokenize_texts([self._build_assistant_text(t) for t in texts])
+        Args:
+            text, speaker, language, instruct, non_streaming_mode:
+                Same as `generate_custom_voice`, for a single sample.
+            chunk_size:
+                Number of codec frames decoded and yielded per chunk (12 frames ~= 1 s of audio).
+            left_context_size:
+                If set, every chunk is re-decoded with that many previous frames as left context instead of keeping
+                a streaming decoder state. The default decodes every frame once and matches the non-streaming output.
+            **kwargs:
+                Generation parameters, same as `generate_custom_voice`.
 
-        instruct_ids: List[Optional[torch.Tensor]] = []
-        for ins in instructs:
-            if ins is None or ins == "":
-                instruct_ids.append(None)
-            else:
-                instruct_ids.append(self._tokenize_texts([self._build_instruct_text(ins)])[0])
+        Yields:
+            Tuple[np.ndarray, int]:
+                (wav_chunk, sample_rate)
+
+        Raises:
+            ValueError:
+                If the model does not use the 12Hz tokenizer or more than one text is given.
+        """
+        self._check_model_type("custom_voice", "generate_custom_voice_stream")
 
+        generate_inputs = self._prepare_custom_voice_inputs(text, speaker, language, instruct)
         gen_kwargs = self._merge_generate_kwargs(**kwargs)
 
-        talker_codes_list, _ = self.model.generate(
-            input_ids=input_ids,
-            instruct_ids=instruct_ids,
-            languages=languages,
-            speakers=speakers,
-            non_streaming_mode=non_streaming_mode,
-            **gen_kwargs,
+        yield from self._generate_stream(
+            dict(generate_inputs, non_streaming_mode=non_streaming_mode),
+            gen_kwargs,
+            chunk_size=chunk_size,
+            left_context_size=left_context_size,
         )
 
-        wavs, fs = self.model.speech_tokenizer.decode([{"audio_codes": c} for c in talker_codes_list])
-        return wavs, fs
 
+    def _plan_length_buckets(
+        self, lengths: List[int], batch_size: int, max_batch_tokens: Optional[int] = None
+    ) -> List[List[int]]:
+        """
+        Group request indices into batches of similar length: longest first, at most `batch_size` per batch and, if
+        `max_batch_tokens` is set, at most that many padded text tokens (longest length x batch size) per batch.
+        """
+        order = sorted(range(len(lengths)), key=lambda i: lengths[i], reverse=True)
+        buckets: List[List[int]] = []
+        for index in order:
+            if buckets:
+                bucket = buckets[-1]
+                padded = lengths[bucket[0]] * (len(bucket) + 1)
+                if len(bucket) < batch_size and (max_batch_tokens is None or padded <= max_batch_tokens):
+                    bucket.append(index)
+                    continue
+            buckets.append([index])
+        return buckets
+
+    def _resolve_voice_clone_prompts(self, requests: List[Dict[str, Any]]) -> None:
+        """
+        Set `voice_clone_prompt` of every voice clone request that only has `ref_audio`, extracting each distinct
+        (ref_audio, ref_text, x_vector_only_mode) once, in a single `create_voice_clone_prompt` call.
+        """
+        keys: List[Any] = []
+        refs: Dict[Any, Dict[str, Any]] = {}
+        for i, request in enumerate(requests):
+            prompt = request.get("voice_clone_prompt")
+            if prompt is not None:
+                if isinstance(prompt, list):
+                    if len(prompt) != 1:
+                        raise ValueError(f"Request {i} must have a single `voice_clone_prompt` item, got {len(prompt)}")
+                    request["voice_clone_prompt"] = prompt[0]
+                keys.append(None)
+                continue
+            ref_audio = request.get("ref_audio")
+            if ref_audio is None:
+                raise ValueError(f"Request {i}: either `voice_clone_prompt` or `ref_audio` must be provided.")
+            key = (
+                ref_audio if isinstance(ref_audio, str) else id(ref_audio),
+                request.get("ref_text"),
+                bool(request.get("x_vector_only_mode", False)),
+            )
+            refs.setdefault(key, request)
+            keys.append(key)
+
+        if not refs:
+            return
+        ref_requests = list(refs.values())
+        prompt_items = self.create_voice_clone_prompt(
+            ref_audio=[r["ref_audio"] for r in ref_requests],
+            ref_text=[r.get("ref_text") for r in ref_requests],
+            x_vector_only_mode=[bool(r.get("x_vector_only_mode", False)) for r in ref_requests],
+        )
+        prompt_by_key = dict(zip(refs.keys(), prompt_items))
+        for request, key in zip(requests, keys):
+            if key is not None:
+                request["voice_clone_prompt"] = prompt_by_key[key]
+
+    @torch.no_grad()
+    def generate_many(
+        self,
+        requests: List[Dict[str, Any]],
+        batch_size: int = 8,
+        max_batch_tokens: Optional[int] = None,
+        **kwargs,
+    ) -> Tuple[List[np.ndarray], int]:
+        """
+        Generate speech for an arbitrary list of requests with length bucketing.
+
+        The requests are sorted by their text length in tokens (a proxy for the output length) and generated in
+        batches of similar length, so a batch does not pad short texts to a long one and does not keep running for a
+        single long sample. The waveforms are returned in the order of `requests`.
+
+        Each request is a dict with the per-sample arguments of the generate method of the loaded model:
+          - CustomVoice: text, speaker, language, instruct (see `generate_custom_voice`)
+          - VoiceDesign: text, instruct, language (see `generate_voice_design`)
+          - Base: text, language, ref_audio, ref_text, x_vector_only_mode, voice_clone_prompt
+            (a single `VoiceClonePromptItem`, see `generate_voice_clone`)
+        Any of these fields passed in `kwargs` is used for every request that does not set it itself. For voice clone,
+        each distinct reference audio is only encoded once.
+
+        Args:
+            requests:
+                The requests to synthesize.
+            batch_size:
+                Maximum number of requests per batch. With `max_batch_size` (continuous batching), this is the number
+                of requests per `generate` call instead and `max_batch_size` bounds the samples decoded at once.
+            max_batch_tokens:
+                If set, also caps the padded text length (longest text tokens x batch size) of a batch.
+            **kwargs:
+                Shared request fields, and generation arguments forwarded to the generate method (`do_sample`,
+                `max_new_tokens`, `non_streaming_mode`, `max_batch_size`, `pipeline_decode`, ...).
+
+        Returns:
+            Tuple[List[np.ndarray], int]:
+                (wavs, sample_rate), `wavs[i]` belonging to `requests[i]`.
+
+        Note:
+            With sampling, the random draws of a request depend on the batch it lands in, so the outputs differ from
+            generating the requests in their original order.
+        """
+        model_type = self.model.tts_model_type
+        fields = GENERATE_MANY_FIELDS[model_type]
+        shared = {name: kwargs.pop(name) for name in fields if name in kwargs}
+
+        items: List[Dict[str, Any]] = []
+        for i, request in enumerate(requests):
+            unknown = set(request) - set(fields)
+            if unknown:
+                raise ValueError(
+                    f"Request {i} has fields {sorted(unknown)} not supported by the {model_type} model, "
+                    f"expected any of {list(fields)}"
+                )
+            item = dict(shared, **request)
+            if item.get("text") is None:
+                raise ValueError(f"Request {i} has no `text`.")
+            items.append(item)
+        if not items:
+            return [], self.model.speech_tokenizer.get_output_sample_rate()
+
+        if model_type == "base":
+            self._resolve_voice_clone_prompts(items)
+            generate_fn = self.generate_voice_clone
+            batch_fields = ("text", "language", "voice_clone_prompt")
+        elif model_type == "voice_design":
+            generate_fn = self.generate_voice_design
+            batch_fields = fields
+        else:
+            generate_fn = self.generate_custom_voice
+            batch_fields = fields
+        defaults = {"language": "Auto", "instruct": ""}
+
+        lengths = [int(self.processor(text=item["text"], return_tensors="pt")["input_ids"].shape[-1]) for item in items]
+        wavs_out: List[Optional[np.ndarray]] = [None] * len(items)
+        fs = None
+        for bucket in self._plan_length_buckets(lengths, batch_size, max_batch_tokens):
+            batch = {
+                name: [items[i].get(name) if items[i].get(name) is not None else defaults.get(name) for i in bucket]
+                for name in batch_fields
+            }
+            wavs, fs = generate_fn(**batch, **kwargs)
+            for i, wav in zip(bucket, wavs):
+                wavs_out[i] = wav
+        return wavs_out, fs
 
     def get_supported_speakers(self) -> Optional[List[str]]:
         """
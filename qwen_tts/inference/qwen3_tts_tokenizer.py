@@ -13,15 +13,11 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
-import base64
-import io
-import urllib.request
-from typing import List, Optional, Tuple, Union
-from urllib.parse import urlparse
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
 
-import librosa
 import numpy as np
-import soundfile as sf
 import torch
 from torch.nn.utils.rnn import pad_sequence
 from transformers import AutoConfig, AutoFeatureExtractor, AutoModel
@@ -30,8 +26,10 @@ from ..core import (
     Qwen3TTSTokenizerV1Config,
     Qwen3TTSTokenizerV1Model,
     Qwen3TTSTokenizerV2Config,
+    Qwen3TTSTokenizerV2DecoderState,
     Qwen3TTSTokenizerV2Model,
 )
+from .audio_io import load_audios, read_audio, resample, resample_batch
 
 AudioInput = Union[
     str,  # wav path, or base64 string
@@ -48,6 +46,9 @@ class Qwen3TTSTokenizer:
     - from_pretrained(): loads speech tokenizer model via AutoModel and feature_extractor via AutoFeatureExtractor.
     - encode(): supports wav path(s), base64 audio string(s), numpy array(s).
     - decode(): accepts either the raw model encode output, or a minimal dict/list-of-dicts.
+    - resample_on_device: if True (`from_pretrained(..., resample_on_device=True)`), input audio is resampled by a
+      batched `torchaudio` op on the model's accelerator device. The default, False, keeps soxr on every device, whose
+      output differs slightly from `torchaudio`'s filter.
 
     Notes:
     - For numpy array input, you must pass `sr` so the audio can be resampled to model sample rate.
@@ -59,6 +60,7 @@ class Qwen3TTSTokenizer:
         self.feature_extractor = None
         self.config = None
         self.device = None
+        self.resample_on_device = False
 
     @classmethod
     def from_pretrained(cls, pretrained_model_name_or_path: str, **kwargs) -> "Qwen3TTSTokenizer":
@@ -69,14 +71,15 @@ class Qwen3TTSTokenizer:
             pretrained_model_name_or_path (str):
                 HuggingFace repo id or local directory.
             **kwargs (Any):
-                Forwarded to `AutoModel.from_pretrained(...)` directly.
-                Typical examples: device_map="cuda:0", dtype=torch.bfloat16, attn_implementation="eager".
+                Forwarded to `AutoModel.from_pretrained(...)` directly, except `resample_on_device` (see the class
+                docstring). Typical examples: device_map="cuda:0", dtype=torch.bfloat16, attn_implementation="eager".
 
         Returns:
             Qwen3TTSTokenizer:
                 Initialized instance with `model`, `feature_extractor`, `config`.
         """
         inst = cls()
+        inst.resample_on_device = bool(kwargs.pop("resample_on_device", False))
 
         AutoConfig.register("qwen3_tts_tokenizer_25hz", Qwen3TTSTokenizerV1Config)
         AutoModel.register(Qwen3TTSTokenizerV1Config, Qwen3TTSTokenizerV1Model)
@@ -98,27 +101,6 @@ class Qwen3TTSTokenizer:
 
         return inst
 
-    def _is_probably_base64(self, s: str) -> bool:
-        if s.startswith("data:audio"):
-            return True
-        # Heuristic: no filesystem path separators and long enough.
-        if ("/" not in s and "\\" not in s) and len(s) > 256:
-            return True
-        return False
-    
-    def _is_url(self, s: str) -> bool:
-        try:
-            u = urlparse(s)
-            return u.scheme in ("http", "https") and bool(u.netloc)
-        except Exception:
-            return False
-
-    def _decode_base64_to_wav_bytes(self, b64: str) -> bytes:
-        # Accept both "data:audio/wav;base64,...." and raw base64
-        if "," in b64 and b64.strip().startswith("data:"):
-            b64 = b64.split(",", 1)[1]
-        return base64.b64decode(b64)
-
     def load_audio(
         self,
         x: str,
@@ -137,25 +119,11 @@ class Qwen3TTSTokenizer:
             np.ndarray:
                 1-D float32 waveform at target_sr.
         """
-        if self._is_url(x):
-            with urllib.request.urlopen(x) as resp:
-                audio_bytes = resp.read()
-            with io.BytesIO(audio_bytes) as f:
-                audio, sr = sf.read(f, dtype="float32", always_2d=False)
-        elif self._is_probably_base64(x):
-            wav_bytes = self._decode_base64_to_wav_bytes(x)
-            with io.BytesIO(wav_bytes) as f:
-                audio, sr = sf.read(f, dtype="float32", always_2d=False)
-        else:
-            audio, sr = librosa.load(x, sr=None, mono=True)
+        audio, sr = read_audio(x)
+        return resample(audio, sr, target_sr, device=self._resample_device())
 
-        if audio.ndim > 1:
-            audio = np.mean(audio, axis=-1)
-
-        if sr != target_sr:
-            audio = librosa.resample(y=audio, orig_sr=sr, target_sr=target_sr)
-
-        return audio.astype(np.float32)
+    def _resample_device(self) -> Optional[torch.device]:
+        return self.device if self.resample_on_device else None
 
     def _normalize_audio_inputs(
         self,
@@ -187,8 +155,9 @@ class Qwen3TTSTokenizer:
             return []
 
         if isinstance(audios[0], str):
-            # wav path list or base64 list
-            return [self.load_audio(x, target_sr=target_sr) for x in audios]  # type: ignore[arg-type]
+            # wav path list or base64 list, decoded and resampled on the audio thread pool
+            loaded = load_audios(audios, target_sr=target_sr, device=self._resample_device())  # type: ignore[arg-type]
+            return [wav for wav, _ in loaded]
 
         # numpy list
         if sr is None:
@@ -200,16 +169,17 @@ class Qwen3TTSTokenizer:
                 raise TypeError("Mixed input types are not supported. Use all paths/base64 or all numpy arrays.")
             if a.ndim > 1:
                 a = np.mean(a, axis=-1)
-            if int(sr) != target_sr:
-                a = librosa.resample(y=a.astype(np.float32), orig_sr=int(sr), target_sr=target_sr)
             out.append(a.astype(np.float32))
-        return out
+        return resample_batch(out, int(sr), target_sr, device=self._resample_device())
 
     def encode(
         self,
         audios: AudioInput,
         sr: Optional[int] = None,
         return_dict: bool = True,
+        chunk_size: Optional[int] = None,
+        batch_size: Optional[int] = None,
+        max_padding_frames: Optional[int] = None,
     ):
         """
         Batch-encode audio into discrete codes (and optional conditioning, depending on 25Hz/12Hz).
@@ -225,6 +195,17 @@ class Qwen3TTSTokenizer:
                 Original sampling rate for numpy waveform input.
             return_dict (bool, default=True):
                 Forwarded to model.encode(...). If True, returns ModelOutput.
+            chunk_size (Optional[int], default=None):
+                12Hz only. Encode in windows of `chunk_size` codec frames that carry the encoder state across window
+                boundaries, which gives the same codes with memory bounded by the window (e.g. 750 frames = 60 s).
+                Use it for long recordings.
+            batch_size (Optional[int], default=None):
+                If set, the waveforms are sorted by length and encoded `batch_size` at a time, so that little compute
+                goes into padding. The outputs keep the input order. For 25Hz this also bounds the clips per CAM++
+                x-vector run.
+            max_padding_frames (Optional[int], default=None):
+                25Hz only. Fbank frames (10 ms) a clip may be zero padded by to share a CAM++ x-vector run with longer
+                ones. Padding shifts the x-vectors, so it is opt-in: the default of 0 gives the clip-by-clip result.
 
         Returns:
             25Hz:
@@ -238,8 +219,40 @@ class Qwen3TTSTokenizer:
 
             If return_dict=False, returns the raw tuple from model.encode.
         """
-        wavs = self._normalize_audio_inputs(audios, sr=sr)
+        if chunk_size is not None and self.model.get_model_type() != "qwen3_tts_tokenizer_12hz":
+            raise ValueError("Chunked encoding is only supported by the 12Hz tokenizer.")
+        if max_padding_frames is not None and self.model.get_model_type() != "qwen3_tts_tokenizer_25hz":
+            raise ValueError("max_padding_frames is only supported by the 25Hz tokenizer.")
+
+        encode_kwargs = {}
+        if chunk_size is not None:
+            encode_kwargs["chunk_size"] = chunk_size
+        if self.model.get_model_type() == "qwen3_tts_tokenizer_25hz":
+            if batch_size is not None:
+                encode_kwargs["xvector_batch_size"] = batch_size
+            if max_padding_frames is not None:
+                encode_kwargs["max_padding_frames"] = max_padding_frames
 
+        wavs = self._normalize_audio_inputs(audios, sr=sr)
+        if batch_size is None or len(wavs) <= batch_size:
+            return self._encode_batch(wavs, return_dict, encode_kwargs)
+
+        order = sorted(range(len(wavs)), key=lambda i: len(wavs[i]), reverse=True)
+        fields = None
+        for start in range(0, len(order), batch_size):
+            indices = order[start : start + batch_size]
+            enc = self._encode_batch([wavs[i] for i in indices], return_dict, encode_kwargs)
+            if fields is None:
+                # every field holds one entry per waveform
+                fields = {key: [None] * len(wavs) for key in (enc.keys() if return_dict else range(len(enc)))}
+            for key, values in fields.items():
+                for i, value in zip(indices, enc[key]):
+                    values[i] = value
+        if return_dict:
+            return type(enc)(**fields)
+        return tuple(fields.values())
+
+    def _encode_batch(self, wavs: List[np.ndarray], return_dict: bool, encode_kwargs: Dict[str, Any]):
         inputs = self.feature_extractor(
             raw_audio=wavs,
             sampling_rate=int(self.feature_extractor.sampling_rate),
@@ -253,12 +266,17 @@ class Qwen3TTSTokenizer:
                 inputs["input_values"].squeeze(1),
                 inputs["padding_mask"].squeeze(1),
                 return_dict=return_dict,
+                **encode_kwargs,
             )
         return enc
 
     def decode(
         self,
         encoded,
+        parallel_chunks: bool = False,
+        num_steps: Optional[int] = None,
+        solver: Optional[str] = None,
+        guidance_schedule: Optional[Union[int, Tuple[float, float]]] = None,
     ) -> Tuple[List[np.ndarray], int]:
         """
         Decode back to waveform.
@@ -277,6 +295,21 @@ class Qwen3TTSTokenizer:
                 - ModelOutput returned by `encode()`, OR
                 - dict, OR
                 - list[dict]
+            parallel_chunks (bool):
+                12Hz only. Decode long codes as overlapping windows stacked along the batch dimension instead of
+                chunk after chunk: more work in parallel (the context frames are decoded again), not bit-exact at
+                the chunk seams.
+            num_steps (Optional[int]):
+                25Hz only. Number of time points of the DiT flow-matching ODE (default 10), so `num_steps - 1`
+                steps. Each step costs one classifier-free-guided DiT forward, two for the "midpoint" and "heun"
+                solvers.
+            solver (Optional[str]):
+                25Hz only. DiT ODE solver: "euler" (default), "midpoint", "heun" or "multistep". "multistep" keeps the
+                cost of "euler" per step and is second order, so fewer steps reach the same quality.
+            guidance_schedule (Optional[Union[int, Tuple[float, float]]]):
+                25Hz only. Classifier-free guidance on the first k ODE steps (int), or on the flow times in a
+                `(start, end)` interval of [0, 1], 0 being the noise. The other steps run the conditional DiT branch
+                only, at half the batch. Default: guidance on every step.
 
         Returns:
             Tuple[List[np.ndarray], int]:
@@ -284,6 +317,12 @@ class Qwen3TTSTokenizer:
                 - sample_rate: int, model output sampling rate
         """
         model_type = self.model.get_model_type()
+        if parallel_chunks and model_type != "qwen3_tts_tokenizer_12hz":
+            raise ValueError("Parallel chunk decoding is only supported by the 12Hz tokenizer.")
+        if model_type != "qwen3_tts_tokenizer_25hz" and (
+            num_steps is not None or solver is not None or guidance_schedule is not None
+        ):
+            raise ValueError("num_steps, solver and guidance_schedule are only supported by the 25Hz tokenizer.")
 
         def _to_tensor(x, dtype=None):
             if isinstance(x, torch.Tensor):
@@ -351,11 +390,20 @@ class Qwen3TTSTokenizer:
                     ref_mels_list = [_to_tensor(m, dtype=torch.float32) for m in ref_mels_list]
                     ref_mels_padded = pad_sequence(ref_mels_list, batch_first=True, padding_value=0).to(self.device).to(self.model.dtype)
 
-                dec = self.model.decode(audio_codes_padded, xvectors_batch, ref_mels_padded, return_dict=True)
+                solver_kwargs = {}
+                if num_steps is not None:
+                    solver_kwargs["num_steps"] = num_steps
+                if solver is not None:
+                    solver_kwargs["solver"] = solver
+                if guidance_schedule is not None:
+                    solver_kwargs["guidance_schedule"] = guidance_schedule
+                dec = self.model.decode(
+                    audio_codes_padded, xvectors_batch, ref_mels_padded, return_dict=True, **solver_kwargs
+                )
                 wav_tensors = dec.audio_values
 
             elif model_type == "qwen3_tts_tokenizer_12hz":
-                dec = self.model.decode(audio_codes_padded, return_dict=True)
+                dec = self.model.decode(audio_codes_padded, return_dict=True, parallel_chunks=parallel_chunks)
                 wav_tensors = dec.audio_values
 
             else:
@@ -364,6 +412,78 @@ class Qwen3TTSTokenizer:
         wavs = [w.to(torch.float32).detach().cpu().numpy() for w in wav_tensors]
         return wavs, int(self.model.get_output_sample_rate())
 
+    def stream_decode(
+        self,
+        audio_codes_chunks: Iterable[Union[torch.Tensor, np.ndarray]],
+        context_codes: Optional[Union[torch.Tensor, np.ndarray]] = None,
+        left_context_size: Optional[int] = None,
+    ) -> Iterator[np.ndarray]:
+        """
+        Incrementally decode a stream of 12Hz codes into waveform chunks.
+
+        By default the decoder keeps a streaming state (conv tails and the KV cache of its transformer) across chunks,
+        so every frame is decoded once and the concatenation of all chunks equals a single `decode()` call. All
+        decoder blocks are causal, so each chunk yields the complete audio of its own frames and nothing is left to
+        flush when the stream ends.
+
+        With `left_context_size`, every chunk is instead decoded from scratch together with up to that many preceding
+        frames, and only the samples that have not been yielded before are returned.
+
+        Args:
+            audio_codes_chunks (Iterable[torch.Tensor | np.ndarray]):
+                Chunks of new codes, each of shape (T, Q). Consumed lazily.
+            context_codes (Optional[torch.Tensor | np.ndarray]):
+                Codes of shape (T, Q) preceding the first chunk, used as left context only
+                (e.g. the reference codes of an ICL voice-clone prompt). Their audio is not yielded.
+            left_context_size (Optional[int]):
+                Number of preceding frames re-decoded as context for each chunk. `None` decodes statefully.
+
+        Yields:
+            np.ndarray: 1-D float32 waveform of each chunk at `get_output_sample_rate()`.
+
+        Raises:
+            ValueError: If the tokenizer is not the 12Hz tokenizer.
+        """
+        if self.model.get_model_type() != "qwen3_tts_tokenizer_12hz":
+            raise ValueError("Streaming decode is only supported by the 12Hz tokenizer.")
+
+        def _to_tensor(x):
+            if not isinstance(x, torch.Tensor):
+                x = torch.from_numpy(np.asarray(x))
+            return x.to(device=self.device, dtype=torch.long)
+
+        def _decode(codes, state=None):
+            with torch.inference_mode():
+                return self.model.decoder(codes.transpose(0, 1).unsqueeze(0), state=state).reshape(-1)
+
+        if left_context_size is None:
+            state = Qwen3TTSTokenizerV2DecoderState(self.model.decoder.config)
+            if context_codes is not None:
+                _decode(_to_tensor(context_codes), state=state)
+            for chunk in audio_codes_chunks:
+                yield _decode(_to_tensor(chunk), state=state).to(torch.float32).cpu().numpy()
+            return
+
+        upsample = int(self.model.decoder.total_upsample)
+        history = None
+        if context_codes is not None and left_context_size > 0:
+            history = _to_tensor(context_codes)[-left_context_size:]
+
+        # Positions are counted in frames / samples from the first frame of the stream.
+        num_frames = 0
+        emitted_samples = 0
+        for chunk in audio_codes_chunks:
+            chunk = _to_tensor(chunk)
+            codes = chunk if history is None else torch.cat([history, chunk], dim=0)
+            window_start = (num_frames - (codes.shape[0] - chunk.shape[0])) * upsample
+            wav = _decode(codes)
+            window_end = window_start + wav.shape[0]
+            wav = wav[max(emitted_samples - window_start, 0) :]
+            emitted_samples = max(emitted_samples, window_end)
+            num_frames += chunk.shape[0]
+            history = codes[-left_context_size:] if left_context_size > 0 else None
+            yield wav.to(torch.float32).cpu().numpy()
+
     def get_model_type(self) -> str:
         """
         Get the underlying tokenizer model type.
@@ -408,4 +528,71 @@ class Qwen3TTSTokenizer:
         Returns:
             int: Decode upsample rate.
         """
-        return int(self.model.get_decode_upsample_rate())
\ No newline at end of file
+        return int(self.model.get_decode_upsample_rate())
+
+
+class Qwen3TTSDecodeWorker:
+    """
+    Runs `Qwen3TTSTokenizer.decode` on a background thread, so codec frames can be turned into waveforms while the
+    talker keeps generating.
+
+    At most `max_pending` decode jobs are queued or running; `submit` blocks until one of them is done, which keeps
+    the talker from running arbitrarily far ahead of the decoder. On CUDA the worker decodes on its own stream, after
+    the work queued on the submitting stream up to the `submit` call.
+
+    Example:
+        with Qwen3TTSDecodeWorker(tokenizer) as worker:
+            futures = [worker.submit([codes]) for codes in generated]
+            wavs = [future.result()[0][0] for future in futures]
+    """
+
+    def __init__(self, tokenizer: Qwen3TTSTokenizer, max_pending: int = 2):
+        if max_pending < 1:
+            raise ValueError(f"`max_pending` must be >= 1, got {max_pending}")
+        self.tokenizer = tokenizer
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="qwen3-tts-decode")
+        device = torch.device(tokenizer.device) if tokenizer.device is not None else torch.device("cpu")
+        self._stream = torch.cuda.Stream(device=device) if device.type == "cuda" else None
+
+    def submit(
+        self, audio_codes: List[torch.Tensor], parallel_chunks: bool = False
+    ) -> "Future[Tuple[List[np.ndarray], int]]":
+        """
+        Queue the decoding of `audio_codes`, a list of codec frames of shape `(num_frames, num_quantizers)`.
+        `parallel_chunks` is forwarded to `Qwen3TTSTokenizer.decode`.
+
+        Returns:
+            Future[Tuple[List[np.ndarray], int]]:
+                Resolves to the `(wavs, sample_rate)` result of `Qwen3TTSTokenizer.decode`.
+        """
+        ready = None
+        if self._stream is not None:
+            ready = torch.cuda.Event()
+            ready.record()
+        self._slots.acquire()
+        try:
+            future = self._executor.submit(self._decode, audio_codes, ready, parallel_chunks)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def _decode(self, audio_codes: List[torch.Tensor], ready: Optional[torch.cuda.Event], parallel_chunks: bool):
+        encoded = [{"audio_codes": c} for c in audio_codes]
+        if self._stream is None:
+            return self.tokenizer.decode(encoded, parallel_chunks=parallel_chunks)
+        with torch.cuda.stream(self._stream):
+            self._stream.wait_event(ready)
+            return self.tokenizer.decode(encoded, parallel_chunks=parallel_chunks)
+
+    def close(self) -> None:
+        """Wait for the queued jobs and stop the worker thread."""
+        self._executor.shutdown(wait=True)
+
+    def __enter__(self) -> "Qwen3TTSDecodeWorker":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
@@ -0,0 +1,103 @@
+"""
+Mel error and speed of classifier-free guidance schedules in the 25Hz tokenizer DiT.
+
+Encodes one reference clip and samples its mel spectrogram with guidance on every ODE step (the reference), then with
+guidance restricted to the first k steps or to flow time intervals. Reports the sampling time, the number of batch rows
+run through the DiT (a guided step runs two per sample, an unguided one) and the mean absolute / relative mel error
+against the reference. The initial noise is seeded identically for every run.
+
+    python scripts/benchmark_dit_guidance.py --tokenizer_path Qwen/Qwen3-TTS-Tokenizer-25Hz --audio ref.wav
+"""
+import argparse
+import os
+import sys
+import time
+
+import torch
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--tokenizer_path", type=str, required=True, help="25Hz tokenizer path or HF id")
+parser.add_argument("--audio", type=str, required=True, help="Reference audio (path, URL or base64)")
+parser.add_argument("--device", type=str, choices=["auto", "cuda", "cpu"], default="auto")
+parser.add_argument("--num_steps", type=int, default=10)
+parser.add_argument("--solver", type=str, default="euler")
+parser.add_argument("--guidance_scale", type=float, default=0.5)
+parser.add_argument("--first_steps", type=str, default="6,4,2,0", help="Comma separated k of `guidance_schedule=k`")
+parser.add_argument("--intervals", type=str, default="0:0.5,0:0.3,0.2:0.8",
+                    help="Comma separated start:end flow time intervals")
+parser.add_argument("--seed", type=int, default=1234)
+parser.add_argument("--runs", type=int, default=1, help="Timed runs per setting, the best is reported")
+args = parser.parse_args()
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+root_dir = os.path.dirname(current_dir)
+if root_dir not in sys.path:
+    sys.path.insert(0, root_dir)
+
+from qwen_tts import Qwen3TTSTokenizer  # noqa: E402
+
+device = args.device
+if device == "auto":
+    device = "cuda:0" if torch.cuda.is_available() else "cpu"
+
+tokenizer = Qwen3TTSTokenizer.from_pretrained(args.tokenizer_path, device_map=device)
+if tokenizer.get_model_type() != "qwen3_tts_tokenizer_25hz":
+    raise SystemExit(f"{args.tokenizer_path} is not a 25Hz tokenizer")
+
+dit = tokenizer.model.decoder.dit
+encoded = tokenizer.encode(args.audio)
+codes = encoded.audio_codes[0].unsqueeze(0).to(device)
+xvectors = encoded.xvectors[0].unsqueeze(0).to(device).to(tokenizer.model.dtype)
+ref_mels = encoded.ref_mels[0].unsqueeze(0).to(device).to(tokenizer.model.dtype)
+
+dit_rows = 0
+
+
+def _count_dit_rows(module, inputs, output):
+    global dit_rows
+    dit_rows += output.shape[0]
+
+
+dit.register_forward_hook(_count_dit_rows)
+
+
+def sample(guidance_schedule):
+    global dit_rows
+    best = float("inf")
+    for _ in range(args.runs):
+        generator = torch.Generator(device=device).manual_seed(args.seed)
+        dit_rows = 0
+        if device.startswith("cuda"):
+            torch.cuda.synchronize()
+        t0 = time.time()
+        mel = dit.sample(
+            xvectors,
+            ref_mels,
+            codes,
+            num_steps=args.num_steps,
+            guidance_scale=args.guidance_scale,
+            solver=args.solver,
+            generator=generator,
+            guidance_schedule=guidance_schedule,
+        )
+        if device.startswith("cuda"):
+            torch.cuda.synchronize()
+        best = min(best, time.time() - t0)
+    return mel.float(), best, dit_rows
+
+
+schedules = [int(k) for k in args.first_steps.split(",") if k]
+schedules += [tuple(float(v) for v in interval.split(":")) for interval in args.intervals.split(",") if interval]
+
+# warmup
+sample(None)
+
+reference, ref_time, ref_rows = sample(None)
+print(f"num_steps={args.num_steps}, solver={args.solver}, guidance_scale={args.guidance_scale}")
+print(f"{'schedule':<14} {'DiT rows':>8} {'time (s)':>9} {'mel L1':>9} {'rel. err':>9}")
+print("-" * 53)
+print(f"{'all steps':<14} {ref_rows:>8} {ref_time:>9.3f} {0.0:>9.4f} {0.0:>9.4f}")
+for schedule in schedules:
+    mel, elapsed, rows = sample(schedule)
+    l1 = (mel - reference).abs().mean().item()
+    print(f"{str(schedule):<14} {rows:>8} {elapsed:>9.3f} {l1:>9.4f} {l1 / reference.abs().mean().item():>9.4f}")
@@ -0,0 +1,91 @@
+"""
+Quality vs. speed of the 25Hz tokenizer DiT ODE solvers.
+
+Encodes one reference clip, decodes it with a fine Euler integration as the reference, then decodes it with every
+solver / step count and reports the decode time, the number of DiT forwards and the SNR of the waveform against the
+reference. The initial noise is seeded identically for every decode, so the differences come from the solver only.
+
+    python scripts/benchmark_dit_solvers.py --tokenizer_path Qwen/Qwen3-TTS-Tokenizer-25Hz --audio ref.wav
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import torch
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--tokenizer_path", type=str, required=True, help="25Hz tokenizer path or HF id")
+parser.add_argument("--audio", type=str, required=True, help="Reference audio (path, URL or base64)")
+parser.add_argument("--device", type=str, choices=["auto", "cuda", "cpu"], default="auto")
+parser.add_argument("--solvers", type=str, default="euler,midpoint,heun,multistep")
+parser.add_argument("--steps", type=str, default="4,6,8,10", help="Comma separated `num_steps` values")
+parser.add_argument("--reference_steps", type=int, default=64, help="`num_steps` of the Euler reference decode")
+parser.add_argument("--seed", type=int, default=1234)
+parser.add_argument("--runs", type=int, default=1, help="Timed runs per setting, the best is reported")
+args = parser.parse_args()
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+root_dir = os.path.dirname(current_dir)
+if root_dir not in sys.path:
+    sys.path.insert(0, root_dir)
+
+from qwen_tts import Qwen3TTSTokenizer  # noqa: E402
+
+device = args.device
+if device == "auto":
+    device = "cuda:0" if torch.cuda.is_available() else "cpu"
+
+tokenizer = Qwen3TTSTokenizer.from_pretrained(args.tokenizer_path, device_map=device)
+if tokenizer.get_model_type() != "qwen3_tts_tokenizer_25hz":
+    raise SystemExit(f"{args.tokenizer_path} is not a 25Hz tokenizer")
+
+encoded = tokenizer.encode(args.audio)
+
+dit_calls = 0
+
+
+def _count_dit_call(module, inputs, output):
+    global dit_calls
+    dit_calls += 1
+
+
+tokenizer.model.decoder.dit.register_forward_hook(_count_dit_call)
+
+
+def decode(solver, num_steps):
+    global dit_calls
+    best = float("inf")
+    for _ in range(args.runs):
+        torch.manual_seed(args.seed)
+        dit_calls = 0
+        if device.startswith("cuda"):
+            torch.cuda.synchronize()
+        t0 = time.time()
+        wavs, _ = tokenizer.decode(encoded, num_steps=num_steps, solver=solver)
+        if device.startswith("cuda"):
+            torch.cuda.synchronize()
+        best = min(best, time.time() - t0)
+    return wavs[0], best, dit_calls
+
+
+def snr_db(reference, estimate):
+    n = min(len(reference), len(estimate))
+    noise = np.sum((reference[:n] - estimate[:n]) ** 2)
+    return 10 * np.log10(np.sum(reference[:n] ** 2) / max(noise, 1e-12))
+
+
+# warmup
+decode("euler", 2)
+
+print(f"Reference: euler, num_steps={args.reference_steps}")
+reference, ref_time, ref_calls = decode("euler", args.reference_steps)
+print(f"  {ref_time:.3f}s, {ref_calls} DiT forwards, {len(reference)} samples")
+print()
+print(f"{'solver':<10} {'steps':>5} {'DiT fwd':>8} {'time (s)':>9} {'SNR (dB)':>9}")
+print("-" * 45)
+for solver in args.solvers.split(","):
+    for num_steps in (int(s) for s in args.steps.split(",")):
+        wav, elapsed, calls = decode(solver, num_steps)
+        print(f"{solver:<10} {num_steps:>5} {calls:>8} {elapsed:>9.3f} {snr_db(reference, wav):>9.2f}")
@@ -24,6 +24,14 @@ parser.add_argument("--repetition_penalty", type=float, default=1.0)
 parser.add_argument("--max_new_tokens", type=int, default=512)
 parser.add_argument("--warmup", type=int, default=1, help="Warmup runs (not timed)")
 parser.add_argument("--runs", type=int, default=3, help="Timed runs for average")
+parser.add_argument("--cache_implementation", type=str, choices=["dynamic", "static"], default="dynamic",
+                    help="Talker KV cache: growing DynamicCache or static cache preallocated for prompt + max_new_tokens")
+parser.add_argument("--compile", action="store_true", help="torch.compile the fixed-shape decode steps (needs --cache_implementation static)")
+parser.add_argument("--compile_mode", type=str, default=None, help="torch.compile mode, e.g. reduce-overhead / max-autotune")
+parser.add_argument("--device", type=str, choices=["auto", "cuda", "cpu"], default="auto")
+parser.add_argument("--quantization", type=str, choices=["none", "int8", "int4"], default="none",
+                    help="Weight-only quantization of the talker / code predictor linears (fast kernels on CPU only)")
+parser.add_argument("--quantization_cache", type=str, default=None, help="Safetensors file caching the quantized weights")
 args = parser.parse_args()
 
 if args.disable_attn:
@@ -55,7 +63,10 @@ try:
         if not os.path.exists(model_path):
             model_path = "Qwen/Qwen3-TTS-12Hz-0.6B-CustomVoice"
     
-    device = "cuda" if torch.cuda.is_available() else "cpu"
+    if args.device == "auto":
+        device = "cuda" if torch.cuda.is_available() else "cpu"
+    else:
+        device = args.device
     print(f"Running on {device}")
 
     if device == "cuda":
@@ -91,6 +102,18 @@ except Exception as e:
 load_time = time.time() - t0
 print(f"Model loaded in {load_time:.2f}s")
 
+if args.quantization != "none":
+    t0 = time.time()
+    bits = 8 if args.quantization == "int8" else 4
+    num_layers = model.model.quantize_weights(bits, cache_path=args.quantization_cache)
+    print(f"Quantized {num_layers} linear layers to {args.quantization} in {time.time() - t0:.2f}s")
+
+if args.compile:
+    if args.cache_implementation != "static":
+        print("--compile only takes effect with --cache_implementation static")
+    model.model.compile_decode_steps(mode=args.compile_mode)
+    print(f"Compiled decode steps (mode={args.compile_mode})")
+
 # Check if model actually detected flash attn capability (internal flag)
 # Qwen model wrapper sets this or the underlying model does
 try:
@@ -104,6 +127,12 @@ print("Starting generation...")
 text = args.text
 voice = args.voice
 
+# Timestamps of the talker forwards of a run: the first one is the prefill, every later one a decode step
+talker_starts = []
+talker_ends = []
+model.model.talker.register_forward_pre_hook(lambda module, inputs: talker_starts.append(time.perf_counter()))
+model.model.talker.register_forward_hook(lambda module, inputs, output: talker_ends.append(time.perf_counter()))
+
 def run_once():
     if args.seed is not None:
         torch.manual_seed(args.seed)
@@ -119,6 +148,7 @@ def run_once():
             temperature=args.temperature,
             repetition_penalty=args.repetition_penalty,
             max_new_tokens=args.max_new_tokens,
+            cache_implementation=None if args.cache_implementation == "dynamic" else args.cache_implementation,
         )
     return wavs, sr
 
@@ -126,17 +156,44 @@ for _ in range(max(0, args.warmup)):
     run_once()
 
 times = []
+steps = []
+prefill_ms = []
+decode_step_ms = []
+codec_decode_ms = []
+peak_mem = []
 for _ in range(max(1, args.runs)):
     if device == "cuda":
         torch.cuda.synchronize()
+        torch.cuda.reset_peak_memory_stats()
+    talker_starts.clear()
+    talker_ends.clear()
     t_start = time.perf_counter()
-    run_once()
+    wavs, sr = run_once()
     if device == "cuda":
         torch.cuda.synchronize()
     t_end = time.perf_counter()
     times.append(t_end - t_start)
+    steps.append(max(1, round(len(wavs[0]) / model.model.speech_tokenizer.get_decode_upsample_rate())))
+    # prefill: from the start of the run (input preparation included) to the start of the first decode step
+    prefill_ms.append(((talker_starts[1] if len(talker_starts) > 1 else talker_ends[-1]) - t_start) * 1000)
+    if len(talker_starts) > 1:
+        decode_step_ms.append((talker_ends[-1] - talker_starts[1]) / (len(talker_starts) - 1) * 1000)
+    codec_decode_ms.append((t_end - talker_ends[-1]) * 1000)
+    if device == "cuda":
+        peak_mem.append(torch.cuda.max_memory_allocated() / 1024**2)
 
 avg = sum(times) / len(times)
 print(f"Text length: {len(text)} chars")
 print(f"Runs: {len(times)} | Avg: {avg:.4f}s | Min: {min(times):.4f}s | Max: {max(times):.4f}s")
 print("TIMES: " + ", ".join(f"{t:.4f}" for t in times))
+if peak_mem:
+    print(f"Peak CUDA memory allocated: {max(peak_mem):.1f} MiB")
+else:
+    import resource
+    print(f"Peak process RSS: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.1f} MiB")
+print(f"Cache: {args.cache_implementation} | Compiled: {args.compile} | Quantization: {args.quantization} | Codec steps: {steps[0]}")
+print(f"Prefill: avg {sum(prefill_ms) / len(prefill_ms):.2f} ms | min {min(prefill_ms):.2f} ms")
+if decode_step_ms:
+    print(f"Decode step latency (talker + code predictor, excl. prefill): avg {sum(decode_step_ms) / len(decode_step_ms):.2f} ms"
+          f" | min {min(decode_step_ms):.2f} ms")
+print(f"Codec decode to waveform: avg {sum(codec_decode_ms) / len(codec_decode_ms):.2f} ms")
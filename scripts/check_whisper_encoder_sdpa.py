@@ -0,0 +1,152 @@
+"""
+Parity and speed of the 25Hz tokenizer encoder attention without flash-attn.
+
+Compares `MultiHeadAttention.qkv_attention_sdpa` (packed windows + `scaled_dot_product_attention`) against the
+reference `qkv_attention_manual` (per-window padding loop + explicit softmax), first on random q/k/v for several
+window layouts, then through the whole encoder (`mel2code`) on noise clips of different lengths. The encoder is
+either loaded from a 25Hz tokenizer or randomly initialised from the default encoder config with `--n_layer` layers.
+Exits with status 1 if any difference exceeds the tolerance of its dtype.
+
+    python scripts/check_whisper_encoder_sdpa.py
+    python scripts/check_whisper_encoder_sdpa.py --tokenizer_path Qwen/Qwen3-TTS-Tokenizer-25Hz
+"""
+import argparse
+import contextlib
+import os
+import sys
+import time
+
+import torch
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--tokenizer_path", type=str, default=None, help="25Hz tokenizer path or HF id (random init if unset)")
+parser.add_argument("--n_layer", type=int, default=8, help="Encoder layers of the randomly initialised encoder")
+parser.add_argument("--device", type=str, choices=["auto", "cuda", "cpu"], default="auto")
+parser.add_argument("--seconds", type=str, default="3.7,9.1,14.2", help="Comma separated noise clip durations")
+parser.add_argument("--seed", type=int, default=1234)
+parser.add_argument("--runs", type=int, default=3, help="Timed runs per setting, the best is reported")
+args = parser.parse_args()
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+root_dir = os.path.dirname(current_dir)
+if root_dir not in sys.path:
+    sys.path.insert(0, root_dir)
+
+from qwen_tts.core.tokenizer_25hz.vq.whisper_encoder import MultiHeadAttention, get_T_after_cnn  # noqa: E402
+
+TOLERANCES = {torch.float32: 1e-4, torch.bfloat16: 5e-2, torch.float16: 5e-3}
+
+device = args.device
+if device == "auto":
+    device = "cuda:0" if torch.cuda.is_available() else "cpu"
+
+
+@contextlib.contextmanager
+def manual_attention():
+    """Route the encoder's non-flash attention through the reference implementation."""
+    sdpa = MultiHeadAttention.qkv_attention_sdpa
+    MultiHeadAttention.qkv_attention_sdpa = MultiHeadAttention.qkv_attention_manual
+    try:
+        yield
+    finally:
+        MultiHeadAttention.qkv_attention_sdpa = sdpa
+
+
+def timed(fn):
+    best, out = float("inf"), None
+    for _ in range(args.runs):
+        if device.startswith("cuda"):
+            torch.cuda.synchronize()
+        t0 = time.time()
+        out = fn()
+        if device.startswith("cuda"):
+            torch.cuda.synchronize()
+        best = min(best, time.time() - t0)
+    return out, best
+
+
+failed = False
+torch.manual_seed(args.seed)
+
+print("Attention on random q/k/v (n_state=1280, n_head=20)")
+print(f"{'windows':<28} {'dtype':<9} {'manual (ms)':>11} {'sdpa (ms)':>10} {'max |diff|':>11}")
+print("-" * 73)
+attn = MultiHeadAttention(1280, 20)
+layouts = {
+    "1 x 100": [100],
+    "15 x 100": [100] * 15,
+    "7 x 100 + 37": [100] * 7 + [37],
+    "3 clips, ragged tails": [100, 100, 61, 100, 12, 100, 100, 100, 88],
+    "single short window": [5],
+}
+for dtype in (torch.float32, torch.bfloat16):
+    for name, seqlens in layouts.items():
+        cu_seqlens = torch.tensor([0] + seqlens, device=device).cumsum(0).to(torch.int32)
+        q, k, v = torch.randn(3, sum(seqlens), 1280, device=device, dtype=dtype).unbind(0)
+        with torch.inference_mode():
+            reference, manual_time = timed(lambda: attn.qkv_attention_manual(q, k, v, cu_seqlens))
+            output, sdpa_time = timed(lambda: attn.qkv_attention_sdpa(q, k, v, cu_seqlens))
+        diff = (output.float() - reference.float()).abs().max().item()
+        failed |= diff > TOLERANCES[dtype]
+        dtype_name = str(dtype).replace("torch.", "")
+        print(f"{name:<28} {dtype_name:<9} {manual_time * 1e3:>11.2f} {sdpa_time * 1e3:>10.2f} {diff:>11.2e}")
+
+if args.tokenizer_path is not None:
+    from qwen_tts import Qwen3TTSTokenizer
+
+    tokenizer = Qwen3TTSTokenizer.from_pretrained(args.tokenizer_path, device_map=device)
+    if tokenizer.get_model_type() != "qwen3_tts_tokenizer_25hz":
+        raise SystemExit(f"{args.tokenizer_path} is not a 25Hz tokenizer")
+    encoder = tokenizer.model.encoder
+    sample_rate = tokenizer.model.input_sample_rate
+else:
+    from qwen_tts.core.tokenizer_25hz.configuration_qwen3_tts_tokenizer_v1 import Qwen3TTSTokenizerV1EncoderConfig
+    from qwen_tts.core.tokenizer_25hz.modeling_qwen3_tts_tokenizer_v1 import Qwen3TTSTokenizerV1Encoder
+
+    config = Qwen3TTSTokenizerV1EncoderConfig(n_layer=args.n_layer)
+    encoder = Qwen3TTSTokenizerV1Encoder(config).to(device).eval()
+    sample_rate = 16000
+dtype = encoder.tokenizer.conv1.weight.dtype
+
+speechs = [
+    0.1 * torch.randn(int(float(s) * sample_rate), device=device, dtype=dtype)
+    for s in args.seconds.split(",") if s
+]
+mels = encoder.speech2mel(speechs)
+audio_mellens = [mel.size(-1) for mel in mels]
+audio_aftercnnlens = [get_T_after_cnn(T) for T in audio_mellens]
+
+
+vq_block = encoder.tokenizer.blocks[encoder.tokenizer.audio_vq_layers - 1]
+captured = {}
+vq_block.register_forward_hook(lambda module, inputs, output: captured.__setitem__("hidden", output))
+
+
+def run_encoder():
+    with torch.inference_mode():
+        return encoder.tokenizer(
+            x_list=mels,
+            audio_mellens=audio_mellens,
+            audio_aftercnnlens=audio_aftercnnlens,
+            audio_seqlens=[T + 2 for T in audio_aftercnnlens],
+            return_indices=True,
+        )
+
+
+with manual_attention():
+    (_, reference_codes), manual_time = timed(run_encoder)
+    reference = captured["hidden"]
+(_, codes), sdpa_time = timed(run_encoder)
+hidden = captured["hidden"]
+
+diff = (hidden.float() - reference.float()).abs().max().item()
+code_agreement = (codes == reference_codes).float().mean().item()
+failed |= diff > TOLERANCES[dtype]
+
+print()
+print(f"Encoder mel2code, {len(speechs)} clips ({args.seconds} s), dtype={str(dtype).replace('torch.', '')}")
+print(f"  manual: {manual_time:.3f}s, sdpa: {sdpa_time:.3f}s")
+print(f"  max |diff| of the layer {encoder.tokenizer.audio_vq_layers} hidden states: {diff:.2e}")
+print(f"  code agreement: {code_agreement * 100:.2f}%")
+
+sys.exit(1 if failed else 0)
@@ -0,0 +1,97 @@
+"""
+Effect of batched CAM++ x-vector extraction of the 25Hz tokenizer on the x-vectors and on the run time.
+
+`XVectorExtractor.extract_codes` batches clips whose fbank lengths differ by at most `max_padding_frames` and zero pads
+the shorter ones, which shifts their x-vectors since CAM++ pools statistics over all frames. For every clip and number
+of padded frames this prints the cosine distance between the padded and the unpadded x-vector, next to the distance
+caused by trimming the clip by as many frames, the shift the extractor already shows for a clip cut 10 ms shorter.
+It then times `extract_codes` for several batch sizes. Exits with status 1 if at `--max_padding_frames` the median
+padding shift exceeds the median trimming shift.
+
+    python scripts/check_xvector_batching.py --tokenizer_path Qwen/Qwen3-TTS-Tokenizer-25Hz --audios a.wav,b.wav,c.wav
+    python scripts/check_xvector_batching.py --onnx_path campplus.onnx --audios a.wav,b.wav,c.wav
+"""
+import argparse
+import os
+import sys
+import time
+
+import torch
+import torch.nn.functional as F
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--tokenizer_path", type=str, default=None, help="25Hz tokenizer path or HF id, for its campplus.onnx")
+parser.add_argument("--onnx_path", type=str, default=None, help="A CAM++ ONNX file, instead of --tokenizer_path")
+parser.add_argument("--audios", type=str, required=True, help="Comma separated speech recordings (paths or URLs)")
+parser.add_argument("--padding_frames", type=str, default="1,2,4,8,16,32", help="Comma separated padding to check")
+parser.add_argument("--max_padding_frames", type=int, default=8, help="The tolerance that has to pass the check")
+parser.add_argument("--batch_sizes", type=str, default="1,2,4,8,16", help="Comma separated batch sizes to time")
+parser.add_argument("--runs", type=int, default=3, help="Timed runs per batch size, the best is reported")
+args = parser.parse_args()
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+root_dir = os.path.dirname(current_dir)
+if root_dir not in sys.path:
+    sys.path.insert(0, root_dir)
+
+from qwen_tts.inference.audio_io import load_audios  # noqa: E402
+
+if (args.tokenizer_path is None) == (args.onnx_path is None):
+    raise SystemExit("Pass exactly one of --tokenizer_path and --onnx_path")
+if args.onnx_path is not None:
+    from qwen_tts.core.tokenizer_25hz.vq.speech_vq import XVectorExtractor
+
+    extractor = XVectorExtractor(args.onnx_path)
+else:
+    from qwen_tts import Qwen3TTSTokenizer
+
+    tokenizer = Qwen3TTSTokenizer.from_pretrained(args.tokenizer_path, device_map="cpu")
+    if tokenizer.get_model_type() != "qwen3_tts_tokenizer_25hz":
+        raise SystemExit(f"{args.tokenizer_path} is not a 25Hz tokenizer")
+    extractor = tokenizer.model.encoder_xvector_extractor
+
+wavs = [torch.from_numpy(wav) for wav, _ in load_audios([a for a in args.audios.split(",") if a], target_sr=16000)]
+norm_wavs = [extractor.peak_norm(wav.float()) for wav in wavs]
+paddings = [int(p) for p in args.padding_frames.split(",") if p]
+if args.max_padding_frames not in paddings:
+    paddings = sorted(paddings + [args.max_padding_frames])
+
+
+def distance(a, b):
+    return 1 - float(a @ b)
+
+
+pad_shifts = {p: [] for p in paddings}
+trim_shifts = {p: [] for p in paddings}
+with torch.no_grad():
+    for wav in norm_wavs:
+        feat = extractor.fbank(wav)
+        reference = extractor.run_xvectors([feat])[0]
+        for p in paddings:
+            pad_shifts[p].append(distance(extractor.run_xvectors([F.pad(feat, (0, 0, 0, p))])[0], reference))
+            trimmed = extractor.fbank(wav[: -p * 160])
+            trim_shifts[p].append(distance(extractor.run_xvectors([trimmed])[0], reference))
+
+print(f"{len(wavs)} clips of {min(len(w) for w in wavs) / 16000:.1f}-{max(len(w) for w in wavs) / 16000:.1f} s, "
+      f"1 - cos to the unpadded x-vector")
+print(f"{'frames':>6} {'pad median':>11} {'pad max':>9} {'trim median':>12} {'trim max':>9}")
+print("-" * 51)
+for p in paddings:
+    pad, trim = torch.tensor(pad_shifts[p]), torch.tensor(trim_shifts[p])
+    print(f"{p:>6} {pad.median().item():>11.2e} {pad.max().item():>9.2e} "
+          f"{trim.median().item():>12.2e} {trim.max().item():>9.2e}")
+
+print()
+print(f"extract_codes on {len(wavs)} clips, max_padding_frames={args.max_padding_frames}")
+for batch_size in [int(b) for b in args.batch_sizes.split(",") if b]:
+    best = float("inf")
+    for _ in range(args.runs):
+        t0 = time.time()
+        extractor.extract_codes(wavs, batch_size=batch_size, max_padding_frames=args.max_padding_frames)
+        best = min(best, time.time() - t0)
+    print(f"  batch_size={batch_size:<3} {best:.3f}s")
+
+failed = (
+    torch.tensor(pad_shifts[args.max_padding_frames]).median() > torch.tensor(trim_shifts[args.max_padding_frames]).median()
+)
+sys.exit(1 if failed else 0)
@@ -0,0 +1,78 @@
+"""
+Fit `max_frames_per_token`, the runaway frame budget per text token, to reference recordings.
+
+Reads a jsonl with `text` and `audio_codes` per line (the output of `qwen_tts/finetuning/prepare_data.py`), tokenizes
+each text the way `Qwen3TTSModel` builds its talker input and prints the distribution of codec frames per text token.
+The fitted value is the `--quantile` of that distribution times `--margin`; with `--write` it is stored in the
+`generate_config.json` of the local `--model_path`, from where `Qwen3TTSModel` picks it up.
+
+    python scripts/fit_max_frames_per_token.py --model_path Qwen/Qwen3-TTS-12Hz-1.7B-CustomVoice --input_jsonl codes.jsonl
+"""
+import argparse
+import json
+import os
+import sys
+
+import torch
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--model_path", type=str, required=True, help="Model path or HF id, for its text tokenizer")
+parser.add_argument("--input_jsonl", type=str, required=True, help="Lines with `text` and `audio_codes`")
+parser.add_argument("--quantile", type=float, default=0.999)
+parser.add_argument("--margin", type=float, default=1.2)
+parser.add_argument("--write", action="store_true", help="Store the fitted value in the model's generate_config.json")
+args = parser.parse_args()
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+root_dir = os.path.dirname(current_dir)
+if root_dir not in sys.path:
+    sys.path.insert(0, root_dir)
+
+from qwen_tts.core.models import Qwen3TTSProcessor  # noqa: E402
+from qwen_tts.core.models.modeling_qwen3_tts import Qwen3TTSRunawayDetector  # noqa: E402
+
+try:
+    processor = Qwen3TTSProcessor.from_pretrained(args.model_path, fix_mistral_regex=True)
+except TypeError:
+    processor = Qwen3TTSProcessor.from_pretrained(args.model_path)
+
+input_lengths, frame_counts = [], []
+with open(args.input_jsonl) as f:
+    for line in f:
+        if not line.strip():
+            continue
+        item = json.loads(line)
+        # same template as `Qwen3TTSModel._build_assistant_text`
+        text = f"<|im_start|>assistant\n{item['text']}<|im_end|>\n<|im_start|>assistant\n"
+        input_ids = processor(text=text, return_tensors="pt", padding=True)["input_ids"]
+        input_lengths.append(input_ids.shape[-1])
+        frame_counts.append(len(item["audio_codes"]))
+
+ratios = torch.tensor(
+    [n / Qwen3TTSRunawayDetector.frame_budget(1.0, length) for length, n in zip(input_lengths, frame_counts)],
+    dtype=torch.float64,
+)
+print(f"{len(ratios)} recordings, codec frames per text token:")
+for q in (0.5, 0.9, 0.99, 0.999, 1.0):
+    print(f"  {f'p{q * 100:g}':<7} {torch.quantile(ratios, q).item():.2f}")
+
+max_frames_per_token = Qwen3TTSRunawayDetector.fit_max_frames_per_token(
+    input_lengths, frame_counts, quantile=args.quantile, margin=args.margin
+)
+budgets = torch.tensor([Qwen3TTSRunawayDetector.frame_budget(max_frames_per_token, n) for n in input_lengths])
+clipped = (torch.tensor(frame_counts) > budgets).float().mean().item()
+print(f"max_frames_per_token = {max_frames_per_token:.2f} (p{args.quantile * 100:g} x {args.margin:g}), "
+      f"it would cut {clipped * 100:.2f}% of these recordings")
+
+if args.write:
+    config_path = os.path.join(args.model_path, "generate_config.json")
+    if not os.path.isdir(args.model_path):
+        raise SystemExit(f"--write needs a local model directory, got {args.model_path}")
+    config = {}
+    if os.path.isfile(config_path):
+        with open(config_path) as f:
+            config = json.load(f)
+    config["max_frames_per_token"] = round(max_frames_per_token, 2)
+    with open(config_path, "w") as f:
+        json.dump(config, f, indent=2)
+    print(f"Wrote max_frames_per_token to {config_path}")
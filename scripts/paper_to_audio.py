@@ -154,6 +154,10 @@ def main():
     parser.add_argument("--repetition_penalty", type=float, default=1.1, help="Penalty to reduce repetition. Default 1.1")
     parser.add_argument("--max_new_tokens", type=int, default=None, help="Maximum number of new codec tokens to generate per chunk.")
     parser.add_argument("--batch_size", type=int, default=8, help="Number of chunks to generate per batch (higher uses more VRAM)")
+    parser.add_argument("--continuous_batching", action="store_true", help="Keep up to --batch_size chunks in flight and refill finished slots from a queue of --queue_size chunks")
+    parser.add_argument("--queue_size", type=int, default=64, help="Chunks submitted per generate call with --continuous_batching or --length_bucketing")
+    parser.add_argument("--length_bucketing", action="store_true", help="Sort each queue of --queue_size chunks by length and generate it in batches of up to --batch_size similar-length chunks")
+    parser.add_argument("--max_batch_tokens", type=int, default=None, help="With --length_bucketing, cap the padded text tokens (longest chunk x batch size) per batch")
     parser.add_argument("--max_chars", type=int, default=800, help="Max characters per chunk for splitting")
     parser.add_argument("--max_batch_chars", type=int, default=6000, help="Cap total characters per batch to avoid very long batches (0 disables)")
     parser.add_argument("--start_chunk", type=int, default=0, help="Start chunk index (inclusive)")
@@ -361,9 +365,7 @@ def main():
             if args.device == "cuda":
                 torch.cuda.manual_seed_all(args.seed)
 
-        wavs, sr = model.generate_custom_voice(
-            text=batch_texts,
-            speaker=batch_speakers,
+        gen_kwargs = dict(
             non_streaming_mode=True,
             do_sample=args.do_sample,
             top_k=args.top_k,
@@ -371,7 +373,18 @@ def main():
             temperature=args.temperature,
             repetition_penalty=args.repetition_penalty,
             max_new_tokens=args.max_new_tokens if args.max_new_tokens is not None else 2048,
+            max_batch_size=min(args.batch_size, len(batch_texts)) if args.continuous_batching else None,
         )
+        if args.length_bucketing:
+            # results come back in chunk order, so all_audio stays in document order
+            wavs, sr = model.generate_many(
+                [{"text": t, "speaker": s} for t, s in zip(batch_texts, batch_speakers)],
+                batch_size=min(args.batch_size, len(batch_texts)),
+                max_batch_tokens=args.max_batch_tokens,
+                **gen_kwargs,
+            )
+        else:
+            wavs, sr = model.generate_custom_voice(text=batch_texts, speaker=batch_speakers, **gen_kwargs)
 
         for idx, audio_data in zip(batch_indices, wavs):
             chunk_file = os.path.join(args.output_dir, f"part_{idx:03d}.wav")
@@ -380,6 +393,9 @@ def main():
         return sr
 
     def clamp_batch_size(texts, requested_size):
+        if args.continuous_batching or args.length_bucketing:
+            # slots / buckets are bounded by --batch_size, the whole queue goes in one call
+            return requested_size
         if args.max_batch_chars <= 0:
             return requested_size
         total = 0
@@ -394,8 +410,9 @@ def main():
 
     i = 0
     total = len(chunks)
+    window = args.queue_size if args.continuous_batching or args.length_bucketing else args.batch_size
     while i < total:
-        batch_indices = list(range(i, min(i + args.batch_size, total)))
+        batch_indices = list(range(i, min(i + window, total)))
         i = batch_indices[-1] + 1
 
         pending_indices = []
@@ -422,7 +439,7 @@ def main():
         if not pending_indices:
             continue
 
-        batch_size = clamp_batch_size(pending_texts, min(args.batch_size, len(pending_indices)))
+        batch_size = clamp_batch_size(pending_texts, min(window, len(pending_indices)))
         while batch_size > 0:
             try:
                 batch_start = torch.cuda.Event(enable_timing=True) if args.device == "cuda" else None
@@ -445,7 +462,7 @@ def main():
                 pending_texts = pending_texts[batch_size:]
                 if not pending_indices:
                     break
-                batch_size = clamp_batch_size(pending_texts, min(args.batch_size, len(pending_indices)))
+                batch_size = clamp_batch_size(pending_texts, min(window, len(pending_indices)))
             except RuntimeError as e:
                 err = str(e).lower()
                 if "out of memory" in err: